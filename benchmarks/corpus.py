@@ -0,0 +1,209 @@
+"""
+Generador de corpus sintéticos .docx/.xlsx para los benchmarks.
+
+Parte de los generadores del proyecto (create_placeholder_images y
+create_excel_template_with_placeholders) y añade el contenido que determina
+el coste de procesar un archivo: número de párrafos o celdas, claves partidas
+en varios runs (como las deja Word al editar, con un w:rsidR distinto por
+fragmento), encabezados por sección, imágenes incrustadas y dispersión de las
+celdas en la hoja. Con la misma semilla se genera exactamente el mismo corpus.
+
+Uso:
+    python benchmarks/corpus.py SALIDA [--docx 20] [--xlsx 20] [--paragraphs 200]
+        [--cells 2000] [--split-runs 3] [--sections 2] [--images 1] [--density 0.2]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Cm
+from openpyxl import load_workbook
+from openpyxl.drawing.image import Image as XlsxImage
+from processor.excel_editor import create_excel_template_with_placeholders
+from processor.word_editor import create_placeholder_images
+
+# Claves del corpus y sus valores de reemplazo
+KEYS = {
+    "{{NOMBRE}}": "María Paula Castillo",
+    "{{EMPRESA}}": "OCNILENTES",
+    "{{CIUDAD}}": "Santiago de Cali",
+    "{{FECHA}}": "18 de octubre de 2026",
+    "{{MATRICULA}}": "981502-16",
+    "{{NIT}}": "901.068.699-9",
+}
+FILLER = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+          "tempor incididunt ut labore et dolore magna aliqua").split()
+PLACEHOLDER_IMAGE = "placeholder_logo.png"
+
+DEFAULTS = {
+    "docx": 20,
+    "xlsx": 20,
+    "paragraphs": 200,
+    "cells": 2000,
+    "split_runs": 3,
+    "sections": 2,
+    "images": 1,
+    "density": 0.2,
+    "key_ratio": 0.3,
+    "seed": 1234,
+}
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(FILLER) for _ in range(words))
+
+
+def _rsid(rng):
+    return f"{rng.randrange(16 ** 8):08X}"
+
+
+def add_split_key(paragraph, key, pieces, rng):
+    """Añade `key` partida en `pieces` runs, cada uno con su propio w:rsidR."""
+    size = max(1, -(-len(key) // max(1, pieces)))
+    for start in range(0, len(key), size):
+        run = paragraph.add_run(key[start:start + size])
+        run._r.set(qn("w:rsidR"), _rsid(rng))
+
+
+def build_docx(path, rng, paragraphs, split_runs, sections, images, key_ratio, image_path):
+    """Documento con párrafos de relleno, claves (a veces partidas), encabezados e imágenes."""
+    doc = Document()
+    keys = list(KEYS)
+    per_section = max(1, paragraphs // max(1, sections))
+
+    for section_index in range(max(1, sections)):
+        section = doc.sections[0] if section_index == 0 else doc.add_section()
+        section.header.is_linked_to_previous = False
+        header = section.header.paragraphs[0]
+        header.add_run(f"Encabezado {section_index + 1} · ")
+        add_split_key(header, rng.choice(keys), split_runs, rng)
+
+        for _ in range(per_section):
+            paragraph = doc.add_paragraph()
+            paragraph.add_run(_sentence(rng) + " ")
+            if rng.random() < key_ratio:
+                add_split_key(paragraph, rng.choice(keys), split_runs if rng.random() < 0.5 else 1, rng)
+                paragraph.add_run(" " + _sentence(rng, 6))
+
+    for _ in range(images):
+        doc.add_paragraph().add_run().add_picture(image_path, width=Cm(4))
+    doc.save(path)
+
+
+def build_xlsx(path, rng, cells, density, images, key_ratio, image_path):
+    """
+    Libro creado con create_excel_template_with_placeholders y rellenado con
+    `cells` celdas de texto repartidas con la densidad indicada (1.0 = bloque
+    compacto; 0.01 = una celda de cada cien en el rectángulo usado).
+    """
+    create_excel_template_with_placeholders(path, {"{{LOGO}}": {"row": 1, "col": 1}})
+    wb = load_workbook(path)
+    ws = wb.active
+    keys = list(KEYS)
+
+    columns = 20
+    area = max(cells, int(cells / max(density, 1e-4)))
+    rows = max(2, area // columns)
+    positions = rng.sample(range(columns, rows * columns), min(cells, rows * columns - columns))
+    for position in sorted(positions):
+        text = _sentence(rng, 4)
+        if rng.random() < key_ratio:
+            text = f"{text} {rng.choice(keys)}"
+        ws.cell(row=position // columns + 1, column=position % columns + 1, value=text)
+
+    for index in range(images):
+        image = XlsxImage(image_path)
+        image.anchor = f"V{2 + index * 10}"
+        ws.add_image(image)
+    wb.save(path)
+
+
+def generate_corpus(output_dir, docx=DEFAULTS["docx"], xlsx=DEFAULTS["xlsx"],
+                    paragraphs=DEFAULTS["paragraphs"], cells=DEFAULTS["cells"],
+                    split_runs=DEFAULTS["split_runs"], sections=DEFAULTS["sections"],
+                    images=DEFAULTS["images"], density=DEFAULTS["density"],
+                    key_ratio=DEFAULTS["key_ratio"], seed=DEFAULTS["seed"]):
+    """
+    Genera el corpus en `output_dir`/input (y las imágenes en `output_dir`/assets).
+
+    Returns:
+        Dict con los parámetros, las rutas y los reemplazos a usar.
+    """
+    rng = random.Random(seed)
+    input_dir = os.path.join(output_dir, "input")
+    assets_dir = os.path.join(output_dir, "assets")
+    os.makedirs(os.path.join(input_dir, "word"), exist_ok=True)
+    os.makedirs(os.path.join(input_dir, "excel"), exist_ok=True)
+    create_placeholder_images(assets_dir)
+    image_path = os.path.join(assets_dir, PLACEHOLDER_IMAGE)
+
+    for index in range(docx):
+        build_docx(os.path.join(input_dir, "word", f"doc_{index:04d}.docx"), rng,
+                   paragraphs, split_runs, sections, images, key_ratio, image_path)
+    for index in range(xlsx):
+        build_xlsx(os.path.join(input_dir, "excel", f"book_{index:04d}.xlsx"), rng,
+                   cells, density, images, key_ratio, image_path)
+
+    params = {"docx": docx, "xlsx": xlsx, "paragraphs": paragraphs, "cells": cells,
+              "split_runs": split_runs, "sections": sections, "images": images,
+              "density": density, "key_ratio": key_ratio, "seed": seed}
+    corpus = {
+        "params": params,
+        "input_dir": input_dir,
+        "assets_dir": assets_dir,
+        "replacements": dict(KEYS),
+        "placeholder_replacements": {
+            PLACEHOLDER_IMAGE: {"path": os.path.join(assets_dir, "placeholder_firma.png"),
+                                "maintain_aspect": True}
+        },
+    }
+    with open(os.path.join(output_dir, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=2)
+    return corpus
+
+
+def add_corpus_arguments(parser):
+    """Opciones del generador (compartidas con benchmarks/throughput.py)."""
+    parser.add_argument("--docx", type=int, default=DEFAULTS["docx"], help="Documentos .docx")
+    parser.add_argument("--xlsx", type=int, default=DEFAULTS["xlsx"], help="Libros .xlsx")
+    parser.add_argument("--paragraphs", type=int, default=DEFAULTS["paragraphs"],
+                        help="Párrafos por documento")
+    parser.add_argument("--cells", type=int, default=DEFAULTS["cells"], help="Celdas de texto por libro")
+    parser.add_argument("--split-runs", type=int, default=DEFAULTS["split_runs"],
+                        help="Runs en que se parte cada clave (fragmentación por rsid)")
+    parser.add_argument("--sections", type=int, default=DEFAULTS["sections"],
+                        help="Secciones (cada una con su encabezado) por documento")
+    parser.add_argument("--images", type=int, default=DEFAULTS["images"],
+                        help="Imágenes incrustadas por archivo")
+    parser.add_argument("--density", type=float, default=DEFAULTS["density"],
+                        help="Fracción de celdas pobladas en el rectángulo usado de la hoja")
+    parser.add_argument("--key-ratio", type=float, default=DEFAULTS["key_ratio"],
+                        help="Fracción de párrafos/celdas que contienen una clave")
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"], help="Semilla del generador")
+
+
+def corpus_options(args):
+    return {"docx": args.docx, "xlsx": args.xlsx, "paragraphs": args.paragraphs,
+            "cells": args.cells, "split_runs": args.split_runs, "sections": args.sections,
+            "images": args.images, "density": args.density, "key_ratio": args.key_ratio,
+            "seed": args.seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output_dir", help="Carpeta donde se crea el corpus")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.output_dir, **corpus_options(args))
+    print(f"✅ Corpus generado en {corpus['input_dir']} ({args.docx} .docx, {args.xlsx} .xlsx)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Paridad de texto entre los motores de Word "docx" (python-docx) y "xml"
+(processor.docx_xml).
+
+Procesa un documento con ambos motores en una carpeta temporal y compara el
+texto de cada párrafo del cuerpo, encabezados y pies. Lo usan las pruebas
+(tests/test_docx_engines.py) y throughput.py --parity.
+"""
+import os
+import sys
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import etree
+from processor.docx_xml import _PARSER, _SEPARATOR, is_story_part, iter_paragraph_segments
+from processor.word_editor import process_word_file
+
+
+def extract_story_texts(path):
+    """Texto de cada párrafo por parte (cuerpo, encabezados, pies) para comparar salidas."""
+    texts = {}
+    with zipfile.ZipFile(path) as zf:
+        for name in sorted(zf.namelist()):
+            if is_story_part(name):
+                root = etree.fromstring(zf.read(name), _PARSER)
+                texts[name] = [
+                    "".join(text for _, text in segments).replace(_SEPARATOR, "\t")
+                    for segments in iter_paragraph_segments(root)
+                ]
+    return texts
+
+
+def compare_engines(input_path, replacements):
+    """
+    Verifica la paridad entre el motor python-docx y el motor XML.
+
+    Procesa el archivo con ambos motores y devuelve la lista de diferencias
+    [(parte, índice_párrafo, texto_docx, texto_xml)]; vacía si ambos producen
+    el mismo texto.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        docx_output = os.path.join(tmp_dir, "docx_engine.docx")
+        xml_output = os.path.join(tmp_dir, "xml_engine.docx")
+        process_word_file(input_path, docx_output, replacements, engine="docx")
+        process_word_file(input_path, xml_output, replacements, engine="xml")
+
+        docx_texts = extract_story_texts(docx_output)
+        xml_texts = extract_story_texts(xml_output)
+
+    # python-docx puede crear encabezados vacíos al recorrerlos: solo se
+    # comparan las partes que ya existían en la entrada
+    differences = []
+    for part in sorted(extract_story_texts(input_path)):
+        left = docx_texts.get(part, [])
+        right = xml_texts.get(part, [])
+        for index in range(max(len(left), len(right))):
+            a = left[index] if index < len(left) else None
+            b = right[index] if index < len(right) else None
+            if a != b:
+                differences.append((part, index, a, b))
+    return differences
@@ -0,0 +1,76 @@
+"""
+Benchmark: recorrido de hojas Excel con contenido disperso.
+
+Crea hojas con el mismo número de celdas de texto pero con una celda con
+formato cada vez más lejana (lo que agranda max_row × max_column) y compara
+el recorrido denso de ws.iter_rows() con el recorrido disperso de
+excel_editor.iter_string_cells(). El coste del segundo debe mantenerse
+proporcional a las celdas pobladas, no a las dimensiones de la hoja.
+
+Uso:
+    python benchmarks/sparse_sheet.py [--cells 200] [--max-dense-cells 5000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+from processor.excel_editor import iter_string_cells
+
+# Coordenada de la celda "perdida" con formato: (fila, columna)
+STRAY_CELLS = [(100, 10), (2000, 50), (20000, 200), (1048576, 16384)]
+
+
+def build_sheet(populated_cells, stray_row, stray_column):
+    wb = Workbook()
+    ws = wb.active
+    for index in range(populated_cells):
+        ws.cell(row=index // 10 + 1, column=index % 10 + 1, value=f"SANTIAGO DE CALI {index}")
+    ws.cell(row=stray_row, column=stray_column).font = Font(bold=True)
+    return ws
+
+
+def dense_string_cells(ws):
+    """Recorrido anterior: el rectángulo completo de iter_rows()."""
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value and isinstance(cell.value, str):
+                yield cell
+
+
+def time_walk(walk, ws):
+    start = time.perf_counter()
+    count = sum(1 for _ in walk(ws))
+    return time.perf_counter() - start, count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cells", type=int, default=200, help="Celdas de texto pobladas por hoja")
+    parser.add_argument("--max-dense-cells", type=int, default=5_000_000,
+                        help="No medir iter_rows() por encima de este número de coordenadas")
+    args = parser.parse_args(argv)
+
+    print(f"{'celda con formato':>20} {'coordenadas':>16} {'iter_rows (s)':>14} {'disperso (s)':>13} {'celdas':>7}")
+    for stray_row, stray_column in STRAY_CELLS:
+        ws = build_sheet(args.cells, stray_row, stray_column)
+        coordinates = ws.max_row * ws.max_column
+        sparse_time, sparse_count = time_walk(iter_string_cells, ws)
+
+        if coordinates <= args.max_dense_cells:
+            dense_time, dense_count = time_walk(dense_string_cells, build_sheet(args.cells, stray_row, stray_column))
+            assert dense_count == sparse_count, "los recorridos deben encontrar las mismas celdas"
+            dense = f"{dense_time:14.4f}"
+        else:
+            dense = f"{'(omitido)':>14}"
+
+        print(f"{ws.cell(row=stray_row, column=stray_column).coordinate:>20} {coordinates:>16,} "
+              f"{dense} {sparse_time:13.4f} {sparse_count:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark de rendimiento sobre un corpus sintético (ver benchmarks/corpus.py).
+
+Mide, por fase, process_word_file y process_excel_file con cada motor (y,
+para los motores de modelo de objetos, la carga, el recorrido y el guardado
+por separado), el pre-escaneo y el lote completo (run_batch con el pool de
+procesos, en tubería y una segunda pasada incremental). Escribe los
+resultados en JSON para comparar ejecuciones antes y después de un cambio.
+
+Uso:
+    python benchmarks/throughput.py [--corpus CARPETA] [--output resultados.json]
+        [--compare anterior.json] [--workers N] [--repeat 3] [--parity]
+        [opciones del generador: --docx 20 --paragraphs 200 --split-runs 3 ...]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import add_corpus_arguments, corpus_options, generate_corpus
+from parity import compare_engines
+from openpyxl import load_workbook
+from processor.batch import collect_jobs, run_batch, run_incremental_batch
+from processor.excel_editor import process_excel_file, process_workbook_cells
+from processor.matcher import compile_replacements
+from processor.pipeline import build_pipeline_options
+from processor.prescan import needs_processing
+from processor.word_editor import Document, process_document, process_word_file
+
+WORD_ENGINES = ("docx", "xml")
+EXCEL_ENGINES = ("openpyxl", "stream", "shared")
+
+
+def timed(function, repeat=1):
+    """Mejor tiempo (pared y CPU de este proceso) de `repeat` ejecuciones."""
+    best_wall = best_cpu = None
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        function()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if best_wall is None or wall < best_wall:
+            best_wall, best_cpu = wall, cpu
+    return best_wall, best_cpu
+
+
+def record(results, phase, files, wall, cpu):
+    results[phase] = {
+        "files": files,
+        "seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "files_per_second": round(files / wall, 2) if wall else None,
+    }
+    print(f"  {phase:<32} {wall:9.3f}s  {files / wall if wall else 0:9.1f} archivos/s")
+
+
+def bench_word(jobs, corpus, out_dir, repeat, results):
+    replacements = compile_replacements(corpus["replacements"])
+    placeholders = corpus["placeholder_replacements"]
+    paths = [job["input_path"] for job in jobs]
+    output = os.path.join(out_dir, "out.docx")
+
+    for engine in WORD_ENGINES:
+        wall, cpu = timed(lambda: [process_word_file(path, output, replacements, engine=engine)
+                                   for path in paths], repeat)
+        record(results, f"word.{engine}.total", len(paths), wall, cpu)
+    wall, cpu = timed(lambda: [process_word_file(path, output, replacements,
+                                                 placeholder_replacements=placeholders)
+                               for path in paths], repeat)
+    record(results, "word.docx.total_with_images", len(paths), wall, cpu)
+
+    # Fases del motor python-docx
+    documents = []
+    wall, cpu = timed(lambda: documents.__setitem__(slice(None), [Document(path) for path in paths]), 1)
+    record(results, "word.docx.load", len(paths), wall, cpu)
+    wall, cpu = timed(lambda: [process_document(doc, replacements) for doc in documents], 1)
+    record(results, "word.docx.replace", len(paths), wall, cpu)
+    wall, cpu = timed(lambda: [doc.save(output) for doc in documents], 1)
+    record(results, "word.docx.save", len(paths), wall, cpu)
+
+
+def bench_excel(jobs, corpus, out_dir, repeat, results):
+    replacements = compile_replacements(corpus["replacements"])
+    placeholders = corpus["placeholder_replacements"]
+    paths = [job["input_path"] for job in jobs]
+    output = os.path.join(out_dir, "out.xlsx")
+
+    for engine in EXCEL_ENGINES:
+        wall, cpu = timed(lambda: [process_excel_file(path, output, replacements, engine=engine)
+                                   for path in paths], repeat)
+        record(results, f"excel.{engine}.total", len(paths), wall, cpu)
+    wall, cpu = timed(lambda: [process_excel_file(path, output, replacements,
+                                                  placeholder_replacements=placeholders)
+                               for path in paths], repeat)
+    record(results, "excel.openpyxl.total_with_images", len(paths), wall, cpu)
+
+    # Fases del motor openpyxl
+    workbooks = []
+    wall, cpu = timed(lambda: workbooks.__setitem__(slice(None), [load_workbook(path) for path in paths]), 1)
+    record(results, "excel.openpyxl.load", len(paths), wall, cpu)
+    wall, cpu = timed(lambda: [process_workbook_cells(wb, replacements) for wb in workbooks], 1)
+    record(results, "excel.openpyxl.replace", len(paths), wall, cpu)
+    wall, cpu = timed(lambda: [wb.save(output) for wb in workbooks], 1)
+    record(results, "excel.openpyxl.save", len(paths), wall, cpu)
+
+
+def bench_batch(jobs, corpus, out_dir, workers, results):
+    replacements = compile_replacements(corpus["replacements"])
+    batch_dir = os.path.join(out_dir, "batch")
+    options = {"replacements": replacements, "workers": workers}
+
+    for prescan in (False, True):
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        batch_jobs = collect_jobs(corpus["input_dir"], batch_dir)
+        wall, cpu = timed(lambda: run_batch(batch_jobs, prescan=prescan, **options))
+        record(results, f"batch.workers_{workers}" + (".prescan" if prescan else ""),
+               len(batch_jobs), wall, cpu)
+
+    # Lectura anticipada y escritura en segundo plano (processor.pipeline)
+    shutil.rmtree(batch_dir, ignore_errors=True)
+    batch_jobs = collect_jobs(corpus["input_dir"], batch_dir)
+    wall, cpu = timed(lambda: run_batch(batch_jobs, pipeline=build_pipeline_options(True), **options))
+    record(results, f"batch.workers_{workers}.pipeline", len(batch_jobs), wall, cpu)
+
+    # Segunda pasada incremental: todo debe omitirse por el manifiesto
+    shutil.rmtree(batch_dir, ignore_errors=True)
+    batch_jobs = collect_jobs(corpus["input_dir"], batch_dir)
+    run_incremental_batch(batch_jobs, batch_dir, **options)
+    wall, cpu = timed(lambda: run_incremental_batch(collect_jobs(corpus["input_dir"], batch_dir),
+                                                    batch_dir, **options))
+    record(results, "batch.incremental_rerun", len(batch_jobs), wall, cpu)
+
+    wall, cpu = timed(lambda: collect_jobs(corpus["input_dir"], batch_dir))
+    record(results, "batch.collect_jobs", len(batch_jobs), wall, cpu)
+
+
+def bench_prescan(jobs, corpus, results):
+    replacements = compile_replacements(corpus["replacements"])
+    wall, cpu = timed(lambda: [needs_processing(job["input_path"], job["kind"], replacements)
+                               for job in jobs])
+    record(results, "prescan", len(jobs), wall, cpu)
+
+
+def check_parity(word_jobs, corpus):
+    """Diferencias de texto entre los motores docx y xml (compare_engines) por archivo."""
+    differences = {}
+    for job in word_jobs:
+        found = compare_engines(job["input_path"], corpus["replacements"])
+        if found:
+            differences[job["relative_input"]] = [list(item) for item in found[:10]]
+    print(f"  paridad docx/xml: {len(differences)} de {len(word_jobs)} documentos con diferencias")
+    return differences
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(previous_path, current):
+    """Tabla de fases comunes: tiempo anterior, actual y aceleración."""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    if previous.get("corpus") != current["corpus"]:
+        print("⚠️ Los corpus de ambas ejecuciones no tienen los mismos parámetros")
+    print(f"\n{'fase':<34} {'antes (s)':>10} {'ahora (s)':>10} {'aceleración':>12}")
+    for phase, now in current["phases"].items():
+        before = previous.get("phases", {}).get(phase)
+        if not before:
+            continue
+        speedup = before["seconds"] / now["seconds"] if now["seconds"] else float("inf")
+        print(f"{phase:<34} {before['seconds']:10.3f} {now['seconds']:10.3f} {speedup:11.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Carpeta del corpus (se genera si no contiene corpus.json)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos del lote")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Repeticiones por fase de editor (se guarda la mejor)")
+    parser.add_argument("--parity", action="store_true",
+                        help="Comprobar además la paridad de texto entre los motores de Word")
+    parser.add_argument("--skip", action="append", default=[], choices=("word", "excel", "prescan", "batch"),
+                        help="Omitir un grupo de fases (repetible)")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus or os.path.join(tmp_dir, "corpus")
+        manifest = os.path.join(corpus_dir, "corpus.json")
+        if os.path.exists(manifest):
+            with open(manifest, "r", encoding="utf-8") as f:
+                corpus = json.load(f)
+        else:
+            print(f"📦 Generando corpus en {corpus_dir}...")
+            corpus = generate_corpus(corpus_dir, **corpus_options(args))
+
+        out_dir = os.path.join(tmp_dir, "out")
+        os.makedirs(out_dir, exist_ok=True)
+        jobs = collect_jobs(corpus["input_dir"], out_dir)
+        word_jobs = [job for job in jobs if job["kind"] == "word"]
+        excel_jobs = [job for job in jobs if job["kind"] == "excel"]
+
+        phases = {}
+        print(f"⏱️ {len(word_jobs)} .docx y {len(excel_jobs)} .xlsx")
+        if word_jobs and "word" not in args.skip:
+            bench_word(word_jobs, corpus, out_dir, args.repeat, phases)
+        if excel_jobs and "excel" not in args.skip:
+            bench_excel(excel_jobs, corpus, out_dir, args.repeat, phases)
+        if "prescan" not in args.skip:
+            bench_prescan(jobs, corpus, phases)
+        if "batch" not in args.skip:
+            bench_batch(jobs, corpus, out_dir, args.workers, phases)
+
+        results = {"environment": environment(), "corpus": corpus["params"], "phases": phases}
+        if args.parity:
+            results["parity"] = check_parity(word_jobs, corpus)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados en {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,40 @@
 import os
 import json
+import logging
+import queue
+import threading
 import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from processor.word_editor import process_word_file
-from processor.excel_editor import process_excel_file 
-
-
-def ejecutar_proceso(valores_usuario, imagenes_usuario, carpeta_entrada_var, carpeta_salida_var, progress_var, progress_bar, status_label):
-    """Ejecuta el proceso de reemplazo con barra de progreso y mejor manejo de errores."""
-    start_time = time.time()
+from processor.batch import (SUPPORTED_EXTENSIONS, BatchControl, build_image_cache_options, build_image_configs,
+                             collect_jobs, detect_special_style_keys, run_incremental_batch)
+from processor.report import LOG_FILENAME, summarize_results, write_report
+from processor.matcher import compile_replacements
+from processor.memory import build_memory_options
+from processor.pipeline import build_pipeline_options
+from processor.profiling import profile_slowest
+from processor.utils import configure_logging
+
+# Logger hijo de "processor": comparte nivel y salida con los editores
+logger = logging.getLogger("processor.main")
+
+# La ventana lee los eventos del lote 10 veces por segundo, sin importar cuántos archivos terminen
+INTERVALO_REFRESCO_MS = 100
+
+
+def ejecutar_proceso(valores_usuario, imagenes_usuario, carpeta_entrada_var, carpeta_salida_var, progress_var, progress_bar, status_label, workers=None, word_options=None, excel_options=None,
+                     template_cache=None, image_cache=None, forzar_var=None, prescan=True,
+                     ventana=None, velocidad_label=None, botones=None, estado_lote=None, perfilar=0,
+                     memory_limits=None, pipeline=None):
+    """
+    Prepara el lote y lo ejecuta en un hilo de fondo sin bloquear la ventana.
+
+    El hilo solo publica eventos en una cola; la ventana la vacía cada
+    INTERVALO_REFRESCO_MS con ventana.after(), actualiza la barra, la
+    velocidad y el tiempo restante, y muestra el resumen al terminar.
+    """
+    if estado_lote is not None and estado_lote.get("control") is not None:
+        return  # Ya hay un lote en marcha
 
     # Obtener valores de reemplazo
     replacements = {key: entrada.get() for key, entrada in valores_usuario.items()}
@@ -18,56 +43,13 @@ def ejecutar_proceso(valores_usuario, imagenes_usuario, carpeta_entrada_var, car
     replacements = {k: v for k, v in replacements.items() if v is not None}
     
     # 🔥 NUEVA FUNCIONALIDAD: Detectar si hay reemplazos que requieren preservación especial de estilos
-    special_style_keys = []
-    for key in replacements.keys():
-        # Detectar patrones que usualmente tienen formato especial
-        if any(word in key.upper() for word in ['NOMBRE', 'TITULO', 'CARGO', 'EMPRESA', 'DIRECTOR']):
-            special_style_keys.append(key)
-    
-    if special_style_keys:
-        print(f"🎨 Detectados {len(special_style_keys)} campos con posible formato especial: {special_style_keys}")
+    special_style_keys = detect_special_style_keys(replacements)
 
     # 🔥 NUEVO: Separar placeholders de reemplazos de texto
-    image_replacements = {}  # Para reemplazos por texto {{LOGO}}
-    placeholder_replacements = {}  # Para placeholders de imagen
-    
-    for key, info in imagenes_usuario.items():
-        ruta = info["path_var"].get()
-        if ruta and os.path.exists(ruta):
-            # Determinar si es placeholder o reemplazo por texto
-            if key.startswith("placeholder_") or key.endswith(".png"):
-                # Es un placeholder de imagen
-                placeholder_config = {
-                    "path": ruta,
-                    "maintain_aspect": info.get("maintain_aspect", False)
-                }
-                # Agregar configuraciones adicionales si están disponibles en el config
-                if "width_cm" in info:
-                    placeholder_config["width_cm"] = info["width_cm"]
-                if "height_cm" in info:
-                    placeholder_config["height_cm"] = info["height_cm"]
-                
-                placeholder_replacements[key] = placeholder_config
-                print(f"🖼️ Placeholder configurado: {key} -> {os.path.basename(ruta)}")
-            else:
-                # Es reemplazo por texto tradicional
-                image_config = {
-                    "path": ruta,
-                    "width_cm": info.get("width_cm", 3.5),
-                    "height_cm": info.get("height_cm", 1.5)
-                }
-                
-                # Agregar configuraciones adicionales si están disponibles
-                if "resize_mode" in info:
-                    image_config["resize_mode"] = info["resize_mode"]
-                if "maintain_aspect" in info:
-                    image_config["maintain_aspect"] = info["maintain_aspect"]
-                if "alignment" in info:
-                    image_config["alignment"] = info["alignment"]
-                    
-                image_replacements[key] = image_config
-        elif ruta:  # Si hay ruta pero el archivo no existe
-            print(f"⚠️ Advertencia: La imagen {ruta} no existe, se omitirá el reemplazo para {key}")
+    image_paths = {key: info["path_var"].get() for key, info in imagenes_usuario.items()}
+    image_config = {key: {k: v for k, v in info.items() if k != "path_var"}
+                    for key, info in imagenes_usuario.items()}
+    image_replacements, placeholder_replacements = build_image_configs(image_paths, image_config)
 
     carpeta_entrada = carpeta_entrada_var.get()
     carpeta_salida = carpeta_salida_var.get()
@@ -79,166 +61,202 @@ def ejecutar_proceso(valores_usuario, imagenes_usuario, carpeta_entrada_var, car
         messagebox.showwarning("Advertencia", "Debe seleccionar una carpeta de salida.")
         return
 
-    # Contar archivos total para barra de progreso
-    total_files = 0
-    supported_extensions = (".docx", ".xlsx")
-    for dirpath, _, filenames in os.walk(carpeta_entrada):
-        for filename in filenames:
-            if filename.lower().endswith(supported_extensions):
-                total_files += 1
+    # Construir la lista de trabajos (mantiene la estructura de carpetas)
+    jobs = collect_jobs(carpeta_entrada, carpeta_salida)
+    total_files = len(jobs)
 
     if total_files == 0:
         messagebox.showinfo("Información", 
-                           f"No se encontraron archivos {', '.join(supported_extensions)} en la carpeta seleccionada.")
+                           f"No se encontraron archivos {', '.join(SUPPORTED_EXTENSIONS)} en la carpeta seleccionada.")
         return
 
+    # Compilar el buscador de claves una sola vez para todo el lote
+    matcher = compile_replacements(replacements)
+    force = bool(forzar_var and forzar_var.get())
+
     # Configurar barra de progreso
     progress_var.set(0)
     progress_bar["maximum"] = total_files
+    status_label.config(text=f"Procesando 0/{total_files}...")
+
+    control = BatchControl()
+    eventos = queue.Queue()
+    if estado_lote is None:
+        estado_lote = {}
+    estado_lote.pop("ultimo", None)
+    estado_lote.update({"control": control, "inicio": time.time(), "pausado_desde": None,
+                        "tiempo_pausado": 0.0, "procesados": 0, "completados": 0})
+    # Cualquier widget sirve para programar el vaciado de la cola en el bucle de Tk
+    temporizador = ventana if ventana is not None else progress_bar
+    _actualizar_botones(botones, ejecutando=True)
+
+    def lote_en_segundo_plano():
+        start_time = time.time()
+        try:
+            # 🔥 NUEVO: Los archivos se reparten en un pool de procesos; los resultados llegan en orden
+            # Los archivos sin cambios desde la última ejecución se omiten (manifiesto en la carpeta de salida)
+            resultados = run_incremental_batch(
+                jobs,
+                carpeta_salida,
+                replacements=matcher,
+                image_replacements=image_replacements,
+                placeholder_replacements=placeholder_replacements,
+                workers=workers,
+                progress_callback=lambda completados, total, resultado: eventos.put(
+                    ("progreso", completados, total, resultado)),
+                word_options=word_options,
+                excel_options=excel_options,
+                template_cache=template_cache,
+                image_cache=image_cache,
+                prescan=prescan,
+                memory_limits=memory_limits,
+                pipeline=pipeline,
+                force=force,
+                control=control
+            )
+
+            resumen = summarize_results(resultados, special_style_keys)
+            if perfilar and not control.cancelled:
+                # Perfiles cProfile de los archivos más lentos ("profile_slowest" en config.json)
+                resumen["perfiles"] = profile_slowest(
+                    jobs, resultados, perfilar, os.path.join(carpeta_salida, "perfiles"),
+                    matcher, image_replacements, placeholder_replacements, word_options, excel_options
+                )
+            duration = time.time() - start_time
+
+            # 🔥 MEJORADO: Log más detallado con información de estilos
+            log_path = os.path.join(carpeta_salida, LOG_FILENAME)
+            write_report(log_path, resumen, duration, replacements,
+                         image_replacements, placeholder_replacements, special_style_keys)
+            eventos.put(("fin", resumen, duration))
+        except Exception as e:
+            logger.exception("❌ Error ejecutando el lote: %s", e)
+            eventos.put(("error", str(e)))
+
+    threading.Thread(target=lote_en_segundo_plano, name="lote-documentos", daemon=True).start()
+
+    def drenar_eventos():
+        final = None
+        try:
+            while True:
+                evento = eventos.get_nowait()
+                if evento[0] == "progreso":
+                    _, completados, total, resultado = evento
+                    estado_lote["completados"] = completados
+                    if not resultado.get("skipped"):
+                        estado_lote["procesados"] += 1
+                    estado_lote["ultimo"] = resultado["relative_input"]
+                else:
+                    final = evento
+        except queue.Empty:
+            pass
+
+        completados = estado_lote["completados"]
+        progress_var.set(completados)
+        if "ultimo" in estado_lote:
+            prefijo = "⏸️ En pausa" if control.paused else "Procesado"
+            status_label.config(text=f"{prefijo}: {estado_lote['ultimo']} ({completados}/{total_files})")
+        if velocidad_label is not None:
+            velocidad_label.config(text=_texto_velocidad(estado_lote, total_files))
+
+        if final is None:
+            temporizador.after(INTERVALO_REFRESCO_MS, drenar_eventos)
+            return
+
+        estado_lote["control"] = None
+        _actualizar_botones(botones, ejecutando=False)
+        if final[0] == "error":
+            status_label.config(text="Proceso interrumpido por un error")
+            messagebox.showerror("Error", f"El proceso se detuvo por un error:\n{final[1]}")
+        else:
+            _mostrar_resumen(final[1], final[2], status_label)
+
+    temporizador.after(INTERVALO_REFRESCO_MS, drenar_eventos)
+
+
+def _texto_velocidad(estado_lote, total_files):
+    """Archivos por segundo (sin contar omitidos ni pausas) y tiempo restante estimado."""
+    ahora = time.time()
+    pausado = estado_lote["tiempo_pausado"]
+    if estado_lote["pausado_desde"] is not None:
+        pausado += ahora - estado_lote["pausado_desde"]
+    activo = max(ahora - estado_lote["inicio"] - pausado, 1e-6)
+    velocidad = estado_lote["procesados"] / activo
+    restantes = total_files - estado_lote["completados"]
+    if not velocidad:
+        return f"⚡ -- archivos/s · ⏳ {restantes} restantes"
+    eta = int(restantes / velocidad)
+    return f"⚡ {velocidad:.1f} archivos/s · ⏳ ETA {eta // 60:d}:{eta % 60:02d} ({restantes} restantes)"
+
+
+def _actualizar_botones(botones, ejecutando):
+    if not botones:
+        return
+    botones["procesar"].config(state="disabled" if ejecutando else "normal")
+    botones["pausa"].config(state="normal" if ejecutando else "disabled", text="⏸️ Pausar")
+    botones["cancelar"].config(state="normal" if ejecutando else "disabled")
+
 
-    procesados = 0
-    errores = []
-    archivos_procesados = []
-    archivos_con_estilos_preservados = []  # 🔥 NUEVO: Rastrear preservación de estilos
-
-    for dirpath, _, filenames in os.walk(carpeta_entrada):
-        for filename in filenames:
-            if filename.lower().endswith(supported_extensions):
-                input_path = os.path.join(dirpath, filename)
-
-                # Mantener estructura de carpetas
-                relative_path = os.path.relpath(dirpath, carpeta_entrada)
-                output_dir = os.path.join(carpeta_salida, relative_path)
-                os.makedirs(output_dir, exist_ok=True)
-
-                output_path = os.path.join(output_dir, filename)
-                relative_input = os.path.relpath(input_path, carpeta_entrada)
-
-                # Actualizar status
-                status_label.config(text=f"Procesando: {relative_input}")
-                status_label.update()
-
-                try:
-                    print(f"Procesando {relative_input} -> {output_path}")
-
-                    if filename.lower().endswith(".docx"):
-                        # 🔥 MEJORA: Usar versión con preservación de estilos Y placeholders
-                        process_word_file(
-                            input_path=input_path,
-                            output_path=output_path,
-                            replacements=replacements,
-                            image_replacements=image_replacements,
-                            placeholder_replacements=placeholder_replacements  # 🔥 NUEVO
-                        )
-                        
-                        # 🔥 NUEVO: Marcar si este archivo tenía campos con estilos especiales
-                        if special_style_keys:
-                            archivos_con_estilos_preservados.append(relative_input)
-
-                    elif filename.lower().endswith(".xlsx"):
-                        process_excel_file(
-                            input_path=input_path,
-                            output_path=output_path,
-                            replacements=replacements,
-                            image_replacements=image_replacements,
-                            placeholder_replacements=placeholder_replacements
-                        )
-
-                    procesados += 1
-                    archivos_procesados.append(relative_input)
-
-                except Exception as e:
-                    tipo = "Word" if filename.lower().endswith(".docx") else "Excel"
-                    error_msg = f"[{tipo}] {relative_input} -> {str(e)}"
-                    print(f"⚠️ Error en {error_msg}")
-                    errores.append(error_msg)
-
-                # Actualizar barra de progreso
-                progress_var.set(procesados + len(errores))
-                progress_bar.update()
-
-    end_time = time.time()
-    duration = end_time - start_time
+def alternar_pausa(estado_lote, boton_pausa):
+    """Pausa o reanuda el lote en curso (los archivos en proceso terminan)."""
+    control = estado_lote.get("control")
+    if control is None:
+        return
+    if control.paused:
+        estado_lote["tiempo_pausado"] += time.time() - estado_lote["pausado_desde"]
+        estado_lote["pausado_desde"] = None
+        control.resume()
+        boton_pausa.config(text="⏸️ Pausar")
+    else:
+        estado_lote["pausado_desde"] = time.time()
+        control.pause()
+        boton_pausa.config(text="▶️ Reanudar")
+
+
+def cancelar_proceso(estado_lote, status_label=None):
+    """Cancela el lote en curso: no se empiezan más archivos."""
+    control = estado_lote.get("control")
+    if control is None or control.cancelled:
+        return
+    if estado_lote.get("pausado_desde") is not None:
+        estado_lote["tiempo_pausado"] += time.time() - estado_lote["pausado_desde"]
+        estado_lote["pausado_desde"] = None
+    control.cancel()
+    if status_label is not None:
+        status_label.config(text="⏹️ Cancelando... (terminando los archivos en curso)")
+
+
+def _mostrar_resumen(resumen, duration, status_label):
+    procesados = resumen["procesados"]
+    errores = resumen["errores"]
+    archivos_con_estilos_preservados = resumen["archivos_con_estilos_preservados"]
+    omitidos = len(resumen["archivos_omitidos"])
+    cancelados = len(resumen["archivos_cancelados"])
 
     # Limpiar status
-    status_label.config(text="Proceso completado")
-
-    # 🔥 MEJORADO: Log más detallado con información de estilos
-    log_path = os.path.join(carpeta_salida, "proceso_detallado_log.txt")
-    with open(log_path, "w", encoding="utf-8") as f:
-        f.write("=== REPORTE DETALLADO DE PROCESAMIENTO ===\n\n")
-        f.write(f"Fecha: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Tiempo total: {duration:.2f} segundos\n")
-        f.write(f"Archivos procesados: {procesados}\n")
-        f.write(f"Archivos con errores: {len(errores)}\n")
-        f.write(f"Archivos con estilos preservados: {len(archivos_con_estilos_preservados)}\n\n")
-        
-        if replacements:
-            f.write("=== REEMPLAZOS DE TEXTO APLICADOS ===\n")
-            for key, value in replacements.items():
-                style_note = " (⭐ ESTILO PRESERVADO)" if key in special_style_keys else ""
-                f.write(f"{key} -> {value}{style_note}\n")
-            f.write("\n")
-        
-        if image_replacements:
-            f.write("=== REEMPLAZOS DE IMÁGENES POR TEXTO APLICADOS ===\n")
-            for key, value in image_replacements.items():
-                if isinstance(value, dict):
-                    f.write(f"{key} -> {value['path']} ")
-                    f.write(f"[{value.get('width_cm', 'auto')}x{value.get('height_cm', 'auto')} cm]\n")
-                else:
-                    f.write(f"{key} -> {value}\n")
-            f.write("\n")
-        
-        if placeholder_replacements:
-            f.write("=== REEMPLAZOS DE PLACEHOLDERS APLICADOS ===\n")
-            for key, value in placeholder_replacements.items():
-                if isinstance(value, dict):
-                    f.write(f"{key} -> {value['path']} (maintain_aspect: {value.get('maintain_aspect', False)})\n")
-                else:
-                    f.write(f"{key} -> {value}\n")
-            f.write("\n")
-
-        if archivos_procesados:
-            f.write("=== ARCHIVOS PROCESADOS CORRECTAMENTE ===\n")
-            for archivo in archivos_procesados:
-                style_marker = " 🎨" if archivo in archivos_con_estilos_preservados else ""
-                f.write(f"✓ {archivo}{style_marker}\n")
-            f.write("\n")
-        
-        if archivos_con_estilos_preservados:
-            f.write("=== ARCHIVOS CON PRESERVACIÓN DE ESTILOS ===\n")
-            f.write("Los siguientes archivos tenían texto con formato especial que fue preservado:\n")
-            for archivo in archivos_con_estilos_preservados:
-                f.write(f"🎨 {archivo}\n")
-            f.write("\n")
-
-        if errores:
-            f.write("=== ARCHIVOS CON ERRORES ===\n")
-            for err in errores:
-                f.write(f"✗ {err}\n")
-        
-        # 🔥 NUEVO: Estadísticas adicionales
-        f.write("\n=== ESTADÍSTICAS ADICIONALES ===\n")
-        f.write(f"Promedio de tiempo por archivo: {duration/max(procesados, 1):.2f} segundos\n")
-        f.write(f"Tasa de éxito: {(procesados/(procesados + len(errores))*100):.1f}%\n")
-        f.write(f"Campos con preservación de estilos: {len(special_style_keys)}\n")
+    status_label.config(text="Proceso cancelado" if cancelados else "Proceso completado")
 
     # 🔥 MEJORADO: Mensaje final más informativo
-    if errores:
+    if errores or cancelados:
         mensaje = (
             f"✔️ {procesados} documentos procesados correctamente.\n"
+            f"⏭️ {omitidos} documentos sin cambios omitidos.\n"
             f"❌ {len(errores)} documentos con errores.\n"
+            f"⏹️ {cancelados} documentos sin procesar (cancelado).\n"
             f"🎨 {len(archivos_con_estilos_preservados)} documentos con estilos preservados.\n"
+            f"✏️ {resumen['reemplazos_texto']} reemplazos de texto, {resumen['reemplazos_imagen']} imágenes.\n"
             f"🕒 Tiempo: {duration:.2f} segundos.\n\n"
             f"📄 Revisa 'proceso_detallado_log.txt' para más detalles."
         )
-        messagebox.showwarning("Proceso completado con errores", mensaje)
+        titulo = "Proceso cancelado" if cancelados else "Proceso completado con errores"
+        messagebox.showwarning(titulo, mensaje)
     else:
         mensaje = (
             f"🎉 ¡Proceso completado exitosamente!\n\n"
             f"✔️ {procesados} documentos procesados.\n"
+            f"⏭️ {omitidos} sin cambios omitidos.\n"
             f"🎨 {len(archivos_con_estilos_preservados)} con estilos preservados.\n"
+            f"✏️ {resumen['reemplazos_texto']} reemplazos de texto, {resumen['reemplazos_imagen']} imágenes.\n"
             f"🕒 Tiempo: {duration:.2f} segundos\n"
             f"⚡ Promedio: {duration/max(procesados, 1):.1f}s por archivo\n\n"
             f"📄 Log detallado: 'proceso_detallado_log.txt'"
@@ -268,10 +286,10 @@ def seleccionar_imagen(info):
                 with Image.open(ruta) as img:
                     width, height = img.size
                     file_size = os.path.getsize(ruta) / 1024  # KB
-                    print(f"📷 Imagen seleccionada: {os.path.basename(ruta)} "
-                          f"({width}x{height}px, {file_size:.1f}KB)")
+                    logger.info("📷 Imagen seleccionada: %s (%dx%dpx, %.1fKB)",
+                                os.path.basename(ruta), width, height, file_size)
             except Exception:
-                print(f"📷 Imagen seleccionada: {os.path.basename(ruta)}")
+                logger.info("📷 Imagen seleccionada: %s", os.path.basename(ruta))
         else:
             messagebox.showerror("Error", "El archivo seleccionado no existe.")
 
@@ -317,7 +335,8 @@ def crear_config_ejemplo():
                 "height_cm": 1.5,
                 "resize_mode": "auto_detect"
             }
-        }
+        },
+        "log_level": "WARNING"
     }
     
     try:
@@ -325,7 +344,7 @@ def crear_config_ejemplo():
             json.dump(config_ejemplo, f, indent=4, ensure_ascii=False)
         return True
     except Exception as e:
-        print(f"Error creando config.json: {e}")
+        logger.error("Error creando config.json: %s", e)
         return False
 
 
@@ -357,8 +376,42 @@ def main():
         messagebox.showerror("Error", f"Error al cargar config.json: {str(e)}")
         return
 
+    # Por defecto solo advertencias y errores ("log_level": "INFO" o "DEBUG" para más detalle)
+    try:
+        configure_logging(config.get("log_level"))
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        return
+
     replacements_config = config.get("replacements", {})
     image_replacements_config = config.get("image_replacements", {})
+    workers = config.get("workers")  # None = usar todos los núcleos
+    passthrough_save = config.get("passthrough_save", False)
+    # Copiar sin cargar los archivos sin claves ni imágenes que reemplazar
+    prescan = config.get("prescan", True)
+    # Perfilar con cProfile los N archivos más lentos de cada lote (0 = desactivado)
+    perfilar = config.get("profile_slowest", 0)
+    word_options = {"engine": config.get("word_engine", "docx"), "passthrough_save": passthrough_save}
+    excel_options = {"engine": config.get("excel_engine", "openpyxl"), "passthrough_save": passthrough_save}
+    # Caché de plantillas opcional: {"max_entries": 64, "max_mb": 256}
+    template_cache = None
+    if config.get("template_cache"):
+        cache_config = config["template_cache"]
+        template_cache = {
+            "max_entries": cache_config.get("max_entries", 64),
+            "max_bytes": int(cache_config.get("max_mb", 256) * 1024 * 1024),
+        }
+        # La caché vive en el proceso de la interfaz: los workers de un pool se
+        # crean y destruyen en cada lote y no conservarían nada entre ejecuciones
+        if workers != 1:
+            logger.info("ℹ️ Caché de plantillas activada: el lote se procesa en un solo proceso")
+            workers = 1
+    # Caché de imágenes de reemplazo: {"max_mb": 128, "target_dpi": 150, "jpeg_quality": 85}
+    image_cache = build_image_cache_options(config.get("image_cache"))
+    # Límites de memoria del lote: {"budget_mb": 4096, "worker_rss_mb": 2048, "max_tasks_per_child": 50}
+    memory_limits = build_memory_options(config.get("memory"))
+    # Lectura anticipada y escritura en segundo plano (carpetas de red): "pipeline": true
+    pipeline = build_pipeline_options(config.get("pipeline"))
 
     # Crear ventana principal
     ventana = tk.Tk()
@@ -475,6 +528,25 @@ def main():
     status_label = ttk.Label(frame_progreso, text="Listo para procesar", foreground="green")
     status_label.pack(pady=5)
 
+    velocidad_label = ttk.Label(frame_progreso, text="", foreground="#7f8c8d")
+    velocidad_label.pack(pady=(0, 5))
+
+    # Pausa y cancelación del lote en curso
+    estado_lote = {"control": None}
+    frame_control = ttk.Frame(frame_progreso)
+    frame_control.pack(pady=5)
+    boton_pausa = ttk.Button(frame_control, text="⏸️ Pausar", state="disabled",
+                             command=lambda: alternar_pausa(estado_lote, boton_pausa))
+    boton_pausa.pack(side="left", padx=5)
+    boton_cancelar = ttk.Button(frame_control, text="⏹️ Cancelar", state="disabled",
+                                command=lambda: cancelar_proceso(estado_lote, status_label))
+    boton_cancelar.pack(side="left", padx=5)
+
+    # Por defecto solo se procesan los archivos que cambiaron desde la última ejecución
+    forzar_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(frame_progreso, text="Forzar reprocesado completo (ignorar archivos sin cambios)",
+                    variable=forzar_var).pack(pady=5)
+
     # Botón de procesar
     boton_procesar = tk.Button(
         scrollable_frame,
@@ -482,7 +554,13 @@ def main():
         command=lambda: ejecutar_proceso(
             valores_usuario, imagenes_usuario, 
             carpeta_entrada_var, carpeta_salida_var,
-            progress_var, progress_bar, status_label
+            progress_var, progress_bar, status_label,
+            workers=workers, word_options=word_options, excel_options=excel_options,
+            template_cache=template_cache, image_cache=image_cache, forzar_var=forzar_var,
+            prescan=prescan, ventana=ventana, velocidad_label=velocidad_label,
+            botones={"procesar": boton_procesar, "pausa": boton_pausa, "cancelar": boton_cancelar},
+            estado_lote=estado_lote, perfilar=perfilar, memory_limits=memory_limits,
+            pipeline=pipeline
         ),
         bg="#27ae60", fg="white", font=("Arial", 12, "bold"),
         padx=20, pady=10
@@ -505,6 +583,12 @@ def main():
     y = (ventana.winfo_screenheight() // 2) - (750 // 2)
     ventana.geometry(f"750x750+{x}+{y}")
 
+    # Al cerrar la ventana con un lote en marcha no se empiezan más archivos
+    def cerrar_ventana():
+        cancelar_proceso(estado_lote)
+        ventana.destroy()
+
+    ventana.protocol("WM_DELETE_WINDOW", cerrar_ventana)
     ventana.mainloop()
 
 
@@ -0,0 +1,730 @@
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from processor.word_editor import process_word_file
+from processor.excel_editor import process_excel_file
+from processor.image_assets import configure_image_cache, preload_image_assets
+from processor.memory import MemoryEstimator, current_rss, track_peak_memory
+from processor.pipeline import Prefetcher, write_output
+from processor.manifest import BatchManifest, file_signature, settings_fingerprint, skipped_result
+from processor.prescan import copy_file_fast, needs_processing
+from processor.template_cache import configure_template_cache
+from processor.utils import add_phase_time, configure_logging, current_log_level, timed_phase
+
+SUPPORTED_EXTENSIONS = (".docx", ".xlsx")
+
+# Configuración compartida por todas las tareas de un proceso worker.
+# Se rellena una sola vez en el inicializador del pool (no viaja con cada tarea).
+_WORKER_CONFIG = {}
+# Archivos procesados por este worker (ver memory_limits de run_batch)
+_WORKER_STATE = {"tasks": 0}
+# Cada cuánto revisa run_batch la pausa/cancelación mientras espera resultados
+_CONTROL_POLL_SECONDS = 0.2
+# ProcessPoolExecutor(max_tasks_per_child=...) existe desde Python 3.11
+_NATIVE_MAX_TASKS_PER_CHILD = sys.version_info >= (3, 11)
+
+logger = logging.getLogger(__name__)
+
+
+class BatchControl:
+    """
+    Pausa y cancelación cooperativas de un lote, seguras entre hilos.
+
+    run_batch consulta el control antes de empezar cada archivo: en pausa deja
+    de enviar trabajos (los que están en curso terminan) y al cancelar los
+    pendientes se devuelven con "cancelled": True.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Despierta a quien espere en pausa
+
+    def wait_if_paused(self):
+        """Bloquea mientras el lote está en pausa; devuelve False si se canceló."""
+        self._running.wait()
+        return not self.cancelled
+
+
+def detect_special_style_keys(replacements: dict):
+    """Detecta claves que usualmente tienen formato especial (nombres, cargos...)."""
+    special_style_keys = []
+    for key in replacements.keys():
+        if any(word in key.upper() for word in ['NOMBRE', 'TITULO', 'CARGO', 'EMPRESA', 'DIRECTOR']):
+            special_style_keys.append(key)
+
+    if special_style_keys:
+        logger.info("🎨 Detectados %d campos con posible formato especial: %s",
+                    len(special_style_keys), special_style_keys)
+    return special_style_keys
+
+
+def build_image_configs(image_paths: dict, image_config: dict = None):
+    """
+    Separa las imágenes elegidas en placeholders y reemplazos por marcador de texto.
+
+    Args:
+        image_paths: Clave de config.json -> ruta de la imagen elegida
+        image_config: Sección "image_replacements" de config.json
+
+    Returns:
+        (image_replacements, placeholder_replacements)
+    """
+    if image_config is None:
+        image_config = {}
+
+    image_replacements = {}  # Para reemplazos por texto {{LOGO}}
+    placeholder_replacements = {}  # Para placeholders de imagen
+
+    for key, ruta in image_paths.items():
+        info = image_config.get(key)
+        if not isinstance(info, dict):
+            info = {}
+
+        if ruta and os.path.exists(ruta):
+            # Determinar si es placeholder o reemplazo por texto
+            if key.startswith("placeholder_") or key.endswith(".png"):
+                placeholder_config = {
+                    "path": ruta,
+                    "maintain_aspect": info.get("maintain_aspect", False)
+                }
+                # Agregar configuraciones adicionales si están disponibles en el config
+                if "width_cm" in info:
+                    placeholder_config["width_cm"] = info["width_cm"]
+                if "height_cm" in info:
+                    placeholder_config["height_cm"] = info["height_cm"]
+
+                placeholder_replacements[key] = placeholder_config
+                logger.info("🖼️ Placeholder configurado: %s -> %s", key, os.path.basename(ruta))
+            else:
+                image_replacement = {
+                    "path": ruta,
+                    "width_cm": info.get("width_cm", 3.5),
+                    "height_cm": info.get("height_cm", 1.5)
+                }
+                for option in ("resize_mode", "maintain_aspect", "alignment"):
+                    if option in info:
+                        image_replacement[option] = info[option]
+
+                image_replacements[key] = image_replacement
+        elif ruta:  # Si hay ruta pero el archivo no existe
+            logger.warning("⚠️ Advertencia: La imagen %s no existe, se omitirá el reemplazo para %s", ruta, key)
+
+    return image_replacements, placeholder_replacements
+
+
+def build_image_cache_options(cache_config: dict = None, target_dpi: int = None):
+    """
+    Parámetros de configure_image_cache a partir de la sección "image_cache" de config.json.
+
+    Formato: {"max_mb": 128, "target_dpi": 150, "jpeg_quality": 85}; target_dpi
+    (si se indica) tiene prioridad sobre el del archivo. Devuelve None si no hay nada que ajustar.
+    """
+    cache_config = dict(cache_config or {})
+    if target_dpi is not None:
+        cache_config["target_dpi"] = target_dpi
+    if not cache_config:
+        return None
+    options = {"max_bytes": int(cache_config.get("max_mb", 128) * 1024 * 1024)}
+    if cache_config.get("target_dpi"):
+        options["target_dpi"] = int(cache_config["target_dpi"])
+    if "jpeg_quality" in cache_config:
+        options["jpeg_quality"] = int(cache_config["jpeg_quality"])
+    return options
+
+
+def collect_jobs(carpeta_entrada: str, carpeta_salida: str):
+    """
+    Construye la lista de archivos a procesar manteniendo la estructura de carpetas.
+
+    Una sola pasada con os.scandir (mismo orden que os.walk): cada trabajo
+    guarda además el tamaño y mtime de la entrada, que usan la planificación
+    de run_batch y el manifiesto sin volver a consultar el disco.
+    """
+    jobs = []
+    pending_dirs = [carpeta_entrada]
+    while pending_dirs:
+        dirpath = pending_dirs.pop()
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(SUPPORTED_EXTENSIONS) and entry.is_file():
+                        stat = entry.stat()
+                        relative_input = os.path.relpath(entry.path, carpeta_entrada)
+                        jobs.append({
+                            "input_path": entry.path,
+                            "output_path": os.path.normpath(os.path.join(carpeta_salida, relative_input)),
+                            "relative_input": relative_input,
+                            "kind": "word" if entry.name.lower().endswith(".docx") else "excel",
+                            "size": stat.st_size,
+                            "mtime_ns": stat.st_mtime_ns,
+                        })
+        except OSError as e:
+            # Igual que os.walk: una carpeta ilegible no detiene el lote
+            logger.warning("⚠️ No se pudo leer la carpeta %s: %s", dirpath, e)
+            continue
+        pending_dirs.extend(reversed(subdirs))
+    return jobs
+
+
+def create_output_dirs(jobs):
+    """Crea de una vez las carpetas de salida de todos los trabajos (una llamada por carpeta)."""
+    for directory in sorted({os.path.dirname(job["output_path"]) for job in jobs}):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+
+def schedule_jobs(jobs):
+    """
+    Orden de envío al pool: primero los archivos más grandes (LPT).
+
+    Así un libro enorme al final de la lista no deja a los demás workers
+    esperando; los resultados se siguen devolviendo en el orden de jobs.
+    """
+    return sorted(range(len(jobs)), key=lambda index: jobs[index].get("size", 0), reverse=True)
+
+
+class _PendingJobs:
+    """
+    Archivos aún sin enviar, en el orden de schedule_jobs.
+
+    Con presupuesto de memoria, pop_fitting busca el primero que quepa sin
+    recorrer la cola: por cada motor los archivos se guardan de mayor a menor
+    estimación (que crece con el tamaño sea cual sea el factor aprendido), así
+    que basta una búsqueda binaria. Cada estimación se calcula una vez y solo
+    se rehace si learn cambió el factor de su motor.
+    """
+
+    def __init__(self, jobs, order, estimator=None, key_for=None):
+        self.jobs = jobs
+        self.order = list(order)  # Índices pendientes (Prefetcher.fill lee los primeros)
+        self._ranks = list(range(len(self.order)))  # Posición de cada uno en el orden original
+        self._estimator = estimator
+        self._keys = {}
+        self._estimates = {}  # índice -> (factor usado, bytes estimados)
+        self._by_key = {}  # motor -> [(posición, índice)] de mayor a menor estimación
+        if estimator is None:
+            return
+        for rank, index in enumerate(self.order):
+            key = self._keys[index] = key_for(jobs[index])
+            self._by_key.setdefault(key, []).append((rank, index))
+        for entries in self._by_key.values():
+            entries.sort(key=lambda entry: (-self.estimate(entry[1]), entry[0]))
+
+    def __len__(self):
+        return len(self.order)
+
+    def estimate(self, index):
+        """Memoria estimada del archivo, recalculada solo si cambió el factor de su motor."""
+        key = self._keys[index]
+        factor = self._estimator.factors.get(key)
+        cached = self._estimates.get(index)
+        if cached is None or cached[0] != factor:
+            cached = self._estimates[index] = (factor, self._estimator.estimate(self.jobs[index], key))
+        return cached[1]
+
+    def pop_next(self):
+        """Saca el siguiente archivo en orden, sin mirar la memoria."""
+        del self._ranks[0]
+        return self.order.pop(0)
+
+    def pop_fitting(self, free):
+        """Saca el primer archivo (en orden) cuya estimación quepa en `free`; None si no hay ninguno."""
+        best = None
+        for key, entries in self._by_key.items():
+            low, high = 0, len(entries)
+            while low < high:
+                middle = (low + high) // 2
+                if self.estimate(entries[middle][1]) <= free:
+                    high = middle
+                else:
+                    low = middle + 1
+            if low < len(entries) and (best is None or entries[low][0] < best[1][0]):
+                best = (entries, entries[low], low)
+        if best is None:
+            return None
+        entries, (rank, index), position = best
+        del entries[position]
+        position = bisect_left(self._ranks, rank)
+        del self._ranks[position]
+        del self.order[position]
+        return index
+
+
+def _init_worker(config):
+    """Recibe los reemplazos, imágenes y opciones una vez por proceso worker."""
+    _WORKER_CONFIG.update(config)
+    configure_logging(config.get("log_level"))
+    _prepare_image_assets(config)
+
+
+def _prepare_image_assets(config):
+    """Lee y decodifica las imágenes de reemplazo una vez, antes del primer archivo."""
+    if config.get("image_cache"):
+        configure_image_cache(**config["image_cache"])
+    preload_image_assets(config.get("image_replacements"), config.get("placeholder_replacements"))
+
+
+def process_job(job: dict, config: dict = None):
+    """
+    Procesa un archivo y devuelve su resultado; nunca propaga la excepción.
+
+    Con memory_limits en la configuración mide además el pico de memoria del
+    archivo (stats["peak_memory"]) y la RSS del worker al terminar
+    (stats["worker_rss"]), y marca "recycle_worker" si el worker debe
+    reemplazarse (ver run_batch).
+
+    Si el trabajo trae "input_data" (modo en tubería, ver processor.pipeline)
+    se procesa en memoria y la salida vuelve en result["output_data"]; los
+    archivos copiados sin cambios no la incluyen (la salida es la entrada).
+    """
+    if config is None:
+        config = _WORKER_CONFIG
+    limits = config.get("memory_limits")
+    if not limits:
+        return _process_job(job, config)
+
+    # El pico se mide sobre la RSS al empezar el archivo: lo que el worker
+    # retiene de archivos anteriores (cachés, fragmentación) no cuenta
+    with track_peak_memory(current_rss(), limits.get("tracemalloc", False)) as usage:
+        result = _process_job(job, config)
+    result["stats"]["peak_memory"] = usage["peak"]
+    result["stats"]["worker_rss"] = usage["rss"]
+    _WORKER_STATE["tasks"] += 1
+    rss_limit = limits.get("worker_rss_bytes")
+    if rss_limit and usage["rss"] and usage["rss"] > rss_limit:
+        result["recycle_worker"] = True
+    if limits.get("recycle_after_tasks") and _WORKER_STATE["tasks"] >= limits["recycle_after_tasks"]:
+        result["recycle_worker"] = True
+    return result
+
+
+def _process_job(job: dict, config: dict):
+    start_time = time.time()
+    result = {
+        "relative_input": job["relative_input"],
+        "output_path": job["output_path"],
+        "kind": job["kind"],
+        "ok": True,
+        "error": None,
+        "stats": {},
+    }
+
+    # Fases previas a la edición (firma, pre-escaneo, copia); el editor añade las suyas
+    stats = {}
+    in_memory = job.get("input_data") is not None
+    source = io.BytesIO(job["input_data"]) if in_memory else job["input_path"]
+    target = io.BytesIO() if in_memory else job["output_path"]
+    try:
+        if config.get("record_signatures"):
+            if "input_signature" in job:
+                # Tomada al leer la entrada (modo en tubería)
+                result["input_signature"] = job["input_signature"]
+            else:
+                # Firma tomada antes de procesar: un cambio durante el proceso invalida la salida
+                with timed_phase(stats, "signature"):
+                    result["input_signature"] = file_signature(job["input_path"])
+        if not in_memory and not config.get("output_dirs_ready"):
+            os.makedirs(os.path.dirname(job["output_path"]), exist_ok=True)
+        if config.get("prescan"):
+            with timed_phase(stats, "prescan"):
+                hit = needs_processing(source, job["kind"], config["replacements"],
+                                       config["image_replacements"], config["placeholder_replacements"])
+            if not hit:
+                # Nada que reemplazar: copia directa sin cargar el documento
+                if not in_memory:
+                    with timed_phase(stats, "copy"):
+                        copy_file_fast(job["input_path"], job["output_path"])
+                stats.update({"text_replaced": 0, "images_replaced": 0, "copied": True})
+                result["stats"] = stats
+                result["duration"] = time.time() - start_time
+                return result
+        if job["kind"] == "word":
+            processor, options = process_word_file, config.get("word_options", {})
+        else:
+            processor, options = process_excel_file, config.get("excel_options", {})
+        file_stats = processor(
+            input_path=source,
+            output_path=target,
+            replacements=config["replacements"],
+            image_replacements=config["image_replacements"],
+            placeholder_replacements=config["placeholder_replacements"],
+            **options
+        )
+        for name, phase in file_stats.pop("phases", {}).items():
+            add_phase_time(stats, name, phase["wall"], phase.get("cpu"))
+        stats.update(file_stats)
+        result["stats"] = stats
+        if in_memory:
+            result["output_data"] = target.getvalue()
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = str(e)
+
+    result["duration"] = time.time() - start_time
+    return result
+
+
+def run_batch(jobs, replacements, image_replacements: dict = None,
+              placeholder_replacements: dict = None, workers: int = None,
+              progress_callback=None, word_options: dict = None, excel_options: dict = None,
+              template_cache: dict = None, image_cache: dict = None, log_level=None,
+              record_signatures: bool = False, prescan: bool = True, control: BatchControl = None,
+              memory_limits: dict = None, memory_estimator: MemoryEstimator = None,
+              pipeline: dict = None):
+    """
+    Procesa una lista de trabajos repartiéndolos en un pool de procesos.
+
+    Args:
+        jobs: Lista de trabajos (ver collect_jobs); con varios workers se envían
+            al pool de mayor a menor tamaño (ver schedule_jobs)
+        replacements: Reemplazos de texto (dict o matcher compilado)
+        image_replacements: Reemplazos de imagen por marcador de texto
+        placeholder_replacements: Placeholders de imagen
+        workers: Número de procesos (None = núcleos disponibles, 1 = en este proceso)
+        progress_callback: Función (completados, total, resultado) llamada por archivo
+        word_options: Argumentos extra para process_word_file (p. ej. {"engine": "xml"})
+        excel_options: Argumentos extra para process_excel_file
+        template_cache: Parámetros de configure_template_cache para activar la
+            caché de plantillas de este proceso (None = no tocar la configuración);
+            solo se usa con workers=1, los procesos del pool no duran más que el lote
+        image_cache: Parámetros de configure_image_cache (límite de memoria de
+            la caché de imágenes de reemplazo; None = valor por defecto)
+        log_level: Nivel de log de los workers (None = el de este proceso)
+        record_signatures: Guardar en cada resultado la firma de la entrada
+            ("input_signature", ver processor.manifest)
+        prescan: Copiar sin cargar los archivos en los que el pre-escaneo no
+            encuentra claves ni imágenes que reemplazar (ver processor.prescan)
+        control: BatchControl para pausar o cancelar el lote desde otro hilo
+        memory_limits: Límites de memoria (ver memory.build_memory_options):
+            "budget_bytes" solo deja en curso los archivos cuya memoria
+            estimada sume menos que el presupuesto (siempre al menos uno);
+            "worker_rss_bytes" y "max_tasks_per_child" reemplazan los workers
+            que superan esa RSS o ese número de archivos
+        memory_estimator: MemoryEstimator con los factores aprendidos en
+            ejecuciones anteriores (se actualiza con los picos medidos)
+        pipeline: Opciones del modo en tubería (ver pipeline.build_pipeline_options):
+            las entradas se leen por adelantado y las salidas se escriben en
+            segundo plano desde hilos de este proceso; con workers=1 el
+            proceso de los archivos corre en un hilo aparte
+
+    Returns:
+        Lista de resultados en el mismo orden que jobs; los no procesados por
+        cancelación llevan "cancelled": True.
+    """
+    config = {
+        "replacements": replacements,
+        "image_replacements": image_replacements or {},
+        "placeholder_replacements": placeholder_replacements or {},
+        "word_options": word_options or {},
+        "excel_options": excel_options or {},
+        "template_cache": template_cache,
+        "image_cache": image_cache,
+        "log_level": log_level if log_level is not None else current_log_level(),
+        "record_signatures": record_signatures,
+        "prescan": prescan,
+        "memory_limits": dict(memory_limits) if memory_limits else None,
+        "output_dirs_ready": True,
+    }
+    limits = config["memory_limits"] or {}
+    max_tasks_per_child = limits.get("max_tasks_per_child")
+    if max_tasks_per_child and not _NATIVE_MAX_TASKS_PER_CHILD:
+        # Sin soporte del pool: el worker avisa al llegar al límite y se reinicia el pool
+        limits["recycle_after_tasks"] = max_tasks_per_child
+    if limits and memory_estimator is None:
+        memory_estimator = MemoryEstimator()
+    total = len(jobs)
+    results = [None] * total
+    if not jobs:
+        return results
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, total))
+    if template_cache and workers > 1:
+        logger.warning("⚠️ La caché de plantillas solo se usa con workers=1; se ignora con %d workers",
+                       workers)
+        template_cache = config["template_cache"] = None
+    create_output_dirs(jobs)
+
+    if workers == 1 and not pipeline:
+        if template_cache:
+            configure_template_cache(**template_cache)
+        _prepare_image_assets(config)
+        for index, job in enumerate(jobs):
+            if control is not None and not control.wait_if_paused():
+                break
+            results[index] = process_job(job, config)
+            results[index].pop("recycle_worker", None)
+            _learn_memory(memory_estimator, job, results[index], word_options, excel_options)
+            if progress_callback:
+                progress_callback(index + 1, total, results[index])
+        return _fill_cancelled(jobs, results)
+
+    completed = 0
+    max_in_flight = workers * 2
+    budget = limits.get("budget_bytes")
+    pending = _PendingJobs(
+        jobs, schedule_jobs(jobs), memory_estimator if budget else None,
+        lambda job: memory_estimator.job_key(job, word_options, excel_options))
+    pool_options = {}
+    if max_tasks_per_child and _NATIVE_MAX_TASKS_PER_CHILD:
+        pool_options["max_tasks_per_child"] = max_tasks_per_child
+
+    if workers == 1:
+        # Tubería en un solo proceso: el proceso de los archivos va en un hilo y la E/S en otros
+        if template_cache:
+            configure_template_cache(**template_cache)
+        _prepare_image_assets(config)
+
+    def start_pool():
+        if workers == 1:
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix="lote")
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(config,), **pool_options)
+
+    def submit_job(job):
+        if workers == 1:
+            return executor.submit(process_job, job, config)
+        return executor.submit(process_job, job)
+
+    prefetcher = writer = None
+    write_behind = 0
+    if pipeline:
+        prefetcher = Prefetcher(jobs, pipeline["prefetch"], pipeline["readers"], record_signatures)
+        writer = ThreadPoolExecutor(max_workers=pipeline["writers"], thread_name_prefix="escritura")
+        write_behind = pipeline["write_behind"]
+
+    executor = start_pool()
+    try:
+        in_flight = {}
+        reserved = {}  # future -> memoria estimada del archivo en curso
+        writing = {}  # future de write_output -> (índice, resultado)
+        inputs = {}  # índice -> bytes leídos de los archivos en curso (modo en tubería)
+        restart = False
+
+        def finish(index, result):
+            nonlocal completed
+            results[index] = result
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total, result)
+
+        def submit_next():
+            # En pausa o cancelado no se envían más archivos; los que ya están en curso terminan
+            if control is not None and (control.paused or control.cancelled):
+                return False
+            if not pending or restart:
+                return False
+            if writer is not None and len(writing) >= write_behind:
+                # Escrituras atrasadas: no generar más salidas en memoria hasta que avancen
+                return False
+            if budget:
+                # El primero (de mayor a menor) que quepa; sin nada en curso, el siguiente aunque no quepa
+                free = budget - sum(reserved.values()) if in_flight else float("inf")
+                index = pending.pop_fitting(free)
+                if index is None:
+                    return False
+            else:
+                index = pending.pop_next()
+            job = jobs[index]
+            if prefetcher is not None:
+                try:
+                    data, signature = prefetcher.take(index)
+                except OSError as e:
+                    finish(index, _failed_result(job, str(e)))
+                    return True
+                inputs[index] = data
+                job = dict(job, input_data=data, input_signature=signature)
+            future = submit_job(job)
+            in_flight[future] = index
+            if budget:
+                reserved[future] = pending.estimate(index)
+            return True
+
+        while True:
+            if restart and not in_flight:
+                # Workers con demasiada RSS (o caídos): pool nuevo para los archivos restantes
+                logger.info("♻️ Reiniciando los procesos del lote")
+                executor.shutdown(wait=True)
+                executor = start_pool()
+                restart = False
+            while len(in_flight) < max_in_flight and submit_next():
+                pass
+            if prefetcher is not None and not (control is not None and control.cancelled):
+                prefetcher.fill(pending.order)
+            if not in_flight and not writing:
+                if control is None or control.cancelled or not control.wait_if_paused():
+                    break
+                if not submit_next():
+                    break
+                continue
+            if control is not None and control.cancelled:
+                # Los archivos aún en cola del pool no llegan a empezar
+                for future in [f for f in in_flight if f.cancel()]:
+                    inputs.pop(in_flight.pop(future), None)
+                    reserved.pop(future, None)
+                if not in_flight and not writing:
+                    break
+
+            done, _ = wait(list(in_flight) + list(writing), return_when=FIRST_COMPLETED,
+                           timeout=_CONTROL_POLL_SECONDS)
+            for future in done:
+                if future in writing:
+                    index, result = writing.pop(future)
+                    try:
+                        future.result()
+                    except OSError as e:
+                        result.update({"ok": False, "error": str(e)})
+                    finish(index, result)
+                    continue
+                index = in_flight.pop(future)
+                reserved.pop(future, None)
+                try:
+                    results[index] = future.result()
+                except BrokenProcessPool as e:
+                    # Un worker murió (p. ej. sin memoria): el pool ya no admite trabajos
+                    results[index] = _failed_result(jobs[index], str(e) or "Proceso worker terminado")
+                    restart = True
+                except Exception as e:
+                    # Fallo del propio worker (p. ej. proceso terminado)
+                    results[index] = _failed_result(jobs[index], str(e))
+                if results[index].pop("recycle_worker", False):
+                    restart = True
+                _learn_memory(memory_estimator, jobs[index], results[index], word_options, excel_options)
+                data = inputs.pop(index, None)
+                if writer is not None and results[index]["ok"]:
+                    # Salida generada en memoria (o la entrada tal cual si se copió): se guarda en segundo plano
+                    output = results[index].pop("output_data", data)
+                    writing[writer.submit(write_output, jobs[index]["output_path"], output)] = (index, results[index])
+                    continue
+                finish(index, results[index])
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if prefetcher is not None:
+            prefetcher.close()
+            writer.shutdown(wait=True)
+
+    return _fill_cancelled(jobs, results)
+
+
+def _learn_memory(estimator, job, result, word_options, excel_options):
+    """Ajusta el estimador con el pico medido de un archivo cargado y procesado."""
+    stats = result.get("stats") or {}
+    if estimator is None or not result["ok"] or stats.get("copied") or "peak_memory" not in stats:
+        return
+    estimator.learn(job, estimator.job_key(job, word_options, excel_options), stats["peak_memory"])
+
+
+def _failed_result(job: dict, error: str, **extra):
+    result = {
+        "relative_input": job["relative_input"],
+        "output_path": job["output_path"],
+        "kind": job["kind"],
+        "ok": False,
+        "error": error,
+        "stats": {},
+        "duration": 0.0,
+    }
+    result.update(extra)
+    return result
+
+
+def _fill_cancelled(jobs, results):
+    """Completa con resultados "cancelled" los archivos que no llegaron a procesarse."""
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = _failed_result(jobs[index], "Cancelado por el usuario", cancelled=True)
+    return results
+
+
+def run_incremental_batch(jobs, output_dir: str, replacements, image_replacements: dict = None,
+                          placeholder_replacements: dict = None, force: bool = False,
+                          progress_callback=None, **options):
+    """
+    run_batch que omite los archivos cuya salida sigue al día según el
+    manifiesto de `output_dir` (ver processor.manifest).
+
+    Args:
+        force: Reprocesar todo aunque el manifiesto indique que no hace falta
+        options: Resto de argumentos de run_batch (workers, word_options...)
+
+    Returns:
+        Lista de resultados en el mismo orden que jobs; los omitidos llevan
+        "skipped": True.
+    """
+    manifest = BatchManifest.load(output_dir)
+    settings = settings_fingerprint(replacements, image_replacements, placeholder_replacements,
+                                    options.get("word_options"), options.get("excel_options"),
+                                    options.get("image_cache"))
+
+    total = len(jobs)
+    results = [None] * total
+    pending = []
+    for index, job in enumerate(jobs):
+        if not force and manifest.is_current(job, settings):
+            results[index] = skipped_result(job)
+        else:
+            pending.append(index)
+
+    skipped = total - len(pending)
+    if skipped:
+        logger.info("⏭️ %d de %d archivos sin cambios desde la última ejecución", skipped, total)
+        if progress_callback:
+            for completed, result in enumerate((r for r in results if r is not None), 1):
+                progress_callback(completed, total, result)
+
+    def report_progress(completed, _, result):
+        progress_callback(skipped + completed, total, result)
+
+    if options.get("memory_limits") and options.get("memory_estimator") is None:
+        # Factores de memoria aprendidos en las ejecuciones anteriores sobre esta carpeta
+        options["memory_estimator"] = MemoryEstimator(manifest.memory_factors)
+
+    batch_results = run_batch(
+        [jobs[index] for index in pending],
+        replacements=replacements,
+        image_replacements=image_replacements,
+        placeholder_replacements=placeholder_replacements,
+        progress_callback=report_progress if progress_callback else None,
+        record_signatures=True,
+        **options
+    )
+
+    for index, result in zip(pending, batch_results):
+        results[index] = result
+        manifest.record(jobs[index], result, settings)
+    # Los archivos que ya no están en la entrada salen del manifiesto
+    current = {job["relative_input"] for job in jobs}
+    manifest.files = {key: entry for key, entry in manifest.files.items() if key in current}
+    if options.get("memory_estimator") is not None:
+        manifest.memory_factors = options["memory_estimator"].factors
+    manifest.save()
+    return results
@@ -0,0 +1,330 @@
+"""
+Punto de entrada de línea de comandos (sin interfaz gráfica).
+
+Uso:
+    python -m processor run ENTRADA SALIDA [--config config.json]
+        [--values valores.json] [--set CLAVE=VALOR ...] [--image CLAVE=RUTA ...]
+        [--workers N] [--word-engine docx|xml] [--excel-engine openpyxl|stream|shared]
+        [--passthrough-save] [--image-dpi DPI] [--log-level NIVEL] [--force] [--no-prescan]
+        [--profile-slowest N] [--profile-dir CARPETA]
+        [--memory-budget-mb MB] [--worker-rss-limit-mb MB] [--max-tasks-per-child N]
+        [--pipeline | --no-pipeline]
+    python -m processor merge PLANTILLA DATOS SALIDA [--config config.json]
+        [--pattern "{index:05d}"] [--sheet HOJA] [--image CLAVE=RUTA ...] [--image-dpi DPI]
+        [--log-level NIVEL]
+
+"run" ejecuta el mismo pipeline que main.ejecutar_proceso y "merge" genera un
+documento por fila de una fuente de datos; ninguno importa tkinter. Al
+terminar imprime un resumen JSON en stdout (los mensajes de progreso van a
+stderr) y devuelve código 1 si algún archivo falló.
+
+"run" omite los archivos sin cambios desde la ejecución anterior (manifiesto
+en la carpeta de salida, ver processor.manifest); --force los reprocesa todos.
+El reporte incluye el tiempo por fase y los archivos más lentos;
+--profile-slowest N los vuelve a procesar bajo cProfile (ver processor.profiling).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from processor.batch import (build_image_cache_options, build_image_configs, collect_jobs,
+                             detect_special_style_keys, run_incremental_batch)
+from processor.image_assets import configure_image_cache
+from processor.mail_merge import mail_merge, read_data_source
+from processor.matcher import compile_replacements
+from processor.memory import build_memory_options
+from processor.pipeline import build_pipeline_options
+from processor.profiling import profile_slowest
+from processor.report import LOG_FILENAME, summarize_results, write_report
+from processor.utils import LOG_LEVELS, configure_logging
+
+EXIT_OK = 0
+EXIT_FILE_ERRORS = 1
+EXIT_USAGE = 2
+
+
+def _parse_pairs(pairs, option):
+    """Convierte ["CLAVE=VALOR", ...] en dict."""
+    values = {}
+    for pair in pairs or []:
+        if "=" not in pair:
+            raise ValueError(f"{option} espera CLAVE=VALOR, recibido: {pair!r}")
+        key, value = pair.split("=", 1)
+        values[key] = value
+    return values
+
+
+def load_values_file(path: str):
+    """
+    Lee un archivo de valores JSON.
+
+    Acepta un dict plano {clave: valor} o {"replacements": {...}, "images": {...}}.
+    Devuelve (replacements, image_paths).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: se esperaba un objeto JSON")
+    if "replacements" in data or "images" in data:
+        return dict(data.get("replacements", {})), dict(data.get("images", {}))
+    return data, {}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m processor",
+        description="Procesamiento por lotes de documentos Word/Excel sin interfaz gráfica."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Procesa una carpeta completa")
+    run.add_argument("input_dir", help="Carpeta de entrada")
+    run.add_argument("output_dir", help="Carpeta de salida")
+    run.add_argument("--config", default="config.json", help="Ruta de config.json")
+    run.add_argument("--values", help="Archivo JSON con los valores de reemplazo")
+    run.add_argument("--set", dest="set_values", action="append", metavar="CLAVE=VALOR",
+                     help="Valor de reemplazo (repetible; tiene prioridad sobre --values)")
+    run.add_argument("--image", dest="images", action="append", metavar="CLAVE=RUTA",
+                     help="Imagen para una clave de image_replacements (repetible)")
+    run.add_argument("--workers", type=int, default=None,
+                     help="Procesos en paralelo (por defecto: 'workers' de config.json o todos los núcleos)")
+    run.add_argument("--word-engine", choices=("docx", "xml"), default=None,
+                     help="Motor para .docx (por defecto: 'word_engine' de config.json o docx)")
+    run.add_argument("--excel-engine", choices=("openpyxl", "stream", "shared"), default=None,
+                     help="Motor para .xlsx (por defecto: 'excel_engine' de config.json u openpyxl)")
+    run.add_argument("--passthrough-save", action="store_true", default=None,
+                     help="Copiar sin recomprimir las partes del paquete que no cambian")
+    run.add_argument("--image-dpi", type=int, default=None,
+                     help="Remuestrear las imágenes de reemplazo a esta resolución según su tamaño en el documento")
+    run.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, default=None,
+                     help="Detalle de los mensajes en stderr (por defecto: 'log_level' de config.json o WARNING)")
+    run.add_argument("--force", action="store_true",
+                     help="Reprocesar todos los archivos aunque no hayan cambiado desde la última ejecución")
+    run.add_argument("--no-prescan", dest="prescan", action="store_false", default=None,
+                     help="Cargar todos los archivos aunque el pre-escaneo no encuentre nada que reemplazar")
+    run.add_argument("--profile-slowest", type=int, default=None, metavar="N",
+                     help="Perfilar con cProfile los N archivos más lentos (por defecto: 'profile_slowest' de config.json o 0)")
+    run.add_argument("--profile-dir", default=None,
+                     help="Carpeta de los perfiles (por defecto: SALIDA/perfiles)")
+    run.add_argument("--memory-budget-mb", type=float, default=None,
+                     help="Memoria estimada máxima de los archivos en curso (por defecto: 'memory' de config.json)")
+    run.add_argument("--worker-rss-limit-mb", type=float, default=None,
+                     help="Reemplazar los procesos worker cuya memoria supere este límite")
+    run.add_argument("--max-tasks-per-child", type=int, default=None,
+                     help="Reemplazar cada proceso worker tras este número de archivos")
+    run.add_argument("--pipeline", action="store_true", default=None,
+                     help="Leer las entradas por adelantado y escribir las salidas en segundo plano "
+                          "(por defecto: 'pipeline' de config.json)")
+    run.add_argument("--no-pipeline", dest="pipeline", action="store_false",
+                     help="Leer, procesar y guardar cada archivo en serie dentro del worker")
+
+    merge = subparsers.add_parser("merge", help="Un documento por fila de una fuente de datos")
+    merge.add_argument("template", help="Plantilla .docx o .xlsx")
+    merge.add_argument("data", help="Fuente de datos (.csv, .jsonl o .xlsx)")
+    merge.add_argument("output_dir", help="Carpeta de salida")
+    merge.add_argument("--config", default="config.json", help="Ruta de config.json")
+    merge.add_argument("--sheet", help="Hoja de la fuente .xlsx (por defecto la activa)")
+    merge.add_argument("--pattern", default="{index:05d}",
+                       help="Patrón del nombre de salida; {index} y {COLUMNA} (por defecto: {index:05d})")
+    merge.add_argument("--image", dest="images", action="append", metavar="CLAVE=RUTA",
+                       help="Imagen para una clave de image_replacements (repetible)")
+    merge.add_argument("--image-dpi", type=int, default=None,
+                       help="Remuestrear las imágenes de reemplazo a esta resolución según su tamaño en el documento")
+    merge.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, default=None,
+                       help="Detalle de los mensajes en stderr (por defecto: 'log_level' de config.json o WARNING)")
+    return parser
+
+
+def merge_command(args, summary_stream):
+    start_time = time.time()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    configure_logging(args.log_level or config.get("log_level"))
+
+    image_replacements, placeholder_replacements = build_image_configs(
+        _parse_pairs(args.images, "--image"), config.get("image_replacements", {})
+    )
+    image_cache = build_image_cache_options(config.get("image_cache"), args.image_dpi)
+    if image_cache:
+        configure_image_cache(**image_cache)
+
+    def report_progress(completados, resultado):
+        estado = "ok" if resultado["ok"] else "error"
+        print(f"[{completados}] {estado}: {resultado['output_path']}", file=sys.stderr)
+
+    results = mail_merge(
+        args.template,
+        read_data_source(args.data, sheet=args.sheet),
+        args.output_dir,
+        # Sin sección "replacements" todas las columnas son claves
+        keys=set(config["replacements"]) if config.get("replacements") else None,
+        filename_pattern=args.pattern,
+        image_replacements=image_replacements,
+        placeholder_replacements=placeholder_replacements,
+        progress_callback=report_progress
+    )
+
+    errors = [r for r in results if not r["ok"]]
+    json.dump({
+        "total": len(results),
+        "processed": len(results) - len(errors),
+        "errors": len(errors),
+        "duration_seconds": round(time.time() - start_time, 3),
+        "files": [
+            {
+                "row": r["row"],
+                "output": r["output_path"],
+                "ok": r["ok"],
+                "error": r["error"],
+                "duration_seconds": round(r["duration"], 3),
+            }
+            for r in results
+        ],
+    }, summary_stream, ensure_ascii=False, indent=2)
+    summary_stream.write("\n")
+    summary_stream.flush()
+
+    return EXIT_FILE_ERRORS if errors else EXIT_OK
+
+
+def run_command(args, summary_stream):
+    start_time = time.time()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    configure_logging(args.log_level or config.get("log_level"))
+
+    # Los valores de config.json actúan como valores por defecto
+    replacements = dict(config.get("replacements", {}))
+    image_paths = {}
+    if args.values:
+        file_replacements, file_images = load_values_file(args.values)
+        replacements.update(file_replacements)
+        image_paths.update(file_images)
+    replacements.update(_parse_pairs(args.set_values, "--set"))
+    image_paths.update(_parse_pairs(args.images, "--image"))
+    replacements = {k: v for k, v in replacements.items() if v is not None}
+
+    special_style_keys = detect_special_style_keys(replacements)
+    image_replacements, placeholder_replacements = build_image_configs(
+        image_paths, config.get("image_replacements", {})
+    )
+
+    if not os.path.isdir(args.input_dir):
+        raise ValueError(f"La carpeta de entrada no existe: {args.input_dir}")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = collect_jobs(args.input_dir, args.output_dir)
+    workers = args.workers if args.workers is not None else config.get("workers")
+    passthrough_save = bool(args.passthrough_save or config.get("passthrough_save", False))
+    word_options = {
+        "engine": args.word_engine or config.get("word_engine", "docx"),
+        "passthrough_save": passthrough_save,
+    }
+    excel_options = {
+        "engine": args.excel_engine or config.get("excel_engine", "openpyxl"),
+        "passthrough_save": passthrough_save,
+    }
+
+    def report_progress(completados, total, resultado):
+        estado = "omitido" if resultado.get("skipped") else "ok" if resultado["ok"] else "error"
+        print(f"[{completados}/{total}] {estado}: {resultado['relative_input']}", file=sys.stderr)
+
+    results = run_incremental_batch(
+        jobs,
+        args.output_dir,
+        replacements=compile_replacements(replacements),
+        image_replacements=image_replacements,
+        placeholder_replacements=placeholder_replacements,
+        workers=workers,
+        progress_callback=report_progress,
+        word_options=word_options,
+        excel_options=excel_options,
+        image_cache=build_image_cache_options(config.get("image_cache"), args.image_dpi),
+        prescan=args.prescan if args.prescan is not None else config.get("prescan", True),
+        memory_limits=build_memory_options(config.get("memory"), args.memory_budget_mb,
+                                           args.worker_rss_limit_mb, args.max_tasks_per_child),
+        pipeline=build_pipeline_options(config.get("pipeline"), args.pipeline),
+        force=args.force
+    )
+
+    summary = summarize_results(results, special_style_keys)
+    profile_count = args.profile_slowest if args.profile_slowest is not None else config.get("profile_slowest", 0)
+    if profile_count:
+        summary["perfiles"] = profile_slowest(
+            jobs, results, profile_count, args.profile_dir or os.path.join(args.output_dir, "perfiles"),
+            replacements, image_replacements, placeholder_replacements, word_options, excel_options
+        )
+    duration = time.time() - start_time
+    log_path = os.path.join(args.output_dir, LOG_FILENAME)
+    write_report(log_path, summary, duration, replacements,
+                 image_replacements, placeholder_replacements, special_style_keys)
+
+    json.dump({
+        "total": len(results),
+        "processed": summary["procesados"],
+        "skipped": len(summary["archivos_omitidos"]),
+        "errors": len(summary["errores"]),
+        "text_replaced": summary["reemplazos_texto"],
+        "images_replaced": summary["reemplazos_imagen"],
+        "duration_seconds": round(duration, 3),
+        "log_path": log_path,
+        "phases": summary["fases"],
+        "profiles": summary.get("perfiles", []),
+        "files": [
+            {
+                "input": r["relative_input"],
+                "output": r["output_path"],
+                "kind": r["kind"],
+                "ok": r["ok"],
+                "skipped": r.get("skipped", False),
+                "error": r["error"],
+                "stats": r.get("stats", {}),
+                "duration_seconds": round(r["duration"], 3),
+            }
+            for r in results
+        ],
+    }, summary_stream, ensure_ascii=False, indent=2)
+    summary_stream.write("\n")
+    summary_stream.flush()
+
+    return EXIT_FILE_ERRORS if summary["errores"] else EXIT_OK
+
+
+@contextmanager
+def _stdout_to_stderr():
+    """
+    Envía todo lo que se imprima (incluidos los workers) a stderr mientras
+    dura el bloque y entrega un stream hacia el stdout original para el
+    resumen JSON; al salir el descriptor 1 vuelve a ser el stdout original.
+    """
+    sys.stdout.flush()
+    stdout_fd = sys.stdout.fileno()
+    summary_stream = os.fdopen(os.dup(stdout_fd), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), stdout_fd)
+    try:
+        yield summary_stream
+    finally:
+        sys.stdout.flush()
+        summary_stream.flush()
+        os.dup2(summary_stream.fileno(), stdout_fd)
+        summary_stream.close()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    with _stdout_to_stderr() as summary_stream:
+        try:
+            if args.command == "run":
+                return run_command(args, summary_stream)
+            if args.command == "merge":
+                return merge_command(args, summary_stream)
+        except (OSError, ValueError) as e:
+            print(f"❌ Error: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    return EXIT_USAGE
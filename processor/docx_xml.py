@@ -0,0 +1,178 @@
+"""
+Motor OOXML directo para reemplazo de texto en .docx.
+
+En lugar de cargar el paquete completo con python-docx, abre el zip y parsea
+con lxml solo word/document.xml, word/header*.xml y word/footer*.xml. El texto
+se reescribe directamente en los nodos w:t (incluidas las coincidencias
+partidas entre varios runs) y el resto de miembros del zip se copian en bruto,
+sin descomprimir ni recomprimir.
+"""
+import re
+import zipfile
+from lxml import etree
+from processor.matcher import compile_replacements
+from processor.package import PassthroughZipFile
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_W_P = f"{{{W_NS}}}p"
+_W_T = f"{{{W_NS}}}t"
+# Elementos de run que separan texto: una clave nunca debe cruzarlos
+_SEPARATOR_TAGS = (f"{{{W_NS}}}tab", f"{{{W_NS}}}br", f"{{{W_NS}}}cr")
+_SEPARATOR = "\x00"  # No puede aparecer en XML ni en una clave
+
+STORY_PART_RE = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+def is_story_part(name: str) -> bool:
+    """Indica si el miembro del zip es cuerpo, encabezado o pie de página."""
+    return STORY_PART_RE.match(name) is not None
+
+
+def iter_paragraph_segments(root):
+    """
+    Agrupa los w:t (y separadores) de una parte por su párrafo más cercano.
+
+    Genera listas [(elemento_t_o_None, texto), ...] en orden de documento; los
+    párrafos anidados (cuadros de texto) se tratan como párrafos propios.
+    """
+    paragraphs = {}
+    for elem in root.iter(_W_T, *_SEPARATOR_TAGS):
+        paragraph = next(elem.iterancestors(_W_P), None)
+        if paragraph is None:
+            continue
+        segments = paragraphs.setdefault(paragraph, [])
+        if elem.tag == _W_T:
+            segments.append((elem, elem.text or ""))
+        else:
+            segments.append((None, _SEPARATOR))
+    return paragraphs.values()
+
+
+def paragraph_segments(paragraph):
+    """Segmentos de un solo w:p, sin los párrafos anidados (cuadros de texto) que contenga."""
+    segments = []
+    for elem in paragraph.iter(_W_T, *_SEPARATOR_TAGS):
+        if next(elem.iterancestors(_W_P), None) is not paragraph:
+            continue
+        if elem.tag == _W_T:
+            segments.append((elem, elem.text or ""))
+        else:
+            segments.append((None, _SEPARATOR))
+    return segments
+
+
+def replace_in_segments(segments, matcher):
+    """
+    Aplica el matcher sobre el texto concatenado de un párrafo.
+
+    Cada coincidencia se escribe en el w:t donde empieza y su resto se elimina
+    de los w:t siguientes; los nodos que no toca ninguna coincidencia no se
+    modifican. Devuelve el número de reemplazos.
+    """
+    full_text = "".join(text for _, text in segments)
+    matches = list(matcher.finditer(full_text))
+    if matches:
+        apply_matches(segments, matches, matcher.replacements)
+    return len(matches)
+
+
+def apply_matches(segments, matches, values):
+    """
+    Escribe en los w:t las coincidencias ya localizadas [(inicio, fin, clave)].
+
+    `values` traduce cada clave a su texto nuevo. Devuelve la lista de nodos
+    modificados como (elemento, texto_original, xml_space_original) para poder
+    restaurarlos (ver restore_segments).
+    """
+    changed = []
+    match_index = 0
+    offset = 0
+    for elem, text in segments:
+        start, end = offset, offset + len(text)
+        offset = end
+        if elem is None or start == end:
+            continue
+
+        pieces = []
+        pos = start
+        touched = False
+        while pos < end:
+            while match_index < len(matches) and matches[match_index][1] <= pos:
+                match_index += 1
+            if match_index < len(matches) and matches[match_index][0] < end:
+                match_start, match_end, key = matches[match_index]
+                if match_start > pos:
+                    pieces.append(text[pos - start:match_start - start])
+                    pos = match_start
+                if match_start >= start:
+                    pieces.append(values[key])
+                pos = min(match_end, end)
+                touched = True
+            else:
+                pieces.append(text[pos - start:])
+                pos = end
+
+        if touched:
+            changed.append((elem, elem.text, elem.get(XML_SPACE)))
+            new_text = "".join(pieces)
+            elem.text = new_text
+            if new_text != new_text.strip():
+                elem.set(XML_SPACE, "preserve")
+
+    return changed
+
+
+def restore_segments(changed):
+    """Deshace los cambios devueltos por apply_matches."""
+    for elem, text, space in changed:
+        elem.text = text
+        if space is None:
+            elem.attrib.pop(XML_SPACE, None)
+        else:
+            elem.set(XML_SPACE, space)
+
+
+def replace_in_part(xml_bytes: bytes, matcher):
+    """Reemplaza texto en una parte XML; devuelve (bytes_o_None, reemplazos)."""
+    root = etree.fromstring(xml_bytes, _PARSER)
+    count = 0
+    for segments in iter_paragraph_segments(root):
+        count += replace_in_segments(segments, matcher)
+    if not count:
+        return None, 0
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True), count
+
+
+def replace_text_docx_xml(input_path, output_path, replacements):
+    """
+    Reemplaza texto en un .docx trabajando directamente sobre el XML.
+
+    Args:
+        input_path: Ruta (o archivo binario) del .docx de entrada
+        output_path: Ruta (o archivo binario) donde escribir el resultado
+        replacements: Diccionario de reemplazos o matcher compilado
+
+    Returns:
+        Número total de reemplazos realizados.
+    """
+    matcher = compile_replacements(replacements)
+    total = 0
+
+    # Las partes sin cambios (media, estilos, temas...) se copian sin recomprimir
+    with zipfile.ZipFile(input_path) as zin, PassthroughZipFile(output_path, input_path) as zout:
+        for info in zin.infolist():
+            if matcher and is_story_part(info.filename):
+                new_data, count = replace_in_part(zin.read(info), matcher)
+                if new_data is not None:
+                    zout.writestr(info, new_data)
+                    total += count
+                    continue
+            if not zout.copy_member(zout.source_info(info.filename)):
+                zout.writestr(info, zin.read(info))
+
+    return total
+
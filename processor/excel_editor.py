@@ -1,185 +1,283 @@
-from openpyxl import load_workbook
 from openpyxl.drawing.image import Image
 from openpyxl.utils import get_column_letter
+import io
+import logging
 import os
-from PIL import Image as PILImage
+import time
+from functools import lru_cache
+from processor.image_assets import (get_image_asset, image_source_exists, image_source_label,
+                                    is_in_memory_image, render_asset, resolve_image_sources)
+from processor.matcher import ReplacementMatcher, compile_replacements
+from processor.package import save_workbook_passthrough, save_workbook_stream
+from processor.template_cache import open_workbook
+from processor.utils import add_phase_time, process_in_memory, source_name, timed_phase
+from processor.xlsx_xml import replace_text_xlsx_shared, replace_text_xlsx_stream
+
+logger = logging.getLogger(__name__)
 
 def debug_excel_content(ws):
     """Debug específico para encontrar {{LOGO}}"""
-    print(f"🔍 Buscando marcadores en Excel...")
+    logger.info("🔍 Buscando marcadores en Excel...")
     found_markers = False
     
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.value and isinstance(cell.value, str):
-                cell_text = str(cell.value)
-                if "LOGO" in cell_text or "{{" in cell_text:
-                    print(f"   📍 Encontrado en {cell.coordinate}: '{cell_text}'")
-                    found_markers = True
+    for cell in iter_string_cells(ws):
+        if is_marker_candidate(cell.value):
+            logger.info("   📍 Encontrado en %s: '%s'", cell.coordinate, cell.value)
+            found_markers = True
     
     if not found_markers:
-        print("   ⚠️ No se encontraron marcadores {{LOGO}}")
+        logger.info("   ⚠️ No se encontraron marcadores {{LOGO}}")
     
     return found_markers
 
-def replace_text_in_excel(workbook, replacements: dict):
-    """Reemplaza texto en todas las hojas del workbook."""
-    print("📝 Procesando reemplazos de texto en Excel...")
-    replaced_count = 0
-    
-    for sheet_name in workbook.sheetnames:
-        ws = workbook[sheet_name]
-        print(f"   📄 Procesando hoja: {sheet_name}")
-        
+def is_marker_candidate(text: str):
+    """Texto que el diagnóstico de marcadores considera sospechoso."""
+    return "LOGO" in text or "{{" in text
+
+def iter_string_cells(ws):
+    """
+    Celdas de la hoja cuyo valor es texto, en orden de filas.
+
+    Recorre solo las celdas que existen en la hoja (ws._cells) en lugar del
+    rectángulo max_row × max_column de iter_rows(), que crea un Cell vacío
+    por cada coordenada en blanco: una celda con formato perdida en XFD1048576
+    ya no dispara el coste ni la memoria.
+    """
+    cells = getattr(ws, "_cells", None)
+    if cells is None:
+        # Hojas de solo lectura: no tienen almacén de celdas
         for row in ws.iter_rows():
             for cell in row:
                 if cell.value and isinstance(cell.value, str):
-                    original_text = cell.value
-                    modified_text = original_text
-                    
-                    # Aplicar reemplazos
-                    for key, value in replacements.items():
-                        if key in modified_text:
-                            modified_text = modified_text.replace(key, value)
-                            replaced_count += 1
-                            print(f"      ✏️ {key} -> {value} en celda {cell.coordinate}")
-                    
-                    # Actualizar celda si hubo cambios
-                    if modified_text != original_text:
-                        cell.value = modified_text
+                    yield cell
+        return
     
-    print(f"📝 Total reemplazos de texto: {replaced_count}")
-    return replaced_count
+    string_cells = [(key, cell) for key, cell in cells.items()
+                    if cell.value and isinstance(cell.value, str)]
+    string_cells.sort(key=lambda item: item[0])
+    for _, cell in string_cells:
+        yield cell
 
-def replace_placeholder_images_in_excel(workbook, placeholder_replacements: dict):
+def placeholder_markers(placeholder_name: str):
+    """Marcadores de texto que se reemplazan por la imagen de un placeholder (en orden de prioridad)."""
+    short_name = placeholder_name.replace('.png', '').replace('placeholder_', '').upper()
+    return (
+        f"{{{{{short_name}}}}}",
+        placeholder_name,
+        f"<<{short_name}>>",
+        f"{{LOGO}}", # Marcador genérico común
+        f"{{IMAGEN}}"
+    )
+
+@lru_cache(maxsize=32)
+def build_marker_index(placeholder_names: tuple):
     """
-    Sistema de placeholders para Excel - busca imágenes existentes y las reemplaza.
-    Esto es más limitado que Word porque Excel no tiene la misma flexibilidad.
+    Índice de marcadores de imagen, construido una vez por lote.
+
+    Devuelve (matcher, [(placeholder, marcadores)]): el matcher reúne todos los
+    marcadores y descarta en una sola búsqueda las celdas que no tienen ninguno.
+    """
+    entries = tuple((name, placeholder_markers(name)) for name in placeholder_names)
+    matcher = ReplacementMatcher({marker: marker for _, markers in entries for marker in markers})
+    return matcher, entries
+
+def visit_sheet(ws, matcher=None, valid_replacements=None, diagnostics=False, stats=None):
     """
-    print("🖼️ Procesando reemplazos de placeholders en Excel...")
+    Recorre una sola vez las celdas de texto de la hoja.
+
+    En cada celda aplica, en este orden, los reemplazos de texto, el
+    diagnóstico de marcadores (opcional) y la sustitución de marcadores de
+    texto por imágenes. Devuelve (reemplazos_de_texto, imágenes_añadidas).
+    Si se indica `stats`, acumula cells_visited, markers_found y el tiempo
+    de inserción de imágenes (fase "markers").
+    """
+    text_replaced = 0
+    images_added = 0
+    cells_visited = 0
+    markers_found = 0
+    marker_time = 0.0
+    marker_matcher, marker_entries = (None, ())
+    if valid_replacements:
+        marker_matcher, marker_entries = build_marker_index(tuple(valid_replacements))
+    if diagnostics:
+        logger.info("🔍 Buscando marcadores en Excel...")
+    found_markers = False
+    # Los mensajes por celda solo se construyen si DEBUG está activo
+    debug = logger.isEnabledFor(logging.DEBUG)
     
-    if not placeholder_replacements:
-        print("⚠️ No hay placeholders de imagen configurados para Excel")
-        return 0
+    for cell in iter_string_cells(ws):
+        cells_visited += 1
+        original_text = cell.value
+        
+        # Reemplazos de texto en una sola pasada
+        if matcher:
+            modified_text, found = matcher.replace(original_text)
+            text_replaced += len(found)
+            if debug:
+                for key in dict.fromkeys(found):
+                    logger.debug("      ✏️ %s -> %s en celda %s", key, matcher.replacements[key], cell.coordinate)
+            if modified_text != original_text:
+                cell.value = original_text = modified_text
+        
+        if diagnostics and original_text and is_marker_candidate(original_text):
+            logger.info("   📍 Encontrado en %s: '%s'", cell.coordinate, original_text)
+            found_markers = True
+        
+        if not marker_entries or not marker_matcher.search(original_text):
+            continue
+        
+        # Marcadores de imagen: uno por placeholder, sobre el texto original de la celda
+        for placeholder_name, markers in marker_entries:
+            for marker in markers:
+                if marker in original_text:
+                    logger.debug("      🎯 Marcador encontrado: %s en %s", marker, cell.coordinate)
+                    markers_found += 1
+                    start = time.perf_counter()
+                    
+                    # Limpiar el texto
+                    cell.value = original_text.replace(marker, "").strip() or None
+                    
+                    # Añadir imagen en la celda
+                    replacement_info = valid_replacements[placeholder_name]
+                    try:
+                        img_info = {
+                            'path': get_replacement_path(replacement_info),
+                            'anchor': cell.coordinate,
+                            'replacement_config': replacement_info
+                        }
+                        add_replacement_image_to_excel(ws, img_info)
+                        images_added += 1
+                        logger.debug("      ✅ Imagen añadida en %s", cell.coordinate)
+                    except Exception as e:
+                        logger.warning("❌ Error añadiendo imagen en %s: %s", cell.coordinate, e)
+                    marker_time += time.perf_counter() - start
+                    
+                    break  # Solo procesar un marcador por celda
+    
+    if diagnostics and valid_replacements and not found_markers:
+        logger.info("   ⚠️ No se encontraron marcadores {{LOGO}}")
     
-    # Verificar archivos de reemplazo
+    if stats is not None:
+        stats["cells_visited"] = stats.get("cells_visited", 0) + cells_visited
+        stats["markers_found"] = stats.get("markers_found", 0) + markers_found
+        if markers_found:
+            add_phase_time(stats, "markers", marker_time)
+    return text_replaced, images_added
+
+def replace_text_in_excel(workbook, replacements: dict):
+    """Reemplaza texto en todas las hojas del workbook."""
+    text_replaced, _ = process_workbook_cells(workbook, replacements)
+    return text_replaced
+
+def validate_placeholder_replacements(placeholder_replacements: dict):
+    """Placeholders cuyo archivo de reemplazo existe."""
     valid_replacements = {}
     for name, info in placeholder_replacements.items():
         path = get_replacement_path(info)
-        if path and os.path.exists(path):
-            print(f"✅ {name} -> {path}")
+        if path is not None and image_source_exists(path):
+            logger.debug("✅ %s -> %s", name, image_source_label(path))
             valid_replacements[name] = info
         else:
-            print(f"❌ {name} -> {path} (NO EXISTE)")
+            logger.warning("❌ %s -> %s (NO EXISTE)", name, path)
     
     if not valid_replacements:
-        print("❌ No hay archivos de reemplazo válidos")
-        return 0
+        logger.warning("❌ No hay archivos de reemplazo válidos")
+    return valid_replacements
+
+def replace_existing_images(ws, valid_replacements: dict):
+    """Reemplaza las imágenes ya presentes en la hoja por la primera imagen configurada."""
+    images_to_remove = []
+    images_to_add = []
     
-    total_replaced = 0
+    # Excel maneja las imágenes de manera diferente - están en ws._images
+    if hasattr(ws, '_images') and ws._images:
+        logger.debug("      🖼️ Encontradas %d imágenes existentes", len(ws._images))
+        
+        placeholder_name, replacement_info = next(iter(valid_replacements.items()))
+        replacement_path = get_replacement_path(replacement_info)
+        for img in ws._images:
+            logger.debug("      🔄 Reemplazando imagen en %s", img.anchor)
+            
+            # Preparar nueva imagen
+            images_to_remove.append(img)
+            images_to_add.append({
+                'path': replacement_path,
+                'anchor': img.anchor,
+                'original_width': getattr(img, 'width', None),
+                'original_height': getattr(img, 'height', None),
+                'replacement_config': replacement_info
+            })
     
+    # Remover imágenes originales
+    for img in images_to_remove:
+        if img in ws._images:
+            ws._images.remove(img)
+    
+    # Añadir imágenes nuevas
+    for img_info in images_to_add:
+        try:
+            add_replacement_image_to_excel(ws, img_info)
+            logger.debug("      ✅ Imagen reemplazada exitosamente")
+        except Exception as e:
+            logger.warning("❌ Error reemplazando imagen: %s", e)
+    
+    return len(images_to_add)
+
+def process_workbook_cells(workbook, replacements=None, placeholder_replacements: dict = None,
+                           diagnostics: bool = False, stats: dict = None):
+    """
+    Reemplazos de texto e imágenes con un único recorrido de celdas por hoja.
+
+    Si se indica `stats`, acumula en stats["phases"] las fases "images"
+    (imágenes existentes), "cells" (recorrido de celdas) y "markers"
+    (inserción de imágenes por marcador, incluida en "cells"), además de los
+    contadores de visit_sheet.
+
+    Returns:
+        (reemplazos_de_texto, imágenes_reemplazadas)
+    """
+    if stats is None:
+        stats = {}
+    matcher = compile_replacements(replacements or {})
+    valid_replacements = {}
+    if placeholder_replacements:
+        logger.debug("🖼️ Procesando reemplazos de placeholders en Excel...")
+        valid_replacements = validate_placeholder_replacements(placeholder_replacements)
+    
+    text_replaced = 0
+    images_replaced = 0
     for sheet_name in workbook.sheetnames:
         ws = workbook[sheet_name]
-        print(f"   📄 Procesando hoja: {sheet_name}")
+        logger.debug("   📄 Procesando hoja: %s", sheet_name)
         
-        # Procesar imágenes existentes en la hoja
-        images_to_remove = []
-        images_to_add = []
+        if valid_replacements:
+            with timed_phase(stats, "images"):
+                images_replaced += replace_existing_images(ws, valid_replacements)
         
-        # Excel maneja las imágenes de manera diferente - están en ws._images
-        if hasattr(ws, '_images') and ws._images:
-            print(f"      🖼️ Encontradas {len(ws._images)} imágenes existentes")
-            
-            for img in ws._images:
-                # Para cada imagen existente, intentar reemplazarla
-                if valid_replacements:
-                    placeholder_name, replacement_info = list(valid_replacements.items())[0]
-                    replacement_path = get_replacement_path(replacement_info)
-                    
-                    print(f"      🔄 Reemplazando imagen en {img.anchor}")
-                    
-                    # Preparar nueva imagen
-                    new_image_info = {
-                        'path': replacement_path,
-                        'anchor': img.anchor,
-                        'original_width': getattr(img, 'width', None),
-                        'original_height': getattr(img, 'height', None),
-                        'replacement_config': replacement_info
-                    }
-                    
-                    images_to_remove.append(img)
-                    images_to_add.append(new_image_info)
-                    total_replaced += 1
-        
-        # Remover imágenes originales
-        for img in images_to_remove:
-            if img in ws._images:
-                ws._images.remove(img)
-        
-        # Añadir imágenes nuevas
-        for img_info in images_to_add:
-            try:
-                add_replacement_image_to_excel(ws, img_info)
-                print(f"      ✅ Imagen reemplazada exitosamente")
-            except Exception as e:
-                print(f"      ❌ Error reemplazando imagen: {e}")
-        
-        # También buscar marcadores de texto que indiquen dónde poner imágenes
-        text_marker_replacements = replace_text_markers_with_images(ws, valid_replacements)
-        total_replaced += text_marker_replacements
+        with timed_phase(stats, "cells"):
+            sheet_text, sheet_images = visit_sheet(ws, matcher, valid_replacements, diagnostics, stats)
+        text_replaced += sheet_text
+        images_replaced += sheet_images
     
-    print(f"🖼️ Total placeholders reemplazados: {total_replaced}")
-    return total_replaced
+    return text_replaced, images_replaced
+
+def replace_placeholder_images_in_excel(workbook, placeholder_replacements: dict):
+    """
+    Sistema de placeholders para Excel - busca imágenes existentes y las reemplaza.
+    Esto es más limitado que Word porque Excel no tiene la misma flexibilidad.
+    """
+    if not placeholder_replacements:
+        logger.warning("⚠️ No hay placeholders de imagen configurados para Excel")
+        return 0
+    _, images_replaced = process_workbook_cells(workbook, None, placeholder_replacements)
+    return images_replaced
 
 def replace_text_markers_with_images(ws, valid_replacements):
-    debug_excel_content(ws)
     """
     Busca marcadores de texto como {{LOGO}} y los reemplaza con imágenes.
     """
-    replaced_count = 0
-    
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.value and isinstance(cell.value, str):
-                original_text = cell.value
-                
-                # Buscar marcadores de imagen en el texto
-                for placeholder_name, replacement_info in valid_replacements.items():
-                    # Buscar tanto el nombre del placeholder como marcadores de texto
-                    markers_to_check = [
-                        f"{{{{{placeholder_name.replace('.png', '').replace('placeholder_', '').upper()}}}}}",
-                        placeholder_name,
-                        f"<<{placeholder_name.replace('.png', '').replace('placeholder_', '').upper()}>>",
-                        f"{{LOGO}}", # Marcador genérico común
-                        f"{{IMAGEN}}"
-                    ]
-                    
-                    for marker in markers_to_check:
-                        if marker in original_text:
-                            print(f"      🎯 Marcador encontrado: {marker} en {cell.coordinate}")
-                            
-                            # Limpiar el texto
-                            cell.value = original_text.replace(marker, "").strip()
-                            if not cell.value:
-                                cell.value = None
-                            
-                            # Añadir imagen en la celda
-                            try:
-                                replacement_path = get_replacement_path(replacement_info)
-                                img_info = {
-                                    'path': replacement_path,
-                                    'anchor': cell.coordinate,
-                                    'replacement_config': replacement_info
-                                }
-                                add_replacement_image_to_excel(ws, img_info)
-                                replaced_count += 1
-                                print(f"      ✅ Imagen añadida en {cell.coordinate}")
-                            except Exception as e:
-                                print(f"      ❌ Error añadiendo imagen en {cell.coordinate}: {e}")
-                            
-                            break  # Solo procesar un marcador por celda
-    
-    return replaced_count
+    _, images_added = visit_sheet(ws, None, valid_replacements)
+    return images_added
 
 def add_replacement_image_to_excel(ws, img_info):
     """Añade una imagen de reemplazo a Excel."""
@@ -187,8 +285,9 @@ def add_replacement_image_to_excel(ws, img_info):
     anchor = img_info['anchor']
     config = img_info.get('replacement_config', {})
     
-    # Crear imagen
-    img = Image(replacement_path)
+    # Crear imagen desde la caché (los bytes se leen del disco una vez por lote)
+    asset = get_image_asset(replacement_path)
+    img = Image(asset.stream())
     
     # Calcular dimensiones
     if isinstance(config, dict):
@@ -212,97 +311,154 @@ def add_replacement_image_to_excel(ws, img_info):
                 img.width = 100
                 img.height = 100
                 
-                # Intentar mantener aspect ratio basado en la imagen real
-                try:
-                    with PILImage.open(replacement_path) as pil_img:
-                        pil_width, pil_height = pil_img.size
-                        aspect_ratio = pil_width / pil_height
-                        
-                        if aspect_ratio > 1:  # Más ancha
-                            img.width = 150
-                            img.height = int(150 / aspect_ratio)
-                        else:  # Más alta
-                            img.height = 150
-                            img.width = int(150 * aspect_ratio)
-                except:
-                    pass  # Usar dimensiones por defecto si falla
+                # Mantener aspect ratio basado en la imagen real (tamaño ya decodificado)
+                aspect_ratio = asset.aspect_ratio
+                if aspect_ratio > 1:  # Más ancha
+                    img.width = 150
+                    img.height = int(150 / aspect_ratio)
+                else:  # Más alta
+                    img.height = 150
+                    img.width = int(150 * aspect_ratio)
+    
+    # Con normalización activa se inserta la versión remuestreada al tamaño dibujado (96 DPI)
+    rendered = render_asset(asset, img.width * 2.54 / 96, img.height * 2.54 / 96)
+    if rendered is not asset:
+        img.ref = rendered.stream()
+        img.format = rendered.format.lower()
     
     # Añadir imagen a la hoja
     ws.add_image(img, anchor)
 
 def get_replacement_path(replacement_info):
-    """Obtiene la ruta de la imagen de reemplazo."""
-    if isinstance(replacement_info, str):
+    """Obtiene la ruta de la imagen de reemplazo (o la imagen en memoria)."""
+    if isinstance(replacement_info, str) or is_in_memory_image(replacement_info):
         return replacement_info
     elif isinstance(replacement_info, dict):
         return replacement_info.get('path')
     return None
 
-def process_excel_file(input_path: str, output_path: str, replacements: dict, 
-                      image_replacements: dict = None, placeholder_replacements: dict = None):
+def process_excel_file(input_path, output_path, replacements: dict, 
+                      image_replacements: dict = None, placeholder_replacements: dict = None,
+                      passthrough_save: bool = False, engine: str = "openpyxl",
+                      diagnostics: bool = False):
     """
     Procesa un archivo Excel con reemplazos de texto y placeholders de imagen.
     
     Args:
-        input_path: Ruta del archivo de entrada
-        output_path: Ruta del archivo de salida  
+        input_path: Ruta del archivo de entrada (o archivo binario abierto)
+        output_path: Ruta del archivo de salida (o archivo binario abierto)
         replacements: Diccionario con reemplazos de texto
         image_replacements: Reemplazos de imágenes por marcadores de texto (compatibilidad)
         placeholder_replacements: Sistema nuevo de placeholders
+        passthrough_save: Copiar sin recomprimir las partes que no cambiaron
+        engine: "openpyxl" carga el libro completo; "stream" reemplaza el texto
+            leyendo las hojas fila a fila y "shared" una vez por cadena en
+            sharedStrings.xml (ver processor.xlsx_xml); ambos solo cargan
+            openpyxl si hay imágenes que insertar
+        diagnostics: Listar las celdas con posibles marcadores de imagen (nivel INFO)
+
+    Returns:
+        Contadores del archivo: text_replaced, images_replaced y, si se cargó
+        el libro con openpyxl, sheets, cells_visited y markers_found; en
+        "phases" el tiempo de pared y CPU de cada fase (load, text, images,
+        cells, markers, save).
     """
     if image_replacements is None:
         image_replacements = {}
-    if placeholder_replacements is None:
-        placeholder_replacements = {}
+    # Copia local: la FASE 2A añade claves y el dict se comparte entre archivos del lote.
+    # Las imágenes en memoria se decodifican una vez para todo el libro
+    image_replacements = resolve_image_sources(image_replacements)
+    placeholder_replacements = dict(resolve_image_sources(placeholder_replacements) or {})
+    if engine not in ("openpyxl", "stream", "shared"):
+        raise ValueError(f"Motor de Excel desconocido: {engine}")
     
+    name = source_name(input_path)
     try:
-        print(f"\n📊 ========== PROCESANDO EXCEL: {os.path.basename(input_path)} ==========")
-        wb = load_workbook(input_path)
-        
-        print(f"📋 Información del archivo:")
-        print(f"   📄 Hojas: {len(wb.sheetnames)} ({', '.join(wb.sheetnames)})")
+        logger.info("📊 ========== PROCESANDO EXCEL: %s ==========", name)
+        source = input_path
+        stats = {"text_replaced": 0, "images_replaced": 0}
         
-        text_replaced = 0
-        images_replaced = 0
+        if engine in ("stream", "shared"):
+            replace_xml = replace_text_xlsx_stream if engine == "stream" else replace_text_xlsx_shared
+            logger.debug("📝 FASE 1: Reemplazos de texto (motor %s)...", engine)
+            if not image_replacements and not placeholder_replacements:
+                with timed_phase(stats, "text"):
+                    stats["text_replaced"] = replace_xml(input_path, output_path, replacements)
+                logger.info("✅ %s: %d reemplazos de texto, guardado en %s",
+                            name, stats["text_replaced"], source_name(output_path))
+                return stats
+            # Con imágenes: el texto se resuelve en streaming y las imágenes con openpyxl
+            source = io.BytesIO()
+            with timed_phase(stats, "text"):
+                stats["text_replaced"] = replace_xml(input_path, source, replacements)
+            source.seek(0)
+            replacements = {}
         
-        # FASE 1: Reemplazos de texto
-        if replacements:
-            print(f"\n📝 FASE 1: Procesando {len(replacements)} reemplazos de texto...")
-            text_replaced = replace_text_in_excel(wb, replacements)
+        with timed_phase(stats, "load"):
+            wb = open_workbook(source)
+        stats["sheets"] = len(wb.sheetnames)
+        logger.debug("📋 Hojas: %d (%s)", len(wb.sheetnames), ", ".join(wb.sheetnames))
         
         # FASE 2: Reemplazos de imágenes por texto (sistema legacy)
         if image_replacements:
-            print(f"\n🖼️ FASE 2A: Procesando {len(image_replacements)} reemplazos de imagen por marcador...")
+            logger.debug("🖼️ FASE 2A: Procesando %d reemplazos de imagen por marcador...",
+                         len(image_replacements))
             # Convertir image_replacements al formato de placeholder_replacements
             for key, value in image_replacements.items():
                 if key not in placeholder_replacements:
                     placeholder_replacements[f"marker_{key}"] = value
         
         # FASE 3: Sistema de placeholders
-        if placeholder_replacements:
-            print(f"\n🖼️ FASE 2B: Procesando {len(placeholder_replacements)} placeholders de imagen...")
-            for name, info in placeholder_replacements.items():
+        if placeholder_replacements and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🖼️ FASE 2B: %d placeholders de imagen...", len(placeholder_replacements))
+            for placeholder_name, info in placeholder_replacements.items():
                 path = get_replacement_path(info)
-                print(f"   📸 {name} → {os.path.basename(path) if path else 'N/A'}")
-            
-            images_replaced = replace_placeholder_images_in_excel(wb, placeholder_replacements)
+                logger.debug("   📸 %s → %s", placeholder_name, source_name(path) if path is not None else "N/A")
+        
+        # Texto, marcadores de imagen y diagnóstico en un solo recorrido por hoja
+        if replacements or placeholder_replacements:
+            logger.debug("📝 Procesando %d reemplazos de texto y marcadores de imagen...", len(replacements))
+            sheet_text, stats["images_replaced"] = process_workbook_cells(
+                wb, replacements, placeholder_replacements, diagnostics, stats
+            )
+            stats["text_replaced"] += sheet_text
         
         # Guardar archivo
-        print(f"\n💾 Guardando archivo Excel...")
-        wb.save(output_path)
+        logger.debug("💾 Guardando archivo Excel...")
+        with timed_phase(stats, "save"):
+            if passthrough_save:
+                save_workbook_passthrough(wb, output_path, source)
+            elif isinstance(output_path, (str, os.PathLike)):
+                wb.save(output_path)
+            else:
+                save_workbook_stream(wb, output_path)
         
-        print(f"✅ Archivo Excel procesado exitosamente:")
-        print(f"   📝 Reemplazos de texto: {text_replaced}")
-        print(f"   🖼️ Reemplazos de imágenes: {images_replaced}")
-        print(f"   📁 Guardado en: {output_path}")
-        print("=" * 60 + "\n")
+        logger.info("✅ %s: %d reemplazos de texto, %d imágenes, guardado en %s",
+                    name, stats["text_replaced"], stats["images_replaced"], source_name(output_path))
+        return stats
         
     except Exception as e:
-        print(f"❌ Error procesando archivo Excel: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error procesando archivo Excel %s: %s", name, e)
         raise
 
+def process_excel_bytes(source, replacements: dict, image_replacements: dict = None,
+                        placeholder_replacements: dict = None, output=None, **options):
+    """
+    process_excel_file sin archivos: entrada y salida en memoria.
+
+    Args:
+        source: Libro .xlsx como bytes, bytearray, memoryview o archivo binario abierto
+        replacements, image_replacements, placeholder_replacements: Como en
+            process_excel_file; las imágenes pueden pasarse en memoria
+        output: Archivo binario donde escribir el resultado (None = devolverlo)
+        options: engine, passthrough_save y diagnostics de process_excel_file
+
+    Returns:
+        (bytes del libro, o None si se escribió en `output`; contadores del archivo)
+    """
+    return process_in_memory(process_excel_file, source, output, replacements,
+                             image_replacements, placeholder_replacements, **options)
+
 # Función de utilidad para crear placeholders en Excel
 def create_excel_template_with_placeholders(output_path, placeholders_info):
     """
@@ -319,7 +475,7 @@ def create_excel_template_with_placeholders(output_path, placeholders_info):
     ws = wb.active
     ws.title = "Template"
     
-    print("📊 Creando template de Excel con placeholders...")
+    logger.info("📊 Creando template de Excel con placeholders...")
     
     for placeholder, position in placeholders_info.items():
         row = position.get('row', 1)
@@ -334,13 +490,16 @@ def create_excel_template_with_placeholders(output_path, placeholders_info):
         cell.font = Font(bold=True, color="FF0000")
         cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
         
-        print(f"   📍 {placeholder} en fila {row}, columna {col}")
+        logger.info("   📍 %s en fila %d, columna %d", placeholder, row, col)
     
     wb.save(output_path)
-    print(f"✅ Template creado: {output_path}")
+    logger.info("✅ Template creado: %s", output_path)
 
 # Ejemplo de uso
 if __name__ == "__main__":
+    from processor.utils import configure_logging
+    configure_logging("INFO")
+
     # Crear template de ejemplo
     create_excel_template_with_placeholders(
         "template_excel.xlsx",
@@ -0,0 +1,339 @@
+"""
+Caché de imágenes de reemplazo compartida por ambos editores.
+
+Cada imagen se lee del disco y se decodifica una sola vez por proceso: se
+guardan sus bytes, tamaño en píxeles, DPI, formato y hash de contenido, junto
+con las dimensiones de destino ya calculadas para cada configuración de
+tamaño. Las entradas se indexan por hash de contenido (dos rutas con la misma
+imagen comparten entrada) y se desalojan por LRU al superar el límite de
+memoria.
+
+Opcionalmente (target_dpi en configure_image_cache) las imágenes se remuestrean
+al tamaño con el que se dibujan en el documento y se recomprimen como PNG o
+JPEG según su contenido; cada versión se genera una vez y se reutiliza.
+
+En las configuraciones de imagen, "path" puede ser también una imagen en
+memoria (bytes, bytearray, memoryview, archivo binario abierto o ImageAsset);
+así un documento completo se genera sin leer nada del disco.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from PIL import Image as PILImage
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_JPEG_QUALITY = 85
+# Por debajo de este número de colores distintos (o con transparencia) se usa
+# PNG: logos, firmas escaneadas y gráficos planos comprimen mejor sin pérdida
+_PNG_MAX_COLORS = 256
+
+logger = logging.getLogger(__name__)
+
+
+class ImageAsset:
+    """Imagen de reemplazo decodificada una vez y reutilizable en todo el lote."""
+
+    def __init__(self, data: bytes, path: str = None):
+        self.data = data
+        self.path = path
+        self.sha1 = hashlib.sha1(data).hexdigest()
+        with PILImage.open(io.BytesIO(data)) as img:
+            self.size = img.size
+            self.format = img.format
+            self.mode = img.mode
+            self.dpi = img.info.get("dpi")
+        self._memo = {}
+        self._docx_image = None
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    @property
+    def aspect_ratio(self):
+        width, height = self.size
+        return width / height if height else 1.0
+
+    def stream(self):
+        """Archivo en memoria con los bytes de la imagen."""
+        return io.BytesIO(self.data)
+
+    def memoize(self, key, compute):
+        """Devuelve el resultado cacheado para `key` o lo calcula con compute()."""
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = self._memo[key] = compute()
+            return value
+
+    def normalized(self, width_px: int, height_px: int, dpi: int = None,
+                   jpeg_quality: int = DEFAULT_JPEG_QUALITY):
+        """
+        Versión remuestreada para cubrir width_px × height_px (memorizada).
+
+        Conserva la proporción original y nunca amplía; si el resultado no es
+        más pequeño que la imagen original se devuelve la propia imagen.
+        """
+        scale = max(width_px / self.size[0], height_px / self.size[1])
+        if scale >= 1:
+            return self
+        target = (max(1, round(self.size[0] * scale)), max(1, round(self.size[1] * scale)))
+        return self.memoize(("normalized", target, dpi, jpeg_quality),
+                            lambda: self._resample(target, dpi, jpeg_quality))
+
+    def _resample(self, target, dpi, jpeg_quality):
+        with PILImage.open(io.BytesIO(self.data)) as img:
+            img.load()
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA" if has_alpha else "RGB")
+            resized = img.resize(target, PILImage.LANCZOS)
+
+        output = io.BytesIO()
+        save_options = {"dpi": (dpi, dpi)} if dpi else {}
+        if has_alpha or resized.getcolors(_PNG_MAX_COLORS) is not None:
+            resized.save(output, format="PNG", optimize=True, **save_options)
+        else:
+            if resized.mode != "RGB":
+                resized = resized.convert("RGB")
+            resized.save(output, format="JPEG", quality=jpeg_quality, optimize=True, **save_options)
+
+        data = output.getvalue()
+        if len(data) >= len(self.data):
+            return self
+        return ImageAsset(data, self.path)
+
+    def docx_image(self):
+        """docx.image.Image construido una vez (evita releer y rehashear por inserción)."""
+        if self._docx_image is None:
+            from docx.image.image import Image as DocxImage
+            self._docx_image = DocxImage.from_blob(self.data)
+        return self._docx_image
+
+
+class ImageAssetCache:
+    """Caché LRU de ImageAsset por hash de contenido, acotada en bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, target_dpi: int = None,
+                 jpeg_quality: int = DEFAULT_JPEG_QUALITY):
+        self.max_bytes = max_bytes
+        self.target_dpi = target_dpi
+        self.jpeg_quality = jpeg_quality
+        self.total_bytes = 0
+        self._assets = OrderedDict()  # sha1 -> ImageAsset
+        self._paths = {}  # ruta absoluta -> ((mtime, tamaño), sha1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._assets)
+
+    def get(self, path: str) -> ImageAsset:
+        """Asset de la imagen en `path`; se relee solo si el archivo cambió."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            known = self._paths.get(key)
+            if known is not None and known[0] == signature and known[1] in self._assets:
+                self._assets.move_to_end(known[1])
+                return self._assets[known[1]]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        return self.add(data, path, key, signature)
+
+    def add(self, data: bytes, path: str = None, key: str = None, signature=None) -> ImageAsset:
+        """Registra una imagen a partir de sus bytes (o devuelve la ya existente)."""
+        sha1 = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            asset = self._assets.get(sha1)
+            if asset is None:
+                asset = ImageAsset(data, path)
+                self._assets[sha1] = asset
+                self.total_bytes += asset.nbytes
+            self._assets.move_to_end(sha1)
+            if key is not None:
+                self._paths[key] = (signature, sha1)
+            self._evict()
+        return asset
+
+    def _evict(self):
+        # La entrada más reciente se conserva aunque supere el límite por sí sola
+        while len(self._assets) > 1 and self.total_bytes > self.max_bytes:
+            _, evicted = self._assets.popitem(last=False)
+            self.total_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._assets.clear()
+            self._paths.clear()
+            self.total_bytes = 0
+
+
+_CACHE = ImageAssetCache()
+
+
+def get_image_asset_cache() -> ImageAssetCache:
+    return _CACHE
+
+
+def configure_image_cache(max_bytes: int = DEFAULT_MAX_BYTES, target_dpi: int = None,
+                          jpeg_quality: int = DEFAULT_JPEG_QUALITY):
+    """
+    Ajusta la caché de imágenes de este proceso.
+
+    Args:
+        max_bytes: Límite de memoria de las imágenes cacheadas
+        target_dpi: Resolución a la que se remuestrean las imágenes según su
+            tamaño en el documento (None = se insertan sin modificar)
+        jpeg_quality: Calidad de las imágenes fotográficas recomprimidas
+    """
+    with _CACHE._lock:
+        _CACHE.max_bytes = max_bytes
+        _CACHE.target_dpi = target_dpi
+        _CACHE.jpeg_quality = jpeg_quality
+        _CACHE._evict()
+    return _CACHE
+
+
+def is_in_memory_image(source):
+    """Indica si `source` es una imagen en memoria y no una ruta."""
+    return isinstance(source, (bytes, bytearray, memoryview, ImageAsset)) or hasattr(source, "read")
+
+
+def image_source_exists(source):
+    """Imagen en memoria o ruta de un archivo existente."""
+    if is_in_memory_image(source):
+        return True
+    return isinstance(source, (str, os.PathLike)) and os.path.exists(source)
+
+
+def image_source_label(source):
+    """Ruta de la imagen para los mensajes ("<memoria>" si no es una ruta)."""
+    return "<memoria>" if is_in_memory_image(source) else source
+
+
+def read_image_source(source) -> bytes:
+    """Bytes de una imagen en memoria (los archivos abiertos se leen desde el principio)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if source.seekable():
+        source.seek(0)
+    return source.read()
+
+
+def get_image_asset(source) -> ImageAsset:
+    """Asset cacheado para la imagen en `source` (ruta o imagen en memoria)."""
+    if isinstance(source, ImageAsset):
+        return source
+    if is_in_memory_image(source):
+        return _CACHE.add(read_image_source(source))
+    return _CACHE.get(source)
+
+
+def resolve_image_sources(config: dict):
+    """
+    Copia de un dict de reemplazos de imagen con las imágenes en memoria ya
+    convertidas en ImageAsset: se leen y decodifican una vez por archivo y no
+    en cada inserción. Las rutas se dejan tal cual.
+    """
+    if not config:
+        return config
+    resolved = {}
+    for key, info in config.items():
+        source = info.get("path") if isinstance(info, dict) else info
+        if is_in_memory_image(source) and not isinstance(source, ImageAsset):
+            asset = get_image_asset(source)
+            info = dict(info, path=asset) if isinstance(info, dict) else asset
+        resolved[key] = info
+    return resolved
+
+
+def render_asset(asset: ImageAsset, width_cm: float, height_cm: float) -> ImageAsset:
+    """Imagen a insertar para un tamaño dibujado dado (normalizada si target_dpi está activo)."""
+    dpi = _CACHE.target_dpi
+    if not dpi:
+        return asset
+    return asset.normalized(width_cm / 2.54 * dpi, height_cm / 2.54 * dpi, dpi, _CACHE.jpeg_quality)
+
+
+def fixed_size_cm(info):
+    """Tamaño fijo en cm de una configuración de imagen (width_cm/height_cm o width_pixels a 96 DPI)."""
+    if not isinstance(info, dict):
+        return None
+    if "width_cm" in info and "height_cm" in info:
+        return info["width_cm"], info["height_cm"]
+    if "width_pixels" in info and "height_pixels" in info:
+        return info["width_pixels"] * 2.54 / 96, info["height_pixels"] * 2.54 / 96
+    return None
+
+
+def preload_image_assets(*configs):
+    """
+    Carga por adelantado las imágenes de uno o más dicts de reemplazos de imagen.
+
+    Con normalización activa, las imágenes de tamaño fijo se remuestrean aquí,
+    una vez por proceso, antes del primer documento.
+    """
+    for config in configs:
+        for info in (config or {}).values():
+            path = info.get("path") if isinstance(info, dict) else info
+            if path is not None and image_source_exists(path):
+                try:
+                    asset = get_image_asset(path)
+                    size = fixed_size_cm(info)
+                    if size:
+                        render_asset(asset, *size)
+                except OSError as e:
+                    logger.warning("⚠️ No se pudo precargar la imagen %s: %s", image_source_label(path), e)
+
+
+# Partes de imagen ya añadidas por documento: evita que python-docx
+# recalcule el SHA1 de todas las imágenes del paquete en cada inserción
+_DOCX_IMAGE_PARTS = weakref.WeakKeyDictionary()
+
+
+def _has_image_parts_internals(image_parts):
+    return hasattr(image_parts, "_get_by_sha1") and hasattr(image_parts, "_add_image_part")
+
+
+def _get_or_add_image_part(package, asset: ImageAsset):
+    """
+    Parte de imagen del paquete para `asset`, reutilizando la que tenga el mismo SHA1.
+
+    Con los internos de ImageParts de python-docx 1.x se aprovecha el
+    Image ya decodificado del asset; si no existen se usa la API pública
+    (Package.get_or_add_image_part), que vuelve a leer la imagen desde memoria.
+    """
+    image_parts = package.image_parts
+    if _has_image_parts_internals(image_parts):
+        return image_parts._get_by_sha1(asset.sha1) or image_parts._add_image_part(asset.docx_image())
+    return package.get_or_add_image_part(asset.stream())
+
+
+def add_picture_from_asset(run, asset: ImageAsset, width=None, height=None):
+    """Equivalente a run.add_picture(ruta, width, height) usando un asset cacheado."""
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.oxml.shape import CT_Inline
+    from docx.shape import InlineShape
+
+    part = run.part
+    package = part.package
+    parts_by_sha1 = _DOCX_IMAGE_PARTS.setdefault(package, {})
+    image_part = parts_by_sha1.get(asset.sha1)
+    if image_part is None:
+        image_part = parts_by_sha1[asset.sha1] = _get_or_add_image_part(package, asset)
+
+    rId = part.relate_to(image_part, RT.IMAGE)
+    image = asset.docx_image()
+    cx, cy = image.scaled_dimensions(width, height)
+    inline = CT_Inline.new_pic_inline(part.next_id, rId, image.filename, cx, cy)
+    run._r.add_drawing(inline)
+    return InlineShape(inline)
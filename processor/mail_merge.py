@@ -0,0 +1,331 @@
+"""
+Combinación de correspondencia: una plantilla × una fuente de datos → muchos documentos.
+
+Cada fila de la fuente (CSV, JSONL o filas de un .xlsx) aporta los valores de
+las claves de reemplazo: el nombre de cada columna debe coincidir con una clave
+de "replacements" en config.json.
+
+Para .docx la plantilla se parsea e indexa una sola vez: se localizan las
+coincidencias de todas las claves en cada párrafo y, por cada fila, solo se
+reescriben esos nodos w:t, se serializan las partes afectadas y se restauran.
+El resto de miembros del paquete se copian en bruto. Las imágenes de
+placeholder son iguales para todas las filas, así que se aplican una sola vez
+sobre la plantilla antes de indexarla.
+
+Para .xlsx se hace lo mismo sobre xl/sharedStrings.xml y sobre las cadenas en
+línea (<is>) de las hojas que las tienen: cada cadena se indexa una vez y por
+fila solo se reescriben y serializan esas partes; el resto de hojas se copian
+en bruto.
+"""
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from lxml import etree
+from processor.docx_xml import (_PARSER, apply_matches, is_story_part,
+                                iter_paragraph_segments, restore_segments)
+from processor.matcher import ReplacementMatcher
+from processor.package import PassthroughZipFile
+from processor.xlsx_xml import (_IS, _SI, find_shared_strings, is_sheet_part, member_contains,
+                                string_item_segments)
+
+_FIELD_RE = re.compile(r"\{([^{}:]+)(?::([^{}]*))?\}")
+_INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def read_data_source(path: str, sheet: str = None):
+    """
+    Genera una fila (dict columna -> texto) por registro de la fuente de datos.
+
+    Soporta .csv (delimitador detectado automáticamente), .jsonl y .xlsx
+    (primera fila = encabezados). Las filas se leen en streaming.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            except csv.Error:
+                dialect = csv.excel
+            for row in csv.DictReader(f, dialect=dialect):
+                yield {k: v for k, v in row.items() if k is not None}
+
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError(f"{path}:{line_number}: se esperaba un objeto JSON")
+                yield row
+
+    elif extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.active
+            rows = ws.iter_rows(values_only=True)
+            headers = next(rows, None)
+            if headers is None:
+                return
+            headers = [str(h) if h is not None else None for h in headers]
+            for values in rows:
+                if all(v is None for v in values):
+                    continue
+                yield {h: v for h, v in zip(headers, values) if h is not None}
+        finally:
+            wb.close()
+
+    else:
+        raise ValueError(f"Fuente de datos no soportada: {path} (use .csv, .jsonl o .xlsx)")
+
+
+def row_replacements(row: dict, keys=None):
+    """Valores de reemplazo de una fila, limitados a las claves configuradas."""
+    values = {}
+    for column, value in row.items():
+        if value is None or (keys is not None and column not in keys):
+            continue
+        values[column] = value if isinstance(value, str) else str(value)
+    return values
+
+
+def render_filename(pattern: str, row: dict, index: int, extension: str):
+    """
+    Nombre de archivo a partir de un patrón como "{index:04d}_{Nombre optometra}".
+
+    {index} es el número de fila (desde 1); cualquier otro campo es una columna.
+    """
+    def _field(match):
+        name, spec = match.group(1), match.group(2) or ""
+        value = index if name == "index" else row.get(name, "")
+        if value is None:
+            value = ""
+        try:
+            return format(value, spec)
+        except (ValueError, TypeError):
+            return str(value)
+
+    filename = _INVALID_FILENAME_CHARS.sub("_", _FIELD_RE.sub(_field, pattern)).strip()
+    if not filename:
+        filename = str(index)
+    if not filename.lower().endswith(extension):
+        filename += extension
+    return filename
+
+
+def index_matches(groups, matcher):
+    """[(segmentos, coincidencias)] de los grupos de segmentos con alguna clave."""
+    index = []
+    for segments in groups:
+        matches = list(matcher.finditer("".join(text for _, text in segments)))
+        if matches:
+            index.append((segments, matches))
+    return index
+
+
+def render_indexed(root, index, table):
+    """Serializa `root` con los valores de `table` en las coincidencias indexadas y la restaura."""
+    changed = []
+    try:
+        for segments, matches in index:
+            changed.extend(apply_matches(segments, matches, table))
+        return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+    finally:
+        restore_segments(changed)
+
+
+class DocxMergeTemplate:
+    """
+    Plantilla .docx parseada e indexada una vez para renderizar muchas filas.
+
+    El índice guarda, por parte, los párrafos con alguna clave y la posición de
+    cada coincidencia, así que renderizar una fila no vuelve a buscar texto.
+    """
+
+    def __init__(self, source, keys):
+        self.source = source
+        self.keys = list(keys)
+        # Matcher identidad: solo interesan las posiciones de las claves
+        matcher = ReplacementMatcher({key: key for key in self.keys})
+        self.members = []
+        self.parts = {}  # nombre -> (raíz lxml, [(segmentos, coincidencias)])
+
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                self.members.append(info.filename)
+                if not matcher or not is_story_part(info.filename):
+                    continue
+                root = etree.fromstring(zf.read(info), _PARSER)
+                index = index_matches(iter_paragraph_segments(root), matcher)
+                if index:
+                    self.parts[info.filename] = (root, index)
+
+    def render(self, output, values: dict):
+        """Escribe el documento de una fila en `output` (ruta o archivo binario)."""
+        # Las claves sin valor en la fila quedan como están en la plantilla
+        table = {key: values.get(key, key) for key in self.keys}
+        if hasattr(self.source, "seek"):
+            self.source.seek(0)
+
+        with zipfile.ZipFile(self.source) as zin, PassthroughZipFile(output, self.source) as zout:
+            for name in self.members:
+                info = zout.source_info(name)
+                if name in self.parts:
+                    zout.writestr(info, render_indexed(*self.parts[name], table))
+                elif not zout.copy_member(info):
+                    zout.writestr(info, zin.read(info))
+
+
+class XlsxMergeTemplate:
+    """
+    Plantilla .xlsx indexada una vez para renderizar muchas filas.
+
+    Las coincidencias se localizan una sola vez por cadena de
+    sharedStrings.xml y por cadena en línea de cada hoja que las tenga; por
+    fila solo se reescriben y serializan esas partes y las demás se copian en
+    bruto.
+    """
+
+    def __init__(self, source, keys):
+        self.source = source
+        self.keys = list(keys)
+        matcher = ReplacementMatcher({key: key for key in self.keys})
+        self.members = []
+        self.parts = {}  # nombre -> (raíz lxml, [(segmentos, coincidencias)])
+
+        with zipfile.ZipFile(source) as zf:
+            shared_name = find_shared_strings(zf.namelist())
+            for info in zf.infolist():
+                self.members.append(info.filename)
+                if not matcher:
+                    continue
+                if info.filename == shared_name:
+                    root = etree.fromstring(zf.read(info), _PARSER)
+                    items = root.iterchildren(_SI)
+                elif is_sheet_part(info.filename) and member_contains(zf, info, b"inlineStr"):
+                    root = etree.fromstring(zf.read(info), _PARSER)
+                    items = root.iter(_IS)
+                else:
+                    continue
+                index = index_matches((string_item_segments(item) for item in items), matcher)
+                if index:
+                    self.parts[info.filename] = (root, index)
+
+    def render(self, output, values: dict):
+        """Escribe el libro de una fila en `output` (ruta o archivo binario)."""
+        table = {key: values.get(key, key) for key in self.keys}
+        if hasattr(self.source, "seek"):
+            self.source.seek(0)
+
+        with zipfile.ZipFile(self.source) as zin, PassthroughZipFile(output, self.source) as zout:
+            for name in self.members:
+                info = zout.source_info(name)
+                if name in self.parts:
+                    zout.writestr(info, render_indexed(*self.parts[name], table))
+                elif not zout.copy_member(info):
+                    zout.writestr(info, zin.read(info))
+
+
+def _prepare_source(template_path, extension, image_replacements, placeholder_replacements, work_dir):
+    """Aplica una vez las imágenes a la plantilla y devuelve la ruta a indexar."""
+    if extension == ".docx":
+        if not placeholder_replacements:
+            return template_path
+        from processor.word_editor import process_word_file as process_file
+    else:
+        if not placeholder_replacements and not image_replacements:
+            return template_path
+        from processor.excel_editor import process_excel_file as process_file
+
+    prepared_path = os.path.join(work_dir, "plantilla_con_imagenes" + extension)
+    process_file(template_path, prepared_path, {}, image_replacements, placeholder_replacements)
+    return prepared_path
+
+
+def mail_merge(template_path: str, rows, output_dir: str, keys=None,
+               filename_pattern: str = "{index:05d}", image_replacements: dict = None,
+               placeholder_replacements: dict = None, progress_callback=None):
+    """
+    Genera un documento por fila a partir de una plantilla .docx o .xlsx.
+
+    Args:
+        template_path: Plantilla .docx/.xlsx
+        rows: Iterable de dicts (ver read_data_source)
+        output_dir: Carpeta donde se escriben los documentos
+        keys: Claves de reemplazo permitidas (None = todas las columnas)
+        filename_pattern: Patrón del nombre de salida (ver render_filename)
+        image_replacements: Reemplazos de imagen por marcador de texto
+        placeholder_replacements: Placeholders de imagen (iguales para todas las filas)
+        progress_callback: Función (completados, resultado) llamada por fila
+
+    Returns:
+        Lista de resultados por fila, en el orden de la fuente. Lanza
+        ValueError si ninguna columna de la fuente coincide con una clave.
+    """
+    extension = os.path.splitext(template_path)[1].lower()
+    if extension not in (".docx", ".xlsx"):
+        raise ValueError(f"Plantilla no soportada: {template_path}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Las columnas de la primera fila deciden qué claves participan: una clave
+    # configurada sin columna no debe "ganar" coincidencias a las que sí la tienen
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return []
+    columns = list(first.keys())
+    keys = [column for column in columns if keys is None or column in keys]
+    if not keys:
+        # Sin columnas que reemplazar cada documento saldría igual a la plantilla
+        raise ValueError(f"Ninguna columna de la fuente de datos coincide con una clave de reemplazo: "
+                         f"{', '.join(map(str, columns)) or '(sin columnas)'}")
+    rows = _chain_first(first, rows)
+
+    template_class = DocxMergeTemplate if extension == ".docx" else XlsxMergeTemplate
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = _prepare_source(template_path, extension, image_replacements,
+                                 placeholder_replacements, work_dir)
+        # La plantilla se lee completa a memoria: el directorio temporal puede desaparecer
+        with open(source, "rb") as f:
+            template = template_class(io.BytesIO(f.read()), keys)
+
+    results = []
+    used_names = set()
+    for index, row in enumerate(rows, 1):
+        start_time = time.time()
+        filename = render_filename(filename_pattern, row, index, extension)
+        if filename in used_names:
+            base, ext = os.path.splitext(filename)
+            filename = f"{base}_{index}{ext}"
+        used_names.add(filename)
+        output_path = os.path.join(output_dir, filename)
+
+        result = {"row": index, "output_path": output_path, "ok": True, "error": None}
+        try:
+            template.render(output_path, row_replacements(row, keys))
+        except Exception as e:
+            result["ok"] = False
+            result["error"] = str(e)
+        result["duration"] = time.time() - start_time
+
+        results.append(result)
+        if progress_callback:
+            progress_callback(index, result)
+
+    return results
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
@@ -0,0 +1,188 @@
+"""
+Manifiesto del lote para reprocesado incremental.
+
+En la carpeta de salida se guarda un JSON con, por cada archivo de entrada,
+su tamaño, mtime y hash de contenido, el tamaño y mtime de la salida
+generada y la huella de la configuración con la que se generó (reemplazos
+efectivos, contenido de las imágenes, opciones de los motores y
+ENGINE_VERSION).
+
+En la siguiente ejecución un archivo se omite si su configuración coincide,
+la salida sigue intacta y la entrada no cambió: si tamaño y mtime coinciden
+no se lee el archivo; si solo cambió el mtime se compara el hash de contenido.
+
+El manifiesto guarda además los factores de memoria aprendidos por
+processor.memory.MemoryEstimator para reutilizarlos en la siguiente ejecución.
+"""
+import hashlib
+import json
+import logging
+import os
+from processor.image_assets import DEFAULT_JPEG_QUALITY, get_image_asset, is_in_memory_image
+
+MANIFEST_FILENAME = ".document_processor_manifest.json"
+# Subir al cambiar la forma en que se generan las salidas: invalida los manifiestos anteriores
+ENGINE_VERSION = 1
+_HASH_CHUNK = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path: str):
+    """SHA1 del contenido de un archivo, leído por bloques."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path: str, with_hash: bool = True):
+    """Tamaño, mtime (ns) y, opcionalmente, hash de contenido de un archivo."""
+    stat = os.stat(path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        signature["sha1"] = file_hash(path)
+    return signature
+
+
+def _image_settings(image_cache: dict = None):
+    """Opciones de image_cache que cambian los bytes de las imágenes insertadas."""
+    target_dpi = (image_cache or {}).get("target_dpi")
+    if not target_dpi:
+        return {"target_dpi": None}  # Las imágenes se insertan sin modificar
+    return {"target_dpi": target_dpi,
+            "jpeg_quality": image_cache.get("jpeg_quality", DEFAULT_JPEG_QUALITY)}
+
+
+def settings_fingerprint(replacements, image_replacements: dict = None,
+                         placeholder_replacements: dict = None, word_options: dict = None,
+                         excel_options: dict = None, image_cache: dict = None):
+    """
+    Huella de todo lo que, además de la entrada, determina una salida.
+
+    Las imágenes cuentan por su contenido (no por su ruta), así que
+    reemplazar un logo en disco obliga a regenerar los documentos. De
+    image_cache (parámetros de configure_image_cache) cuentan la resolución y
+    la calidad JPEG con que se remuestrean las imágenes, no el límite de memoria.
+    """
+    replacements = getattr(replacements, "replacements", replacements) or {}
+
+    def _images(config):
+        images = {}
+        for key, info in (config or {}).items():
+            options = dict(info) if isinstance(info, dict) else {"path": info}
+            path = options.pop("path", None)
+            if is_in_memory_image(path):
+                options["sha1"] = get_image_asset(path).sha1
+            else:
+                options["sha1"] = file_hash(path) if path and os.path.exists(path) else None
+            images[key] = options
+        return images
+
+    settings = {
+        "engine_version": ENGINE_VERSION,
+        "replacements": dict(replacements),
+        "image_replacements": _images(image_replacements),
+        "placeholder_replacements": _images(placeholder_replacements),
+        "word_options": word_options or {},
+        "excel_options": excel_options or {},
+        "image_cache": _image_settings(image_cache),
+    }
+    data = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class BatchManifest:
+    """Estado de la última ejecución en una carpeta de salida."""
+
+    def __init__(self, path: str, files: dict = None, memory_factors: dict = None):
+        self.path = path
+        self.files = files if files is not None else {}  # relative_input -> entrada
+        self.memory_factors = memory_factors if memory_factors is not None else {}  # "excel.openpyxl" -> factor
+
+    @classmethod
+    def load(cls, output_dir: str):
+        """Lee el manifiesto de `output_dir` (vacío si no existe, es ilegible o de otra versión)."""
+        path = os.path.join(output_dir, MANIFEST_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Manifiesto ilegible, se reprocesará todo: %s", e)
+            return cls(path)
+        if not isinstance(data, dict) or data.get("engine_version") != ENGINE_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}), data.get("memory_factors", {}))
+
+    def is_current(self, job: dict, settings: str):
+        """Indica si la salida de `job` sigue siendo válida para esta configuración."""
+        entry = self.files.get(job["relative_input"])
+        if not entry or entry.get("settings") != settings:
+            return False
+        try:
+            if file_signature(job["output_path"], with_hash=False) != entry["output"]:
+                return False
+            if "mtime_ns" in job:
+                # Tamaño y mtime ya leídos al construir la lista (batch.collect_jobs)
+                current = {"size": job["size"], "mtime_ns": job["mtime_ns"]}
+            else:
+                current = file_signature(job["input_path"], with_hash=False)
+        except OSError:
+            return False
+
+        recorded = entry["input"]
+        if current["size"] != recorded["size"]:
+            return False
+        if current["mtime_ns"] == recorded["mtime_ns"]:
+            return True
+        # Mismo tamaño con otro mtime (copia, checkout...): decide el contenido
+        try:
+            if file_hash(job["input_path"]) != recorded["sha1"]:
+                return False
+        except OSError:
+            return False
+        recorded["mtime_ns"] = current["mtime_ns"]
+        return True
+
+    def record(self, job: dict, result: dict, settings: str):
+        """Actualiza la entrada de un archivo a partir de su resultado de run_batch."""
+        key = job["relative_input"]
+        if result.get("cancelled"):
+            # No se llegó a procesar: se conserva lo que hubiera de la ejecución anterior
+            return
+        signature = result.get("input_signature")
+        if not result["ok"] or not signature:
+            self.files.pop(key, None)
+            return
+        try:
+            output = file_signature(job["output_path"], with_hash=False)
+        except OSError:
+            self.files.pop(key, None)
+            return
+        self.files[key] = {"input": signature, "output": output, "settings": settings}
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica (archivo temporal + os.replace)."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"engine_version": ENGINE_VERSION, "files": self.files,
+                       "memory_factors": self.memory_factors},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+
+def skipped_result(job: dict):
+    """Resultado de run_batch para un archivo omitido por estar al día."""
+    return {
+        "relative_input": job["relative_input"],
+        "output_path": job["output_path"],
+        "kind": job["kind"],
+        "ok": True,
+        "error": None,
+        "skipped": True,
+        "stats": {},
+        "duration": 0.0,
+    }
@@ -0,0 +1,102 @@
+import re
+from functools import lru_cache
+
+
+class ReplacementMatcher:
+    """
+    Buscador multi-patrón compilado una sola vez por lote.
+
+    Las claves se organizan en un trie y se compilan a una única expresión
+    regular con forma de autómata: en cada posición se decide por el primer
+    carácter y se avanza por el trie, prefiriendo siempre la coincidencia más
+    larga. El resultado es leftmost-longest en una sola pasada sobre el texto,
+    así "SANTIAGO DE CALI" gana sobre "CALI" sin depender del orden del dict.
+    """
+
+    def __init__(self, replacements: dict):
+        # Claves vacías insertarían el valor entre cada carácter: se ignoran
+        self.replacements = {str(k): str(v) for k, v in replacements.items() if k}
+        self.first_chars = frozenset(key[0] for key in self.replacements)
+        self.pattern = None
+        if self.replacements:
+            self.pattern = re.compile(_trie_to_regex(_build_trie(self.replacements)))
+
+    def __len__(self):
+        return len(self.replacements)
+
+    def __bool__(self):
+        return bool(self.replacements)
+
+    def may_match(self, text: str) -> bool:
+        """Rechazo rápido: False si ningún carácter inicial de clave aparece en el texto."""
+        return bool(text) and not self.first_chars.isdisjoint(text)
+
+    def search(self, text: str) -> bool:
+        """Indica si el texto contiene al menos una clave."""
+        if self.pattern is None or not self.may_match(text):
+            return False
+        return self.pattern.search(text) is not None
+
+    def finditer(self, text: str):
+        """Genera (inicio, fin, clave) para cada coincidencia sin solapamientos."""
+        if self.pattern is None or not self.may_match(text):
+            return
+        for match in self.pattern.finditer(text):
+            yield match.start(), match.end(), match.group()
+
+    def replace(self, text: str):
+        """Devuelve (texto_nuevo, claves_encontradas) en una sola pasada."""
+        if self.pattern is None or not self.may_match(text):
+            return text, []
+
+        found = []
+        table = self.replacements
+
+        def _sub(match):
+            key = match.group()
+            found.append(key)
+            return table[key]
+
+        return self.pattern.sub(_sub, text), found
+
+
+def _build_trie(keys):
+    root = {}
+    for key in keys:
+        node = root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = True
+    return root
+
+
+def _trie_to_regex(node):
+    """Convierte el trie en regex; las ramas más profundas se prueban antes (más larga)."""
+    terminal = "" in node
+    branches = [re.escape(char) + _trie_to_regex(child)
+                for char, child in sorted(node.items()) if char != ""]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    body = "(?:" + "|".join(branches) + ")"
+    return body + "?" if terminal else body
+
+
+@lru_cache(maxsize=32)
+def _compile_cached(items):
+    return ReplacementMatcher(dict(items))
+
+
+def compile_replacements(replacements) -> ReplacementMatcher:
+    """
+    Obtiene el matcher para un dict de reemplazos (o lo devuelve si ya lo es).
+
+    Los matchers se memorizan por contenido, de modo que un lote que llama a
+    los editores archivo por archivo con el mismo dict compila una sola vez.
+    """
+    if isinstance(replacements, ReplacementMatcher):
+        return replacements
+    if not replacements:
+        return ReplacementMatcher({})
+    return _compile_cached(tuple((str(k), str(v)) for k, v in replacements.items()))
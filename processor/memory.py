@@ -0,0 +1,201 @@
+"""
+Control de memoria del lote: estimación por archivo, medición de picos y
+reciclado de workers.
+
+Un libro grande cargado con openpyxl puede ocupar varios GB; si varios
+coinciden en el pool el sistema mata el proceso completo. run_batch estima la
+memoria de cada archivo a partir de su tamaño y tipo (MemoryEstimator) y solo
+envía trabajos mientras la suma de las estimaciones en curso quepa en el
+presupuesto. Cada worker mide el pico real de cada archivo y el estimador
+ajusta sus factores con esos picos (se guardan en el manifiesto de la carpeta
+de salida para la siguiente ejecución).
+
+Medición del pico: en Linux se reinicia el máximo de RSS del proceso
+(/proc/self/clear_refs) antes de cada archivo y se lee VmHWM al terminar; en
+otros sistemas se usa tracemalloc, que solo ve la memoria de Python (no la de
+lxml) y ralentiza el proceso, así que hay que pedirlo explícitamente.
+"""
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+# Memoria por archivo = base + tamaño de entrada * factor. Valores iniciales
+# conservadores: un .xlsx comprimido se expande ~10x y openpyxl crea un objeto
+# por celda; python-docx y los motores XML mantienen árboles lxml.
+DEFAULT_BASE_BYTES = 16 * MB
+DEFAULT_FACTORS = {
+    "word.docx": 15.0,
+    "word.xml": 8.0,
+    "excel.openpyxl": 60.0,
+    "excel.stream": 8.0,
+    "excel.shared": 10.0,
+}
+# Archivos más pequeños que esto no ajustan los factores (domina la base)
+LEARN_MIN_SIZE = 256 * 1024
+# Peso de cada nuevo pico al bajar un factor (subir es inmediato)
+LEARN_DECAY = 0.2
+
+
+def build_memory_options(memory_config: dict = None, budget_mb: float = None,
+                         worker_rss_mb: float = None, max_tasks_per_child: int = None):
+    """
+    Parámetros memory_limits de run_batch a partir de la sección "memory" de config.json.
+
+    Formato: {"budget_mb": 4096, "worker_rss_mb": 2048, "max_tasks_per_child": 50,
+    "tracemalloc": false}; los argumentos (si se indican) tienen prioridad
+    sobre el archivo. Devuelve None si no hay nada que limitar.
+    """
+    memory_config = dict(memory_config or {})
+    for key, value in (("budget_mb", budget_mb), ("worker_rss_mb", worker_rss_mb),
+                       ("max_tasks_per_child", max_tasks_per_child)):
+        if value is not None:
+            memory_config[key] = value
+    options = {}
+    if memory_config.get("budget_mb"):
+        options["budget_bytes"] = int(float(memory_config["budget_mb"]) * MB)
+    if memory_config.get("worker_rss_mb"):
+        options["worker_rss_bytes"] = int(float(memory_config["worker_rss_mb"]) * MB)
+    if memory_config.get("max_tasks_per_child"):
+        options["max_tasks_per_child"] = int(memory_config["max_tasks_per_child"])
+    if not options:
+        return None
+    options["tracemalloc"] = bool(memory_config.get("tracemalloc", False))
+    return options
+
+
+def current_rss():
+    """RSS actual de este proceso en bytes (None si no se puede obtener)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if sys.platform == "win32":
+        return _windows_rss()
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Sin /proc solo queda el máximo de la vida del proceso (KB en Linux, bytes en macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _windows_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def reset_peak_rss():
+    """Reinicia el máximo de RSS del proceso (Linux); devuelve False si no es posible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Máximo de RSS desde el último reset_peak_rss (VmHWM), en bytes."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+@contextmanager
+def track_peak_memory(baseline: int = None, use_tracemalloc: bool = False):
+    """
+    Mide la memoria que necesita el bloque.
+
+    Rellena el dict devuelto al salir con "peak" (pico por encima de
+    `baseline`, por defecto la RSS al entrar), "rss" (RSS al salir) y
+    "method" ("rss", "tracemalloc" o "delta" si solo hay RSS antes y después).
+    """
+    usage = {}
+    before = current_rss()
+    if baseline is None:
+        baseline = before
+    method = "rss" if reset_peak_rss() else "tracemalloc" if use_tracemalloc else "delta"
+    started_tracing = method == "tracemalloc" and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    elif method == "tracemalloc":
+        tracemalloc.reset_peak()
+    try:
+        yield usage
+    finally:
+        after = current_rss()
+        if method == "rss":
+            peak = (peak_rss() or after or 0) - (baseline or 0)
+        elif method == "tracemalloc":
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        else:
+            peak = (after or 0) - (before or 0)
+        usage.update({"peak": max(0, peak), "rss": after, "method": method})
+
+
+class MemoryEstimator:
+    """Memoria estimada por archivo según su tipo, motor y tamaño, ajustada con los picos medidos."""
+
+    def __init__(self, factors: dict = None, base_bytes: int = DEFAULT_BASE_BYTES):
+        self.factors = dict(DEFAULT_FACTORS)
+        self.factors.update(factors or {})
+        self.base_bytes = base_bytes
+
+    @staticmethod
+    def job_key(job: dict, word_options: dict = None, excel_options: dict = None):
+        """"word.docx", "excel.openpyxl"...: tipo del archivo y motor que lo procesa."""
+        if job["kind"] == "word":
+            return f"word.{(word_options or {}).get('engine', 'docx')}"
+        return f"excel.{(excel_options or {}).get('engine', 'openpyxl')}"
+
+    def estimate(self, job: dict, key: str):
+        """Bytes estimados para procesar `job`."""
+        size = job.get("size")
+        if size is None:
+            size = os.path.getsize(job["input_path"])
+        return int(self.base_bytes + size * self.factors.get(key, max(DEFAULT_FACTORS.values())))
+
+    def learn(self, job: dict, key: str, peak: int):
+        """
+        Ajusta el factor de `key` con el pico medido de un archivo.
+
+        Si el pico supera la estimación el factor sube de inmediato; si
+        queda por debajo baja poco a poco (LEARN_DECAY), así una racha de
+        archivos sencillos no deja sin margen al siguiente libro pesado.
+        """
+        size = job.get("size") or 0
+        if size < LEARN_MIN_SIZE or peak is None:
+            return
+        observed = max(0, peak - self.base_bytes) / size
+        current = self.factors.get(key, observed)
+        if observed > current:
+            self.factors[key] = observed
+        else:
+            self.factors[key] = current + (observed - current) * LEARN_DECAY
@@ -0,0 +1,228 @@
+"""
+Guardado de paquetes OOXML (.docx/.xlsx) copiando sin recomprimir las partes
+que no cambiaron.
+
+Al guardar, python-docx y openpyxl vuelven a serializar y comprimir todas las
+partes, incluidas imágenes, fuentes y temas que nunca se tocaron. Aquí cada
+miembro cuyo contenido (tamaño + CRC32) coincide con el del archivo de origen
+se copia como bytes comprimidos en bruto desde el zip original; solo se
+comprimen de nuevo las partes realmente modificadas.
+
+Al guardar un libro en un archivo abierto (p. ej. io.BytesIO) las hojas se
+serializan en memoria en lugar de en los archivos temporales de openpyxl.
+
+Ambas optimizaciones dependen de detalles internos de sus bibliotecas (la
+copia en bruto, de atributos privados del zipfile de CPython; la serialización
+en memoria, de ExcelWriter.write_worksheet de openpyxl 3.1). Se comprueban
+antes de usarlas y, si faltan, se sigue el camino normal (recomprimir la
+parte o pasar por el archivo temporal) con el mismo resultado.
+"""
+import copy
+import datetime
+import io
+import os
+import struct
+import zipfile
+import zlib
+
+# Cabecera local de un miembro: 30 bytes fijos + nombre + campo extra
+_LOCAL_HEADER_SIZE = 30
+_DATA_DESCRIPTOR_FLAG = 0x08
+_ENCRYPTED_FLAG = 0x01
+_ZIP64_EXTRA_ID = 1
+_COPY_CHUNK_SIZE = 1024 * 1024
+# Internos de zipfile que usa PassthroughZipFile.copy_member
+_ZIPFILE_PRIVATE_ATTRS = ("_lock", "_seekable", "start_dir", "_writecheck", "_didModify")
+# Versiones de openpyxl cuyo ExcelWriter.write_worksheet reproduce _excel_writer
+_IN_MEMORY_OPENPYXL_VERSIONS = ((3, 1),)
+
+
+def _openpyxl_version():
+    import openpyxl
+
+    try:
+        return tuple(int(part) for part in openpyxl.__version__.split(".")[:2])
+    except ValueError:
+        return None
+
+
+class PassthroughZipFile(zipfile.ZipFile):
+    """
+    ZipFile de escritura que reutiliza los bytes comprimidos del zip de origen.
+
+    writestr()/write() comparan el contenido con el miembro homónimo del
+    origen y, si es idéntico, copian el miembro en bruto en lugar de volver a
+    comprimirlo. Acepta rutas o archivos binarios tanto para origen como destino.
+    """
+
+    def __init__(self, file, source, **kwargs):
+        kwargs.setdefault("compression", zipfile.ZIP_DEFLATED)
+        kwargs.setdefault("allowZip64", True)
+        super().__init__(file, "w", **kwargs)
+        self._source = zipfile.ZipFile(source)
+        self._source_infos = {info.filename: info for info in self._source.infolist()}
+        # Sin los internos de zipfile (otra versión de Python) todo se recomprime
+        self.raw_copy = (hasattr(zipfile, "_strip_extra")
+                         and all(hasattr(self, attr) for attr in _ZIPFILE_PRIVATE_ATTRS))
+        self.copied_members = 0
+        self.rewritten_members = 0
+
+    def source_info(self, name: str):
+        """ZipInfo del miembro en el archivo de origen (o None)."""
+        return self._source_infos.get(name)
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        name = (zinfo_or_arcname.filename if isinstance(zinfo_or_arcname, zipfile.ZipInfo)
+                else zinfo_or_arcname)
+        source_info = self._source_infos.get(name)
+        if (source_info is not None and source_info.file_size == len(data)
+                and source_info.CRC == zlib.crc32(data) and self.copy_member(source_info)):
+            return
+        self.rewritten_members += 1
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        source_info = self._source_infos.get(arcname) if arcname else None
+        if source_info is not None:
+            crc, size = 0, 0
+            with open(filename, "rb") as f:
+                for chunk in iter(lambda: f.read(_COPY_CHUNK_SIZE), b""):
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+            if source_info.file_size == size and source_info.CRC == crc and self.copy_member(source_info):
+                return
+        self.rewritten_members += 1
+        super().write(filename, arcname, compress_type, compresslevel)
+
+    def copy_member(self, source_info: zipfile.ZipInfo) -> bool:
+        """Copia un miembro del origen sin descomprimirlo; False si no es posible."""
+        if not self.raw_copy or source_info.flag_bits & _ENCRYPTED_FLAG:
+            return False
+
+        zinfo = copy.copy(source_info)
+        # Los tamaños y el CRC ya se conocen: van en la cabecera local
+        zinfo.flag_bits &= ~_DATA_DESCRIPTOR_FLAG
+        zinfo.extra = zipfile._strip_extra(zinfo.extra, (_ZIP64_EXTRA_ID,))
+        zip64 = (zinfo.file_size > zipfile.ZIP64_LIMIT
+                 or zinfo.compress_size > zipfile.ZIP64_LIMIT)
+
+        source_fp = self._source.fp
+        source_fp.seek(source_info.header_offset)
+        header = source_fp.read(_LOCAL_HEADER_SIZE)
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        source_fp.seek(source_info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+
+        with self._lock:
+            if self._seekable:
+                self.fp.seek(self.start_dir)
+            zinfo.header_offset = self.fp.tell()
+            self._writecheck(zinfo)
+            self._didModify = True
+            self.fp.write(zinfo.FileHeader(zip64))
+
+            remaining = source_info.compress_size
+            while remaining > 0:
+                chunk = source_fp.read(min(_COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise zipfile.BadZipFile(f"Miembro truncado en el origen: {source_info.filename}")
+                self.fp.write(chunk)
+                remaining -= len(chunk)
+
+            self.start_dir = self.fp.tell()
+            self.filelist.append(zinfo)
+            self.NameToInfo[zinfo.filename] = zinfo
+
+        self.copied_members += 1
+        return True
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._source.close()
+
+
+class _PassthroughPkgWriter:
+    """Adaptador con la interfaz PhysPkgWriter de python-docx."""
+
+    def __init__(self, pkg_file, source):
+        self._zipf = PassthroughZipFile(pkg_file, source)
+
+    def write(self, pack_uri, blob):
+        self._zipf.writestr(pack_uri.membername, blob)
+
+    def close(self):
+        self._zipf.close()
+
+
+def save_document_passthrough(doc, output_path, source_path):
+    """Equivalente a doc.save(output_path) copiando en bruto las partes sin cambios."""
+    from docx.opc.pkgwriter import PackageWriter
+
+    package = doc.part.package
+    for part in package.parts:
+        part.before_marshal()
+
+    writer = _PassthroughPkgWriter(output_path, source_path)
+    try:
+        PackageWriter._write_content_types_stream(writer, package.parts)
+        PackageWriter._write_pkg_rels(writer, package.rels)
+        PackageWriter._write_parts(writer, package.parts)
+    finally:
+        writer.close()
+
+
+def _excel_writer(wb, archive, in_memory: bool):
+    """ExcelWriter de openpyxl; con in_memory=True serializa cada hoja en un io.BytesIO."""
+    from openpyxl.writer.excel import ExcelWriter
+
+    if not in_memory or _openpyxl_version() not in _IN_MEMORY_OPENPYXL_VERSIONS:
+        return ExcelWriter(wb, archive)
+    from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing
+    from openpyxl.worksheet._writer import WorksheetWriter
+
+    class InMemoryExcelWriter(ExcelWriter):
+        def write_worksheet(self, ws):
+            if self.workbook.write_only:
+                return super().write_worksheet(ws)
+            # Mismo proceso que ExcelWriter.write_worksheet (openpyxl 3.1) sin el archivo temporal
+            ws._drawing = SpreadsheetDrawing()
+            ws._drawing.charts = ws._charts
+            ws._drawing.images = ws._images
+            writer = WorksheetWriter(ws, out=io.BytesIO())
+            writer.write()
+            ws._rels = writer._rels
+            self._archive.writestr(ws.path[1:], writer.read())
+            self.manifest.append(ws)
+
+    return InMemoryExcelWriter(wb, archive)
+
+
+def _touch_modified(wb):
+    """Fecha de modificación (docProps/core.xml) como la pone openpyxl.save_workbook."""
+    wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+
+
+def save_workbook_stream(wb, output):
+    """Equivalente a wb.save() sobre un archivo binario abierto, sin archivos temporales."""
+    archive = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+    _touch_modified(wb)
+    try:
+        _excel_writer(wb, archive, in_memory=True).save()  # save() cierra el archivo al terminar
+    except Exception:
+        archive.close()
+        raise
+
+
+def save_workbook_passthrough(wb, output_path, source_path):
+    """Equivalente a wb.save(output_path) copiando en bruto las partes sin cambios."""
+    archive = PassthroughZipFile(output_path, source_path)
+    _touch_modified(wb)
+    try:
+        in_memory = not isinstance(output_path, (str, os.PathLike))
+        _excel_writer(wb, archive, in_memory).save()  # save() cierra el archivo al terminar
+    except Exception:
+        archive.close()
+        raise
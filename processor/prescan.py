@@ -0,0 +1,132 @@
+"""
+Pre-escaneo barato de paquetes .docx/.xlsx antes de cargarlos.
+
+Muchos archivos de un lote no contienen ninguna clave ni imagen que
+reemplazar y, aun así, pagarían la carga y el guardado completos con
+python-docx u openpyxl. Aquí se leen solo las partes XML que los editores
+recorren (historias de Word; sharedStrings y hojas de Excel), se eliminan las
+etiquetas para obtener el texto plano (así una clave partida en varios runs
+sigue encontrándose) y se busca cualquier clave con el matcher del lote.
+
+El escaneo es conservador: puede dar falsos positivos (texto de dos párrafos
+o celdas contiguas, códigos de campo, números), nunca falsos negativos. Los
+archivos sin coincidencias se copian tal cual con copy_file_range/sendfile.
+"""
+import html
+import os
+import re
+import shutil
+import zipfile
+from processor.docx_xml import is_story_part
+from processor.excel_editor import build_marker_index
+from processor.matcher import compile_replacements
+from processor.xlsx_xml import find_shared_strings, is_sheet_part
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_DOCX_IMAGE_TAGS = (b"<w:drawing", b"<w:pict")
+_XLSX_MEDIA_PREFIXES = ("xl/media/", "xl/drawings/")
+_COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def part_text(xml_bytes: bytes) -> str:
+    """Texto plano de una parte XML (sin etiquetas y con las entidades resueltas)."""
+    return html.unescape(_TAG_RE.sub("", xml_bytes.decode("utf-8", errors="replace")))
+
+
+def _excel_marker_names(image_replacements, placeholder_replacements):
+    """Placeholders que process_excel_file buscará como marcadores de texto."""
+    names = list(placeholder_replacements or {})
+    for key in image_replacements or {}:
+        if key not in names:
+            names.append(f"marker_{key}")
+    return tuple(names)
+
+
+def needs_processing(path, kind: str, replacements, image_replacements: dict = None,
+                     placeholder_replacements: dict = None):
+    """
+    Indica si el archivo puede cambiar al procesarlo.
+
+    Args:
+        path: Ruta (o archivo binario con seek) del .docx/.xlsx
+        kind: "word" o "excel" (ver batch.collect_jobs)
+        replacements: Reemplazos de texto (dict o matcher compilado)
+        image_replacements: Reemplazos de imagen por marcador de texto
+        placeholder_replacements: Placeholders de imagen
+    """
+    matcher = compile_replacements(replacements)
+    marker_matcher = None
+
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        if kind == "word":
+            parts = [name for name in names if is_story_part(name)]
+            # Word reemplaza cualquier imagen de un párrafo por el primer placeholder
+            check_images = bool(placeholder_replacements)
+        else:
+            shared_strings = find_shared_strings(names)
+            parts = [name for name in names if name == shared_strings or is_sheet_part(name)]
+            if image_replacements or placeholder_replacements:
+                # Las imágenes existentes del libro se reemplazan siempre
+                if any(name.startswith(_XLSX_MEDIA_PREFIXES) for name in names):
+                    return True
+                marker_matcher, _ = build_marker_index(
+                    _excel_marker_names(image_replacements, placeholder_replacements))
+            check_images = False
+
+        if not matcher and not check_images and not marker_matcher:
+            return False
+
+        for name in parts:
+            data = zf.read(name)
+            if check_images and any(tag in data for tag in _DOCX_IMAGE_TAGS):
+                return True
+            if matcher or marker_matcher:
+                text = part_text(data)
+                if matcher.search(text) or (marker_matcher is not None and marker_matcher.search(text)):
+                    return True
+    return False
+
+
+def copy_file_fast(source: str, destination: str):
+    """
+    Copia un archivo dentro del kernel (copy_file_range o sendfile), sin pasar
+    los datos por el espacio de usuario; recurre a shutil si no hay soporte.
+    """
+    with open(source, "rb") as fsrc, open(destination, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        for copy in (_copy_file_range, _sendfile):
+            try:
+                if copy(fsrc.fileno(), fdst.fileno(), size):
+                    return
+            except OSError:
+                pass
+            # Sistema de archivos o plataforma sin soporte: reintentar desde el principio
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, _COPY_CHUNK_SIZE)
+
+
+def _copy_file_range(source_fd, destination_fd, size):
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(source_fd, destination_fd, min(_COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied == size
+
+
+def _sendfile(source_fd, destination_fd, size):
+    if not hasattr(os, "sendfile"):
+        return False
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(destination_fd, source_fd, copied, min(_COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+    return copied == size
@@ -0,0 +1,91 @@
+"""
+Perfiles cProfile de los archivos más lentos de un lote.
+
+Tras run_batch, profile_slowest vuelve a procesar en este proceso los N
+archivos que más tardaron (omitidos y copiados sin cambios no cuentan) bajo
+cProfile, con la salida en una carpeta temporal para no tocar la del lote.
+Por cada archivo se guarda el perfil binario (.prof, para pstats o snakeviz)
+y un resumen de texto ordenado por tiempo acumulado.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import tempfile
+from processor.batch import process_job
+
+PROFILE_TOP_FUNCTIONS = 30
+
+logger = logging.getLogger(__name__)
+
+
+def slowest_jobs(jobs, results, count: int):
+    """Trabajos de los `count` archivos procesados (no omitidos ni copiados) más lentos."""
+    by_input = {job["relative_input"]: job for job in jobs}
+    processed = [
+        result for result in results
+        if result["ok"] and not result.get("skipped") and not result.get("cancelled")
+        and not (result.get("stats") or {}).get("copied")
+    ]
+    processed.sort(key=lambda result: result.get("duration", 0.0), reverse=True)
+    return [by_input[result["relative_input"]] for result in processed[:count]
+            if result["relative_input"] in by_input]
+
+
+def _profile_name(relative_input: str):
+    return relative_input.replace("\\", "/").replace("/", "__")
+
+
+def profile_slowest(jobs, results, count: int, profile_dir: str, replacements,
+                    image_replacements: dict = None, placeholder_replacements: dict = None,
+                    word_options: dict = None, excel_options: dict = None):
+    """
+    Perfila los `count` archivos más lentos del lote.
+
+    Args:
+        jobs: Trabajos del lote (ver batch.collect_jobs)
+        results: Resultados de run_batch para esos trabajos
+        count: Número de archivos a perfilar
+        profile_dir: Carpeta donde escribir los .prof y .txt
+        replacements, image_replacements, placeholder_replacements,
+        word_options, excel_options: Los mismos que se pasaron a run_batch
+
+    Returns:
+        Lista de {"archivo", "perfil", "stats"} con las rutas generadas.
+    """
+    selected = slowest_jobs(jobs, results, count)
+    if not selected:
+        return []
+    os.makedirs(profile_dir, exist_ok=True)
+    config = {
+        "replacements": replacements,
+        "image_replacements": image_replacements or {},
+        "placeholder_replacements": placeholder_replacements or {},
+        "word_options": word_options or {},
+        "excel_options": excel_options or {},
+    }
+
+    profiles = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for job in selected:
+            name = _profile_name(job["relative_input"])
+            profile_job = dict(job, output_path=os.path.join(tmp_dir, name))
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                result = process_job(profile_job, config)
+            finally:
+                profiler.disable()
+            if not result["ok"]:
+                logger.warning("⚠️ %s falló al perfilarlo: %s", job["relative_input"], result["error"])
+
+            profile_path = os.path.join(profile_dir, name + ".prof")
+            stats_path = os.path.join(profile_dir, name + ".txt")
+            profiler.dump_stats(profile_path)
+            with open(stats_path, "w", encoding="utf-8") as f:
+                f.write(f"{job['relative_input']} ({result['duration']:.3f}s bajo cProfile)\n\n")
+                stats = pstats.Stats(profiler, stream=f)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+            logger.info("🔬 Perfil de %s en %s", job["relative_input"], stats_path)
+            profiles.append({"archivo": job["relative_input"], "perfil": profile_path, "stats": stats_path})
+    return profiles
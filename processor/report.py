@@ -0,0 +1,196 @@
+import logging
+import time
+from processor.image_assets import image_source_label
+
+LOG_FILENAME = "proceso_detallado_log.txt"
+SLOWEST_FILES = 10
+# Contadores de los editores que se suman en el resumen del lote
+STAT_COUNTERS = ("paragraphs", "stories", "runs_rewritten", "sheets", "cells_visited", "markers_found")
+
+logger = logging.getLogger(__name__)
+
+
+def summarize_results(results, special_style_keys=None, slowest: int = SLOWEST_FILES):
+    """
+    Agrupa los resultados de run_batch en procesados, omitidos, cancelados,
+    errores y estilos preservados.
+
+    Suma además el tiempo de cada fase (stats["phases"] de los editores) y los
+    contadores de STAT_COUNTERS, y conserva los `slowest` archivos más lentos.
+    """
+    summary = {
+        "procesados": 0,
+        "errores": [],
+        "archivos_procesados": [],
+        "archivos_con_estilos_preservados": [],
+        "archivos_omitidos": [],
+        "archivos_cancelados": [],
+        "archivos_copiados": 0,
+        "reemplazos_texto": 0,
+        "reemplazos_imagen": 0,
+        "fases": {},
+        "contadores": {},
+        "archivos_lentos": [],
+        "memoria_maxima": None,
+    }
+    tiempos = []
+
+    for resultado in results:
+        relative_input = resultado["relative_input"]
+        if resultado.get("skipped"):
+            # Salida de una ejecución anterior todavía válida (ver processor.manifest)
+            summary["archivos_omitidos"].append(relative_input)
+        elif resultado.get("cancelled"):
+            summary["archivos_cancelados"].append(relative_input)
+        elif resultado["ok"]:
+            summary["procesados"] += 1
+            summary["archivos_procesados"].append(relative_input)
+            stats = resultado.get("stats") or {}
+            summary["reemplazos_texto"] += stats.get("text_replaced", 0)
+            summary["reemplazos_imagen"] += stats.get("images_replaced", 0)
+            if stats.get("copied"):
+                summary["archivos_copiados"] += 1
+            for nombre, fase in stats.get("phases", {}).items():
+                total = summary["fases"].setdefault(nombre, {"wall": 0.0, "cpu": 0.0, "archivos": 0})
+                total["wall"] += fase["wall"]
+                total["cpu"] += fase.get("cpu", 0.0)
+                total["archivos"] += 1
+            for contador in STAT_COUNTERS:
+                if contador in stats:
+                    summary["contadores"][contador] = summary["contadores"].get(contador, 0) + stats[contador]
+            tiempos.append(resultado)
+            # Pico de memoria medido por el worker (solo con límites de memoria, ver processor.memory)
+            pico = stats.get("peak_memory")
+            if pico is not None and (summary["memoria_maxima"] is None or pico > summary["memoria_maxima"]["bytes"]):
+                summary["memoria_maxima"] = {"archivo": relative_input, "bytes": pico}
+            # Marcar si este archivo tenía campos con estilos especiales
+            if resultado["kind"] == "word" and special_style_keys:
+                summary["archivos_con_estilos_preservados"].append(relative_input)
+        else:
+            tipo = "Word" if resultado["kind"] == "word" else "Excel"
+            error_msg = f"[{tipo}] {relative_input} -> {resultado['error']}"
+            logger.warning("⚠️ Error en %s", error_msg)
+            summary["errores"].append(error_msg)
+
+    tiempos.sort(key=lambda resultado: resultado.get("duration", 0.0), reverse=True)
+    summary["archivos_lentos"] = [
+        {
+            "archivo": resultado["relative_input"],
+            "duracion": resultado.get("duration", 0.0),
+            "fases": (resultado.get("stats") or {}).get("phases", {}),
+        }
+        for resultado in tiempos[:slowest]
+    ]
+    return summary
+
+
+def write_report(log_path: str, summary: dict, duration: float, replacements: dict,
+                 image_replacements: dict, placeholder_replacements: dict, special_style_keys):
+    """Escribe el reporte detallado del lote (proceso_detallado_log.txt)."""
+    procesados = summary["procesados"]
+    errores = summary["errores"]
+    archivos_procesados = summary["archivos_procesados"]
+    archivos_con_estilos_preservados = summary["archivos_con_estilos_preservados"]
+    archivos_omitidos = summary.get("archivos_omitidos", [])
+    archivos_cancelados = summary.get("archivos_cancelados", [])
+
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write("=== REPORTE DETALLADO DE PROCESAMIENTO ===\n\n")
+        f.write(f"Fecha: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Tiempo total: {duration:.2f} segundos\n")
+        f.write(f"Archivos procesados: {procesados}\n")
+        f.write(f"Archivos omitidos (sin cambios): {len(archivos_omitidos)}\n")
+        f.write(f"Archivos con errores: {len(errores)}\n")
+        if archivos_cancelados:
+            f.write(f"Archivos sin procesar (lote cancelado): {len(archivos_cancelados)}\n")
+        f.write(f"Archivos con estilos preservados: {len(archivos_con_estilos_preservados)}\n\n")
+
+        if replacements:
+            f.write("=== REEMPLAZOS DE TEXTO APLICADOS ===\n")
+            for key, value in replacements.items():
+                style_note = " (⭐ ESTILO PRESERVADO)" if key in special_style_keys else ""
+                f.write(f"{key} -> {value}{style_note}\n")
+            f.write("\n")
+
+        if image_replacements:
+            f.write("=== REEMPLAZOS DE IMÁGENES POR TEXTO APLICADOS ===\n")
+            for key, value in image_replacements.items():
+                if isinstance(value, dict):
+                    f.write(f"{key} -> {image_source_label(value['path'])} ")
+                    f.write(f"[{value.get('width_cm', 'auto')}x{value.get('height_cm', 'auto')} cm]\n")
+                else:
+                    f.write(f"{key} -> {image_source_label(value)}\n")
+            f.write("\n")
+
+        if placeholder_replacements:
+            f.write("=== REEMPLAZOS DE PLACEHOLDERS APLICADOS ===\n")
+            for key, value in placeholder_replacements.items():
+                if isinstance(value, dict):
+                    f.write(f"{key} -> {image_source_label(value['path'])} "
+                            f"(maintain_aspect: {value.get('maintain_aspect', False)})\n")
+                else:
+                    f.write(f"{key} -> {image_source_label(value)}\n")
+            f.write("\n")
+
+        if archivos_procesados:
+            f.write("=== ARCHIVOS PROCESADOS CORRECTAMENTE ===\n")
+            for archivo in archivos_procesados:
+                style_marker = " 🎨" if archivo in archivos_con_estilos_preservados else ""
+                f.write(f"✓ {archivo}{style_marker}\n")
+            f.write("\n")
+
+        if archivos_omitidos:
+            f.write("=== ARCHIVOS OMITIDOS (SIN CAMBIOS DESDE LA ÚLTIMA EJECUCIÓN) ===\n")
+            for archivo in archivos_omitidos:
+                f.write(f"= {archivo}\n")
+            f.write("\n")
+
+        if archivos_con_estilos_preservados:
+            f.write("=== ARCHIVOS CON PRESERVACIÓN DE ESTILOS ===\n")
+            f.write("Los siguientes archivos tenían texto con formato especial que fue preservado:\n")
+            for archivo in archivos_con_estilos_preservados:
+                f.write(f"🎨 {archivo}\n")
+            f.write("\n")
+
+        if errores:
+            f.write("=== ARCHIVOS CON ERRORES ===\n")
+            for err in errores:
+                f.write(f"✗ {err}\n")
+
+        # Estadísticas adicionales
+        f.write("\n=== ESTADÍSTICAS ADICIONALES ===\n")
+        f.write(f"Promedio de tiempo por archivo: {duration/max(procesados, 1):.2f} segundos\n")
+        f.write(f"Tasa de éxito: {(procesados/max(procesados + len(errores), 1)*100):.1f}%\n")
+        f.write(f"Campos con preservación de estilos: {len(special_style_keys)}\n")
+        f.write(f"Reemplazos de texto realizados: {summary.get('reemplazos_texto', 0)}\n")
+        f.write(f"Imágenes reemplazadas: {summary.get('reemplazos_imagen', 0)}\n")
+        f.write(f"Copiados sin cambios (pre-escaneo sin coincidencias): {summary.get('archivos_copiados', 0)}\n")
+        for contador, valor in summary.get("contadores", {}).items():
+            f.write(f"{contador}: {valor}\n")
+        memoria_maxima = summary.get("memoria_maxima")
+        if memoria_maxima:
+            f.write(f"Pico de memoria por archivo: {memoria_maxima['bytes'] / (1024 * 1024):.1f} MB "
+                    f"({memoria_maxima['archivo']})\n")
+
+        fases = summary.get("fases")
+        if fases:
+            # Pared y CPU sumadas en todos los workers; pueden superar el tiempo total del lote
+            f.write("\n=== TIEMPO POR FASE ===\n")
+            f.write(f"{'fase':<12} {'pared (s)':>10} {'CPU (s)':>10} {'archivos':>9}\n")
+            for nombre, total in sorted(fases.items(), key=lambda item: item[1]["wall"], reverse=True):
+                f.write(f"{nombre:<12} {total['wall']:10.3f} {total['cpu']:10.3f} {total['archivos']:9d}\n")
+
+        archivos_lentos = summary.get("archivos_lentos")
+        if archivos_lentos:
+            f.write("\n=== ARCHIVOS MÁS LENTOS ===\n")
+            for lento in archivos_lentos:
+                detalle = ", ".join(f"{nombre} {fase['wall']:.3f}s"
+                                    for nombre, fase in lento["fases"].items())
+                f.write(f"{lento['duracion']:8.3f}s  {lento['archivo']}")
+                f.write(f"  [{detalle}]\n" if detalle else "\n")
+
+        perfiles = summary.get("perfiles")
+        if perfiles:
+            f.write("\n=== PERFILES (cProfile) ===\n")
+            for perfil in perfiles:
+                f.write(f"{perfil['archivo']} -> {perfil['stats']}\n")
@@ -0,0 +1,147 @@
+"""
+Caché LRU en proceso de plantillas ya cargadas (opcional).
+
+Cuando el operador repite la misma carpeta con otros valores, cada archivo se
+vuelve a abrir y parsear. Con la caché activada:
+
+- .docx: se guarda el Document parseado y cada render recibe una copia
+  profunda (lxml copia los árboles en C; mucho más barato que reparsear).
+- .xlsx: openpyxl no permite duplicar un Workbook de forma fiable ni más
+  rápida que cargarlo (deepcopy es más lento y rompe los estilos), así que se
+  guardan los bytes del paquete y se evita al menos la lectura de disco.
+
+Las entradas se invalidan por ruta + mtime + tamaño y se desalojan por LRU
+cuando se supera el número de entradas o la suma de bytes de los archivos.
+La caché vive en el proceso que la configura, así que solo sirve cuando los
+archivos se procesan en ese proceso y este sobrevive entre lotes: run_batch
+con workers=1 (la interfaz lo fuerza al activarla). Los workers de un pool se
+crean y destruyen en cada run_batch y no llegarían a reutilizar nada; con
+varios workers run_batch no la activa.
+
+Por defecto la caché está desactivada; ver configure_template_cache().
+"""
+import copy
+import io
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class TemplateCache:
+    """Caché LRU acotada por número de entradas y bytes totales."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # clave -> (firma, plantilla, bytes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path: str, kind: str, loader):
+        """
+        Devuelve la plantilla cacheada de `path` o la carga con loader(path).
+
+        La firma (mtime, tamaño) se comprueba en cada acceso, de modo que un
+        archivo modificado se vuelve a cargar.
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), kind)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        template = loader(path)
+        self._put(key, signature, template, stat.st_size)
+        return template
+
+    def _put(self, key, signature, template, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            if size > self.max_bytes:
+                return  # No cabe: se usa sin cachear
+            self._entries[key] = (signature, template, size)
+            self.total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self.total_bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_CACHE = None
+
+
+def configure_template_cache(max_entries: int = DEFAULT_MAX_ENTRIES,
+                             max_bytes: int = DEFAULT_MAX_BYTES):
+    """Activa (o redimensiona) la caché de plantillas de este proceso."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = TemplateCache(max_entries, max_bytes)
+    else:
+        _CACHE.max_entries = max_entries
+        _CACHE.max_bytes = max_bytes
+    return _CACHE
+
+
+def disable_template_cache():
+    """Desactiva la caché y libera las plantillas retenidas."""
+    global _CACHE
+    if _CACHE is not None:
+        _CACHE.clear()
+    _CACHE = None
+
+
+def get_template_cache():
+    """Caché activa o None si está desactivada."""
+    return _CACHE
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def open_document(path):
+    """Document listo para modificar: copia de la plantilla cacheada o carga directa."""
+    from docx import Document
+
+    if _CACHE is None or not isinstance(path, (str, os.PathLike)):
+        return Document(path)
+    return copy.deepcopy(_CACHE.get(path, "docx", Document))
+
+
+def open_workbook(path):
+    """Workbook listo para modificar; con caché se evita releer el archivo del disco."""
+    from openpyxl import load_workbook
+
+    if _CACHE is None or not isinstance(path, (str, os.PathLike)):
+        return load_workbook(path)
+    return load_workbook(io.BytesIO(_CACHE.get(path, "xlsx", _read_bytes)))
@@ -0,0 +1,128 @@
+"""
+Utilidades compartidas por los editores, el lote y la interfaz.
+
+Medición por fases: los editores acumulan en stats["phases"] el tiempo de
+pared y de CPU de cada fase (carga, texto, imágenes, guardado...) con
+timed_phase(); los totales del lote los agrega processor.report.
+
+Registro de mensajes: todos los módulos escriben en loggers hijos de
+"processor" (logging.getLogger(__name__)). Por defecto solo se muestran
+advertencias y errores; los mensajes por celda, párrafo o imagen son DEBUG y
+se formatean de forma perezosa, así que con el nivel por defecto no cuestan
+E/S ni formateo.
+"""
+import io
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+LOGGER_NAME = "processor"
+DEFAULT_LOG_LEVEL = logging.WARNING
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+class _ProcessorHandler(logging.StreamHandler):
+    """Handler propio: permite reconfigurar sin duplicar salidas."""
+
+
+def parse_log_level(level):
+    """Convierte "info"/"DEBUG"/20/None en un nivel numérico de logging."""
+    if level is None:
+        return DEFAULT_LOG_LEVEL
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Nivel de log desconocido: {level} (use {', '.join(LOG_LEVELS)})")
+    return value
+
+
+def configure_logging(level=None, stream=None):
+    """
+    Configura el logger del paquete (una sola vez por proceso; llamadas
+    posteriores solo cambian el nivel o el stream).
+
+    Args:
+        level: Nombre o número del nivel (None = WARNING)
+        stream: Destino de los mensajes (por defecto stderr)
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(parse_log_level(level))
+    logger.propagate = False
+
+    handler = next((h for h in logger.handlers if isinstance(h, _ProcessorHandler)), None)
+    if handler is None:
+        handler = _ProcessorHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    elif stream is not None:
+        handler.setStream(stream)
+    return logger
+
+
+def current_log_level():
+    """Nivel efectivo del logger del paquete (para reenviarlo a los workers)."""
+    return logging.getLogger(LOGGER_NAME).getEffectiveLevel()
+
+
+def source_name(source):
+    """Nombre para los mensajes: basename de una ruta o de un archivo abierto; "<memoria>" para buffers."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    name = getattr(source, "name", None)
+    if isinstance(name, str):
+        return os.path.basename(name)
+    return "<memoria>"
+
+
+def as_binary_stream(source):
+    """Archivo binario con acceso aleatorio para bytes, bytearray, memoryview o un archivo abierto."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if getattr(source, "seekable", None) and source.seekable():
+        return source
+    # Los paquetes zip necesitan seek: un stream secuencial se lee entero
+    return io.BytesIO(source.read())
+
+
+def process_in_memory(process_file, source, output=None, *args, **kwargs):
+    """
+    Ejecuta process_word_file/process_excel_file sobre datos en memoria.
+
+    Args:
+        process_file: Función de proceso (entrada, salida, reemplazos, ...)
+        source: Entrada como bytes, bytearray, memoryview o archivo binario
+        output: Archivo binario de salida (None = devolver los bytes)
+        args, kwargs: Resto de argumentos de process_file
+
+    Returns:
+        (bytes del resultado, o None si se escribió en `output`; contadores de process_file)
+    """
+    seekable = output is not None and getattr(output, "seekable", None) and output.seekable()
+    target = output if seekable else io.BytesIO()
+    stats = process_file(as_binary_stream(source), target, *args, **kwargs)
+    if output is None:
+        return target.getvalue(), stats
+    if target is not output:
+        output.write(target.getbuffer())
+    return None, stats
+
+
+def add_phase_time(stats: dict, name: str, wall: float, cpu: float = None):
+    """Suma tiempo a stats["phases"][name] (cpu=None: fase medida solo en tiempo de pared)."""
+    phase = stats.setdefault("phases", {}).setdefault(name, {"wall": 0.0})
+    phase["wall"] += wall
+    if cpu is not None:
+        phase["cpu"] = phase.get("cpu", 0.0) + cpu
+
+
+@contextmanager
+def timed_phase(stats: dict, name: str):
+    """Mide el bloque (pared y CPU de este proceso) como la fase `name` de stats."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        add_phase_time(stats, name, time.perf_counter() - wall, time.process_time() - cpu)
@@ -1,230 +1,133 @@
 from docx import Document
 from docx.shared import Cm, Inches
 from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+import io
+import logging
 import os
-from PIL import Image
+import time
+from processor.docx_xml import apply_matches, paragraph_segments, replace_text_docx_xml
+from processor.image_assets import (add_picture_from_asset, get_image_asset, image_source_exists,
+                                    image_source_label, is_in_memory_image, render_asset,
+                                    resolve_image_sources)
+from processor.matcher import compile_replacements
+from processor.package import save_document_passthrough
+from processor.template_cache import open_document
+from processor.utils import add_phase_time, process_in_memory, source_name, timed_phase
 
-def replace_text(doc: Document, replacements: dict, image_replacements: dict):
-    """Reemplaza texto preservando estilos completamente."""
-    def replace_in_paragraphs(paragraphs):
-        for paragraph in paragraphs:
-            full_text = ''.join(run.text for run in paragraph.runs)
-            needs_replacement = any(key in full_text for key in replacements.keys())
-            if needs_replacement:
-                replace_text_preserve_formatting(paragraph, replacements)
+logger = logging.getLogger(__name__)
 
-    def replace_text_preserve_formatting(paragraph, replacements):
-        char_formats = []
-        full_text = ""
-        
-        for run in paragraph.runs:
-            for char in run.text:
-                char_formats.append({
-                    'char': char,
-                    'font_name': run.font.name,
-                    'font_size': run.font.size,
-                    'bold': run.font.bold,
-                    'italic': run.font.italic,
-                    'underline': run.font.underline,
-                    'color': run.font.color.rgb if run.font.color.rgb else None,
-                })
-                full_text += char
-        
-        modified_text = full_text
-        for key, value in replacements.items():
-            modified_text = modified_text.replace(key, value)
-        
-        if modified_text != full_text:
-            rebuild_paragraph_with_formatting(paragraph, char_formats, modified_text)
+_W_P = qn('w:p')
+_W_R = qn('w:r')
+_IMAGE_TAGS = (qn('w:drawing'), qn('w:pict'))
+_STORY_REFERENCES = (qn('w:headerReference'), qn('w:footerReference'))
 
-    def rebuild_paragraph_with_formatting(paragraph, char_formats, new_text):
-        for run in paragraph.runs[:]:
-            run._element.getparent().remove(run._element)
-        
-        if new_text and char_formats:
-            base_format = char_formats[0]
-            run = paragraph.add_run(new_text)
-            apply_format_to_run(run, base_format)
-        elif new_text:
-            paragraph.add_run(new_text)
+def iter_document_stories(doc: Document):
+    """
+    Genera (ubicación, parte, raíz XML) del cuerpo y de cada encabezado/pie una sola vez.
+
+    Los encabezados y pies se obtienen de los w:headerReference/w:footerReference
+    de cada sección (incluidas las variantes de primera página y páginas pares)
+    y se deduplican por parte: varias secciones pueden compartir el mismo. No se
+    usan section.header y similares porque python-docx crea la definición si no
+    existe.
+    """
+    yield "contenido principal", doc.part, doc.element.body
+    
+    seen_parts = set()
+    for section_idx, sect_pr in enumerate(doc.element.body.iter(qn('w:sectPr'))):
+        for reference in sect_pr.iterchildren(*_STORY_REFERENCES):
+            part = doc.part.related_parts.get(reference.get(qn('r:id')))
+            if part is None or part in seen_parts:
+                continue
+            seen_parts.add(part)
+            kind = "header" if reference.tag == qn('w:headerReference') else "footer"
+            yield f"{kind} {reference.get(qn('w:type'), 'default')} sección {section_idx+1}", part, part.element
+
+def visit_document(doc: Document, handlers):
+    """
+    Recorre una sola vez cada párrafo de todas las historias del documento.
 
-    def apply_format_to_run(run, format_info):
-        if format_info.get('font_name'):
-            run.font.name = format_info['font_name']
-        if format_info.get('font_size'):
-            run.font.size = format_info['font_size']
-        if format_info.get('bold') is not None:
-            run.font.bold = format_info['bold']
-        if format_info.get('italic') is not None:
-            run.font.italic = format_info['italic']
-        if format_info.get('underline') is not None:
-            run.font.underline = format_info['underline']
-        if format_info.get('color'):
-            run.font.color.rgb = format_info['color']
+    Incluye tablas anidadas y cuadros de texto. Cada handler se llama como
+    handler(p, parte, ubicación) con el elemento w:p. Devuelve
+    {"stories": historias, "paragraphs": párrafos visitados}.
+    """
+    stats = {"stories": 0, "paragraphs": 0}
+    for location, part, root in iter_document_stories(doc):
+        stats["stories"] += 1
+        # Lista previa: los handlers modifican el árbol mientras se recorre
+        for paragraph_idx, p in enumerate(list(root.iter(_W_P))):
+            stats["paragraphs"] += 1
+            for handler in handlers:
+                handler(p, part, f"{location}, párrafo {paragraph_idx+1}")
+    return stats
 
-    def replace_in_tables(tables):
-        for table in tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    replace_in_paragraphs(cell.paragraphs)
+def text_handler(replacements):
+    """
+    Handler de visit_document para reemplazos de texto.
 
-    # Procesar todo el documento
-    replace_in_paragraphs(doc.paragraphs)
-    replace_in_tables(doc.tables)
+    Cuenta en handler.replaced los reemplazos y en handler.runs_rewritten los
+    w:t reescritos.
+    """
+    # Un solo matcher para todo el documento (memorizado entre archivos del lote)
+    matcher = compile_replacements(replacements)
     
-    for section in doc.sections:
-        for header in [section.header, section.first_page_header, section.even_page_header]:
-            if header is not None:
-                try:
-                    if hasattr(header, 'paragraphs') and header.paragraphs:
-                        replace_in_paragraphs(header.paragraphs)
-                    if hasattr(header, 'tables') and header.tables:
-                        replace_in_tables(header.tables)
-                except Exception as e:
-                    print(f"⚠️ Error procesando header: {e}")
-                    
-        for footer in [section.footer, section.first_page_footer, section.even_page_footer]:
-            if footer is not None:
-                try:
-                    if hasattr(footer, 'paragraphs') and footer.paragraphs:
-                        replace_in_paragraphs(footer.paragraphs)
-                    if hasattr(footer, 'tables') and footer.tables:
-                        replace_in_tables(footer.tables)
-                except Exception as e:
-                    print(f"⚠️ Error procesando footer: {e}")
+    def handle(p, part, location):
+        # Las coincidencias se ubican sobre los límites de los runs y solo se
+        # reescriben los w:t afectados; el w:rPr de cada run queda intacto
+        segments = paragraph_segments(p)
+        matches = list(matcher.finditer("".join(text for _, text in segments)))
+        if matches:
+            handle.replaced += len(matches)
+            handle.runs_rewritten += len(apply_matches(segments, matches, matcher.replacements))
+    
+    handle.replaced = 0
+    handle.runs_rewritten = 0
+    return handle
+
+def paragraph_has_images(p):
+    """Verifica si alguno de los runs del párrafo contiene imágenes."""
+    for run in p.iterchildren(_W_R):
+        for elem in run:
+            if elem.tag in _IMAGE_TAGS:
+                return True
+    return False
 
 def get_replacement_path(replacement_info):
-    """Obtiene la ruta de reemplazo."""
-    if isinstance(replacement_info, str):
+    """Obtiene la ruta de reemplazo (o la imagen en memoria, ver processor.image_assets)."""
+    if isinstance(replacement_info, str) or is_in_memory_image(replacement_info):
         return replacement_info
     return replacement_info.get('path') if isinstance(replacement_info, dict) else None
 
-def replace_placeholder_images(doc: Document, placeholder_replacements: dict):
-    """Sistema de placeholders con reconstrucción completa de párrafos."""
-    print("🔍 Buscando imágenes placeholder para reemplazar...")
-    print(f"📋 Reemplazos disponibles: {list(placeholder_replacements.keys())}")
+def validate_placeholder_replacements(placeholder_replacements: dict):
+    """Indica si al menos un archivo de reemplazo existe."""
+    logger.debug("📋 Reemplazos disponibles: %s", list(placeholder_replacements))
     
     if not placeholder_replacements:
-        print("❌ No hay reemplazos de placeholders configurados")
-        return 0
+        logger.warning("❌ No hay reemplazos de placeholders configurados")
+        return False
     
     # Verificar que al menos un archivo de reemplazo existe
-    print("🔍 Verificando archivos de reemplazo...")
+    logger.debug("🔍 Verificando archivos de reemplazo...")
     valid_replacement_found = False
     for name, info in placeholder_replacements.items():
         path = get_replacement_path(info)
-        if path and os.path.exists(path):
-            print(f"✅ {name} -> {path}")
+        if path is not None and image_source_exists(path):
+            logger.debug("✅ %s -> %s", name, image_source_label(path))
             valid_replacement_found = True
         else:
-            print(f"❌ {name} -> {path} (NO EXISTE)")
+            logger.warning("❌ %s -> %s (NO EXISTE)", name, path)
     
     if not valid_replacement_found:
-        print("❌ No hay archivos de reemplazo válidos")
-        return 0
-    
-    total_replaced = 0
-    
-    # Ya no usamos replacement_queue - usamos directamente placeholder_replacements
-    
-    def process_all_paragraphs():
-        nonlocal total_replaced
-        
-        # Procesar párrafos principales
-        total_replaced += process_paragraph_list(doc.paragraphs, "contenido principal")
-        
-        # Procesar tablas
-        for i, table in enumerate(doc.tables):
-            for j, row in enumerate(table.rows):
-                for k, cell in enumerate(row.cells):
-                    total_replaced += process_paragraph_list(
-                        cell.paragraphs, f"tabla {i+1}, celda ({j+1},{k+1})"
-                    )
-        
-        # Procesar headers y footers
-        for i, section in enumerate(doc.sections):
-            headers = [
-                (section.header, "header principal"),
-                (section.first_page_header, "header primera página"), 
-                (section.even_page_header, "header páginas pares")
-            ]
-            
-            for header, name in headers:
-                if header is not None:
-                    try:
-                        # Verificar que el header realmente existe y tiene contenido
-                        if hasattr(header, '_element') and header._element is not None:
-                            print(f"📋 Procesando {name} en sección {i+1}...")
-                            
-                            # Procesar párrafos del header
-                            if hasattr(header, 'paragraphs') and header.paragraphs:
-                                total_replaced += process_paragraph_list(
-                                    header.paragraphs, f"{name} sección {i+1}"
-                                )
-                            
-                            # Procesar tablas del header (CRÍTICO PARA TU CASO)
-                            if hasattr(header, 'tables') and header.tables:
-                                print(f"📊 Encontradas {len(header.tables)} tablas en {name}")
-                                for j, table in enumerate(header.tables):
-                                    print(f"   Procesando tabla {j+1} del header...")
-                                    for k, row in enumerate(table.rows):
-                                        for l, cell in enumerate(row.cells):
-                                            cell_replaced = process_paragraph_list(
-                                                cell.paragraphs, f"tabla {j+1} en {name} sección {i+1}, celda ({k+1},{l+1})"
-                                            )
-                                            if cell_replaced > 0:
-                                                print(f"   ✅ Reemplazadas {cell_replaced} imágenes en tabla del header")
-                                            total_replaced += cell_replaced
-                    except Exception as e:
-                        print(f"⚠️ Error procesando {name} en sección {i+1}: {e}")
-            
-            footers = [
-                (section.footer, "footer principal"),
-                (section.first_page_footer, "footer primera página"),
-                (section.even_page_footer, "footer páginas pares")
-            ]
-            
-            for footer, name in footers:
-                if footer is not None:
-                    try:
-                        # Verificar que el footer realmente existe y tiene contenido
-                        if hasattr(footer, '_element') and footer._element is not None:
-                            print(f"📋 Procesando {name} en sección {i+1}...")
-                            
-                            # Procesar párrafos del footer
-                            if hasattr(footer, 'paragraphs') and footer.paragraphs:
-                                total_replaced += process_paragraph_list(
-                                    footer.paragraphs, f"{name} sección {i+1}"
-                                )
-                            
-                            # Procesar tablas del footer
-                            if hasattr(footer, 'tables') and footer.tables:
-                                for j, table in enumerate(footer.tables):
-                                    for k, row in enumerate(table.rows):
-                                        for l, cell in enumerate(row.cells):
-                                            total_replaced += process_paragraph_list(
-                                                cell.paragraphs, f"tabla en {name} sección {i+1}"
-                                            )
-                    except Exception as e:
-                        print(f"⚠️ Error procesando {name} en sección {i+1}: {e}")
-    
-    def process_paragraph_list(paragraphs, location):
-        replaced_count = 0
-        for i, paragraph in enumerate(paragraphs):
-            if paragraph_has_images(paragraph):
-                if replace_images_in_paragraph(paragraph, f"{location}, párrafo {i+1}"):
-                    replaced_count += 1
-        return replaced_count
+        logger.warning("❌ No hay archivos de reemplazo válidos")
+    return valid_replacement_found
+
+def image_handler(placeholder_replacements: dict):
+    """Handler de visit_document para placeholders de imagen; cuenta en handler.replaced."""
     
-    def paragraph_has_images(paragraph):
-        """Verifica si el párrafo contiene imágenes."""
-        for run in paragraph.runs:
-            for elem in run._element:
-                if (elem.tag.endswith('drawing') or 
-                    elem.tag.endswith('pict') or
-                    'pic:pic' in elem.tag):
-                    return True
-        return False
+    def handle(p, part, location):
+        if paragraph_has_images(p) and replace_images_in_paragraph(Paragraph(p, part), location):
+            handle.replaced += 1
     
     def replace_images_in_paragraph(paragraph, location):
         """Reemplaza imágenes en un párrafo reconstruyéndolo completamente."""
@@ -249,7 +152,7 @@ def replace_placeholder_images(doc: Document, placeholder_replacements: dict):
             placeholder_name, replacement_info = list(placeholder_replacements.items())[0]
             replacement_path = get_replacement_path(replacement_info)
             
-            if replacement_path and os.path.exists(replacement_path):
+            if replacement_path is not None and image_source_exists(replacement_path):
                 # Método directo: solo reemplazar la imagen
                 for run in paragraph.runs:
                     for elem in run._element[:]:
@@ -266,9 +169,10 @@ def replace_placeholder_images(doc: Document, placeholder_replacements: dict):
                             # Añadir imagen nueva SIN tocar el texto
                             width = Cm(new_dims['width_cm'])
                             height = Cm(new_dims['height_cm'])
-                            run.add_picture(replacement_path, width=width, height=height)
+                            asset = render_asset(get_image_asset(replacement_path), new_dims['width_cm'], new_dims['height_cm'])
+                            add_picture_from_asset(run, asset, width=width, height=height)
                             
-                            print(f"✅ Imagen reemplazada en {location}")
+                            logger.debug("✅ Imagen reemplazada en %s", location)
                             return True
             
             return False
@@ -317,84 +221,9 @@ def replace_placeholder_images(doc: Document, placeholder_replacements: dict):
             #     return False
             
         except Exception as e:
-            print(f"❌ Error general procesando párrafo en {location}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error general procesando párrafo en %s: %s", location, e)
             return False
     
-    def analyze_paragraph_content(paragraph):
-        """Analiza el contenido del párrafo y crea un mapa de elementos."""
-        content_map = []
-        
-        for run in paragraph.runs:
-            run_content = {'type': 'text', 'text': run.text, 'format': extract_run_format(run)}
-            
-            # Buscar imágenes en el run
-            has_image = False
-            for elem in run._element:
-                if (elem.tag.endswith('drawing') or 
-                    elem.tag.endswith('pict')):
-                    # Este run contiene una imagen
-                    image_info = extract_image_info(elem)
-                    content_map.append({
-                        'type': 'image',
-                        'original_dimensions': image_info,
-                        'element': elem
-                    })
-                    has_image = True
-                    break
-            
-            # Solo añadir el texto si no hay imagen o si hay texto además de la imagen
-            if not has_image and run.text:
-                content_map.append(run_content)
-            elif has_image and run.text:
-                # Texto junto con imagen - dividir si es necesario
-                content_map.append(run_content)
-        
-        return content_map
-    
-    def extract_run_format(run):
-        """Extrae el formato de un run."""
-        return {
-            'font_name': run.font.name,
-            'font_size': run.font.size,
-            'bold': run.font.bold,
-            'italic': run.font.italic,
-            'underline': run.font.underline,
-            'color': run.font.color.rgb if run.font.color.rgb else None
-        }
-    
-    def reconstruct_paragraph_with_replacements(paragraph, content_map):
-        """Reconstruye el párrafo con las imágenes reemplazadas."""
-        # Guardar propiedades del párrafo original
-        original_style = paragraph.style
-        original_alignment = paragraph.alignment
-        
-        # Limpiar el párrafo
-        for run in paragraph.runs[:]:
-            run._element.getparent().remove(run._element)
-        
-        # Reconstruir contenido
-        for item in content_map:
-            if item['type'] == 'text' and item['text']:
-                run = paragraph.add_run(item['text'])
-                apply_format_to_run(run, item['format'])
-                
-            elif item['type'] == 'image':
-                if 'replacement' in item:
-                    # Insertar imagen de reemplazo
-                    run = paragraph.add_run()
-                    width = Cm(item['replacement']['dimensions']['width_cm'])
-                    height = Cm(item['replacement']['dimensions']['height_cm'])
-                    run.add_picture(item['replacement']['path'], width=width, height=height)
-                else:
-                    # Mantener imagen original (esto no debería pasar)
-                    print("⚠️ Imagen original mantenida")
-        
-        # Restaurar propiedades del párrafo
-        paragraph.style = original_style
-        paragraph.alignment = original_alignment
-    
     def extract_image_info(image_elem):
         """Extrae información de dimensiones de la imagen."""
         try:
@@ -431,293 +260,181 @@ def replace_placeholder_images(doc: Document, placeholder_replacements: dict):
         }
     
     def calculate_aspect_ratio_dimensions(image_path, max_width, max_height):
-        """Calcula dimensiones manteniendo aspect ratio."""
+        """Calcula dimensiones manteniendo aspect ratio (memorizadas en la caché de imágenes)."""
         try:
-            with Image.open(image_path) as img:
-                img_width, img_height = img.size
-                aspect_ratio = img_width / img_height
-                
-                if aspect_ratio > 1:
-                    width = max_width
-                    height = max_width / aspect_ratio
-                    if height > max_height:
-                        height = max_height
-                        width = max_height * aspect_ratio
-                else:
-                    height = max_height
-                    width = max_height * aspect_ratio
-                    if width > max_width:
-                        width = max_width
-                        height = max_width / aspect_ratio
-                
-                return {'width_cm': width, 'height_cm': height}
-        except:
+            asset = get_image_asset(image_path)
+        except Exception:
             return {'width_cm': max_width, 'height_cm': max_height}
-    
-    def debug_document_structure():
-        """Función de debugging para verificar la estructura del documento."""
-        print("\n🔍 ANÁLISIS DETALLADO DEL DOCUMENTO:")
-        print(f"   📄 Párrafos principales: {len(doc.paragraphs)}")
-        print(f"   📊 Tablas principales: {len(doc.tables)}")
-        print(f"   📋 Secciones: {len(doc.sections)}")
         
-        # Verificar cada sección
-        for i, section in enumerate(doc.sections):
-            print(f"\n   📋 SECCIÓN {i+1}:")
+        def compute():
+            aspect_ratio = asset.aspect_ratio
             
-            # Verificar headers
-            headers = [
-                (section.header, "header principal"),
-                (section.first_page_header, "header primera página"),
-                (section.even_page_header, "header páginas pares")
-            ]
+            if aspect_ratio > 1:
+                width = max_width
+                height = max_width / aspect_ratio
+                if height > max_height:
+                    height = max_height
+                    width = max_height * aspect_ratio
+            else:
+                height = max_height
+                width = max_height * aspect_ratio
+                if width > max_width:
+                    width = max_width
+                    height = max_width / aspect_ratio
             
-            for header, name in headers:
-                if header is not None:
-                    try:
-                        has_paragraphs = (hasattr(header, 'paragraphs') and len(header.paragraphs) > 0)
-                        has_tables = (hasattr(header, 'tables') and len(header.tables) > 0)
-                        
-                        print(f"      {name}:")
-                        print(f"         📄 Párrafos: {len(header.paragraphs) if has_paragraphs else 0}")
-                        print(f"         📊 Tablas: {len(header.tables) if has_tables else 0}")
-                        
-                        # Revisar párrafos
-                        if has_paragraphs:
-                            for p_idx, p in enumerate(header.paragraphs):
-                                has_img = paragraph_has_images(p)
-                                if has_img or p.text.strip():
-                                    img_marker = "📷" if has_img else "📝"
-                                    print(f"            {img_marker} Párrafo {p_idx+1}: '{p.text[:30]}...'")
-                        
-                        # Revisar tablas (ESTO ES CLAVE PARA TU CASO)
-                        if has_tables:
-                            for t_idx, table in enumerate(header.tables):
-                                print(f"         📊 TABLA {t_idx+1}: {len(table.rows)} filas x {len(table.columns)} columnas")
-                                
-                                for r_idx, row in enumerate(table.rows):
-                                    for c_idx, cell in enumerate(row.cells):
-                                        cell_has_images = any(paragraph_has_images(p) for p in cell.paragraphs)
-                                        cell_text = ' '.join(p.text for p in cell.paragraphs).strip()
-                                        
-                                        if cell_has_images or cell_text:
-                                            img_marker = "📷" if cell_has_images else "📝"
-                                            print(f"            {img_marker} Fila {r_idx+1}, Col {c_idx+1}: '{cell_text[:20]}...'")
-                                            
-                                            if cell_has_images:
-                                                print(f"               ⚠️ ¡IMAGEN ENCONTRADA AQUÍ!")
-                        
-                    except Exception as e:
-                        print(f"      {name}: ❌ Error: {e}")
-                else:
-                    print(f"      {name}: ❌ No existe")
+            return {'width_cm': width, 'height_cm': height}
         
-        print("\n")
+        return dict(asset.memoize(('word_aspect', max_width, max_height), compute))
     
-    def force_process_header_tables():
-        """Función específica para procesar agresivamente las tablas en headers."""
-        nonlocal total_replaced
-        
-        print("🔍 PROCESAMIENTO ESPECÍFICO DE TABLAS EN HEADERS...")
-        
-        # Crear una cola fresca específica para headers
-        header_queue = list(placeholder_replacements.items())
-        
-        if not header_queue:
-            print("⚠️ No hay reemplazos disponibles para headers")
-            return
-        
-        print(f"📋 Reemplazos disponibles para headers: {len(header_queue)}")
-        headers_processed = 0
-        
-        for i, section in enumerate(doc.sections):
-            headers = [
-                (section.header, "header principal"),
-                (section.first_page_header, "header primera página"),
-                (section.even_page_header, "header páginas pares")
-            ]
-            
-            for header, name in headers:
-                if header is not None and hasattr(header, 'tables') and header.tables:
-                    section_has_images = False
-                    
-                    # Primero verificar si hay imágenes en esta sección
-                    for table in header.tables:
-                        for row in table.rows:
-                            for cell in row.cells:
-                                for paragraph in cell.paragraphs:
-                                    if paragraph_has_images(paragraph):
-                                        section_has_images = True
-                                        break
-                                if section_has_images:
-                                    break
-                            if section_has_images:
-                                break
-                        if section_has_images:
-                            break
-                    
-                    if section_has_images:
-                        print(f"🎯 Procesando FORZADAMENTE tablas en {name} sección {i+1}")
-                        headers_processed += 1
-                        
-                        for table_idx, table in enumerate(header.tables):
-                            print(f"   📊 Tabla {table_idx+1}: {len(table.rows)}x{len(table.columns)}")
-                            
-                            for row_idx, row in enumerate(table.rows):
-                                for col_idx, cell in enumerate(row.cells):
-                                    for para_idx, paragraph in enumerate(cell.paragraphs):
-                                        if paragraph_has_images(paragraph):
-                                            location = f"{name} sección {i+1}, tabla {table_idx+1}, celda ({row_idx+1},{col_idx+1}), párrafo {para_idx+1}"
-                                            print(f"      🎯 IMAGEN DETECTADA en {location}")
-                                            
-                                            if replace_image_direct_method(paragraph, location, header_queue):
-                                                print(f"      ✅ IMAGEN REEMPLAZADA en {location}")
-                                                total_replaced += 1
-                                            else:
-                                                print(f"      ❌ FALLÓ el reemplazo en {location}")
-        
-        print(f"📋 Headers procesados: {headers_processed}")
+    handle.replaced = 0
+    return handle
 
-    def replace_image_direct_method(paragraph, location, available_replacements):
-        """Método directo más simple para reemplazar imágenes."""
-        try:
-            if not available_replacements:
-                print(f"      ⚠️ No hay reemplazos disponibles")
-                return False
-            
-            # Tomar el primer reemplazo disponible (SIN REMOVERLO de la cola)
-            placeholder_name, replacement_info = available_replacements[0]
-            replacement_path = get_replacement_path(replacement_info)
-            
-            print(f"      🔄 Intentando reemplazar con: {os.path.basename(replacement_path) if replacement_path else 'N/A'}")
-            
-            if not replacement_path or not os.path.exists(replacement_path):
-                print(f"      ❌ Archivo no encontrado: {replacement_path}")
-                return False
-            
-            # Buscar la imagen en el párrafo y reemplazarla directamente
-            for run_idx, run in enumerate(paragraph.runs):
-                image_found = False
-                for elem in run._element[:]:  # Crear copia para iterar
-                    if (elem.tag.endswith('drawing') or 
-                        elem.tag.endswith('pict') or 
-                        'pic:pic' in str(elem.tag)):
-                        
-                        print(f"      🎯 Imagen encontrada en run {run_idx+1}, reemplazando...")
-                        
-                        # Extraer dimensiones originales
-                        original_dims = extract_image_info_simple(elem)
-                        
-                        # Calcular nuevas dimensiones
-                        new_dims = calculate_replacement_dimensions(
-                            replacement_path, replacement_info, original_dims
-                        )
-                        
-                        print(f"      📏 Dimensiones: {new_dims['width_cm']:.1f}x{new_dims['height_cm']:.1f}cm")
-                        
-                        # Método más directo: limpiar run y añadir imagen
-                        try:
-                            # Eliminar el elemento de imagen
-                            elem.getparent().remove(elem)
-                            
-                            # Limpiar cualquier texto del run
-                            run.text = ""
-                            
-                            # Añadir nueva imagen
-                            width = Cm(new_dims['width_cm'])
-                            height = Cm(new_dims['height_cm'])
-                            run.add_picture(replacement_path, width=width, height=height)
-                            
-                            print(f"      ✅ Imagen insertada exitosamente usando {placeholder_name}")
-                            image_found = True
-                            return True
-                            
-                        except Exception as insert_error:
-                            print(f"      ❌ Error insertando imagen: {insert_error}")
-                            return False
-                
-                if image_found:
-                    break
-            
-            print(f"      ⚠️ No se encontraron elementos de imagen válidos")
-            return False
-            
-        except Exception as e:
-            print(f"      ❌ Error en método directo: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+def _timed_handler(handler):
+    """Envuelve un handler acumulando su tiempo de pared en wrapper.wall."""
+    def wrapper(p, part, location):
+        start = time.perf_counter()
+        handler(p, part, location)
+        wrapper.wall += time.perf_counter() - start
+    wrapper.wall = 0.0
+    return wrapper
 
-    def extract_image_info_simple(image_elem):
-        """Extrae información de imagen de manera más robusta."""
-        try:
-            width_cm = 3.0
-            height_cm = 2.0
-            
-            # Buscar dimensiones en diferentes niveles del XML
-            for descendant in image_elem.iter():
-                if hasattr(descendant, 'attrib'):
-                    attrib = descendant.attrib
-                    if 'cx' in attrib and 'cy' in attrib:
-                        try:
-                            width_cm = max(0.5, int(attrib['cx']) / 914400 * 2.54)
-                            height_cm = max(0.5, int(attrib['cy']) / 914400 * 2.54)
-                            break
-                        except (ValueError, TypeError):
-                            continue
-            
-            print(f"      📐 Dimensiones extraídas: {width_cm:.1f}x{height_cm:.1f}cm")
-            return {'width_cm': width_cm, 'height_cm': height_cm}
-            
-        except Exception as e:
-            print(f"      ⚠️ Error extrayendo dimensiones: {e}")
-            return {'width_cm': 3.0, 'height_cm': 2.0}
-    
-    # Ejecutar debugging primero
-    debug_document_structure()
-    
-    # Ejecutar procesamiento normal PRIMERO (para párrafos principales)
-    print("📄 FASE 2A: Procesamiento normal del documento...")
-    process_all_paragraphs()
-    
-    # Ejecutar procesamiento forzado de headers DESPUÉS (con cola fresca)
-    print("📄 FASE 2B: Procesamiento específico de headers...")
-    force_process_header_tables()
+def process_document(doc: Document, replacements=None, placeholder_replacements: dict = None,
+                     stats: dict = None):
+    """
+    Texto e imágenes de un documento en un único recorrido.
+
+    Returns:
+        Estadísticas del recorrido (en `stats` si se indica) más
+        "text_replaced", "runs_rewritten", "images_replaced" y las fases
+        "visit" (recorrido completo), "text" e "images" en stats["phases"].
+    """
+    if stats is None:
+        stats = {}
+    handlers = {}
+    text = images = None
+    if replacements:
+        text = text_handler(replacements)
+        handlers["text"] = _timed_handler(text)
+    if placeholder_replacements:
+        logger.debug("🔍 Buscando imágenes placeholder para reemplazar...")
+        if validate_placeholder_replacements(placeholder_replacements):
+            images = image_handler(placeholder_replacements)
+            handlers["images"] = _timed_handler(images)
     
-    print(f"🎯 Total de placeholders reemplazados: {total_replaced}")
+    with timed_phase(stats, "visit"):
+        visited = visit_document(doc, list(handlers.values())) if handlers else {"stories": 0, "paragraphs": 0}
+    for phase, handler in handlers.items():
+        add_phase_time(stats, phase, handler.wall)
+    stats.update(visited)
+    stats["text_replaced"] = stats.get("text_replaced", 0) + (text.replaced if text else 0)
+    stats["runs_rewritten"] = text.runs_rewritten if text else 0
+    stats["images_replaced"] = images.replaced if images else 0
+    logger.debug("🔎 Recorrido único: %d párrafos en %d historias", stats["paragraphs"], stats["stories"])
+    return stats
+
+def replace_text(doc: Document, replacements: dict, image_replacements: dict = None):
+    """Reemplaza texto preservando estilos completamente."""
+    return process_document(doc, replacements)["text_replaced"]
+
+def replace_placeholder_images(doc: Document, placeholder_replacements: dict):
+    """Sistema de placeholders: reemplaza las imágenes de cada párrafo que las contenga."""
+    total_replaced = process_document(doc, None, placeholder_replacements)["images_replaced"]
+    logger.info("🎯 Total de placeholders reemplazados: %d", total_replaced)
     return total_replaced
 
-def process_word_file(input_path: str, output_path: str, replacements: dict, 
-                     image_replacements: dict = None, placeholder_replacements: dict = None):
-    """Procesa archivo Word con sistema robusto de reemplazo de placeholders."""
+def process_word_file(input_path, output_path, replacements: dict, 
+                     image_replacements: dict = None, placeholder_replacements: dict = None,
+                     engine: str = "docx", passthrough_save: bool = False):
+    """
+    Procesa archivo Word con sistema robusto de reemplazo de placeholders.
+
+    engine="docx" usa el modelo de objetos de python-docx; engine="xml" reemplaza
+    el texto directamente sobre el XML del paquete (ver processor.docx_xml) y
+    solo carga python-docx si hay placeholders de imagen que procesar.
+    Con passthrough_save=True las partes sin cambios se copian del archivo de
+    entrada sin recomprimir (ver processor.package). input_path y output_path
+    pueden ser rutas o archivos binarios abiertos (p. ej. io.BytesIO).
+
+    Devuelve los contadores del archivo: text_replaced, images_replaced y, si
+    se recorrió el documento, paragraphs, stories y runs_rewritten; en
+    "phases" el tiempo de pared y CPU de cada fase (load, text, images,
+    visit, save).
+    """
     if image_replacements is None:
         image_replacements = {}
     if placeholder_replacements is None:
         placeholder_replacements = {}
+    if engine not in ("docx", "xml"):
+        raise ValueError(f"Motor de Word desconocido: {engine}")
+    # Imágenes en memoria: se decodifican una vez para todo el documento
+    placeholder_replacements = resolve_image_sources(placeholder_replacements)
     
+    name = source_name(input_path)
     try:
-        print(f"\n📄 ========== PROCESANDO: {os.path.basename(input_path)} ==========")
-        doc = Document(input_path)
-        
-        if replacements:
-            print("\n📝 FASE 1: Reemplazos de texto...")
-            replace_text(doc, replacements, image_replacements)
-            print("✅ Texto procesado")
+        logger.info("📄 ========== PROCESANDO: %s ==========", name)
+        stats = {"text_replaced": 0, "images_replaced": 0}
+
+        if engine == "xml":
+            logger.debug("📝 FASE 1: Reemplazos de texto (motor XML)...")
+            if not placeholder_replacements:
+                # Lectura, reemplazo y escritura del paquete en una sola pasada
+                with timed_phase(stats, "text"):
+                    stats["text_replaced"] = replace_text_docx_xml(input_path, output_path, replacements)
+                logger.info("✅ %s: %d reemplazos de texto, guardado en %s",
+                            name, stats["text_replaced"], source_name(output_path))
+                return stats
+            # Con placeholders: el texto se resuelve en XML y las imágenes con python-docx
+            buffer = io.BytesIO()
+            with timed_phase(stats, "text"):
+                stats["text_replaced"] = replace_text_docx_xml(input_path, buffer, replacements)
+            buffer.seek(0)
+            with timed_phase(stats, "load"):
+                doc = Document(buffer)
+            source = buffer
+            replacements = None
+        else:
+            with timed_phase(stats, "load"):
+                doc = open_document(input_path)
+            source = input_path
         
-        if placeholder_replacements:
-            print("\n🖼️ FASE 2: Reemplazos de placeholders...")
-            replaced_count = replace_placeholder_images(doc, placeholder_replacements.copy())
-            print(f"✅ {replaced_count} placeholders procesados")
+        # Texto e imágenes en un solo recorrido de todas las historias del documento
+        if replacements or placeholder_replacements:
+            logger.debug("📝 Reemplazos de texto y placeholders (recorrido único)...")
+            process_document(doc, replacements, placeholder_replacements, stats)
         
-        print(f"\n💾 Guardando: {os.path.basename(output_path)}")
-        doc.save(output_path)
-        print("✅ ¡Documento guardado exitosamente!")
-        print("=" * 60 + "\n")
+        logger.debug("💾 Guardando: %s", source_name(output_path))
+        with timed_phase(stats, "save"):
+            if passthrough_save:
+                save_document_passthrough(doc, output_path, source)
+            else:
+                doc.save(output_path)
+        logger.info("✅ %s: %d reemplazos de texto, %d placeholders, guardado en %s",
+                    name, stats["text_replaced"], stats["images_replaced"],
+                    source_name(output_path))
+        return stats
         
     except Exception as e:
-        print(f"❌ ERROR: {e}")
+        logger.error("❌ ERROR en %s: %s", name, e)
         raise
 
+def process_word_bytes(source, replacements: dict, image_replacements: dict = None,
+                       placeholder_replacements: dict = None, output=None, **options):
+    """
+    process_word_file sin archivos: entrada y salida en memoria.
+
+    Args:
+        source: Documento .docx como bytes, bytearray, memoryview o archivo binario abierto
+        replacements, image_replacements, placeholder_replacements: Como en
+            process_word_file; las imágenes pueden pasarse en memoria
+        output: Archivo binario donde escribir el resultado (None = devolverlo)
+        options: engine y passthrough_save de process_word_file
+
+    Returns:
+        (bytes del documento, o None si se escribió en `output`; contadores del archivo)
+    """
+    return process_in_memory(process_word_file, source, output, replacements,
+                             image_replacements, placeholder_replacements, **options)
+
 def create_placeholder_images(output_dir="assets"):
     """Crea imágenes placeholder."""
     if not os.path.exists(output_dir):
@@ -751,12 +468,14 @@ def create_placeholder_images(output_dir="assets"):
             
             filepath = os.path.join(output_dir, placeholder['name'])
             img.save(filepath)
-            print(f"✅ Placeholder: {filepath}")
+            logger.info("✅ Placeholder: %s", filepath)
             
         except Exception as e:
-            print(f"❌ Error: {placeholder['name']}: {e}")
+            logger.error("❌ Error: %s: %s", placeholder['name'], e)
 
 if __name__ == "__main__":
+    from processor.utils import configure_logging
+    configure_logging("INFO")
     create_placeholder_images()
     
     replacements = {"{{NOMBRE}}": "Juan Pérez"}
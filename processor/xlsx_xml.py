@@ -0,0 +1,375 @@
+"""
+Motor de streaming para reemplazo de texto en .xlsx muy grandes.
+
+openpyxl en modo completo crea un objeto Cell por celda de cada hoja; con
+cientos de miles de filas eso son gigabytes de memoria. Este motor no
+construye el libro: lee el XML de cada hoja fila a fila directamente del zip y
+copia tal cual los bytes de todo lo que no cambia (estilos de celda, rangos
+combinados, anchos de columna, validaciones...). Solo se reescriben las
+celdas de texto afectadas, así que la memoria queda acotada por una fila
+(más la tabla de cadenas compartidas que cambian).
+
+Motor "stream": las cadenas compartidas (t="s") que contienen alguna clave se
+escriben en la celda como cadena en línea (t="inlineStr") conservando sus runs
+de texto enriquecido; xl/sharedStrings.xml no se modifica.
+
+Motor "shared": el reemplazo se aplica una vez por cadena única directamente
+en xl/sharedStrings.xml; solo se reescriben además las hojas que tienen
+cadenas en línea, y el resto de hojas se copian en bruto. El coste depende del
+número de cadenas distintas, no del número de celdas.
+"""
+import copy
+import re
+import tempfile
+import zipfile
+from lxml import etree
+from processor.docx_xml import _PARSER, replace_in_segments
+from processor.matcher import compile_replacements
+from processor.package import PassthroughZipFile
+
+SS_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+_SI = f"{{{SS_NS}}}si"
+_IS = f"{{{SS_NS}}}is"
+_R = f"{{{SS_NS}}}r"
+_T = f"{{{SS_NS}}}t"
+# Los runs fonéticos (rPh) y sus propiedades no forman parte del texto visible
+_PHONETIC_TAGS = (f"{{{SS_NS}}}rPh", f"{{{SS_NS}}}phoneticPr")
+
+SHEET_PART_RE = re.compile(r"^xl/worksheets/[^/]+\.xml$")
+
+_READ_CHUNK_SIZE = 1024 * 1024
+_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+_ROOT_RE = re.compile(rb"<((?:[\w.-]+:)?)worksheet\b([^>]*)>")
+_NS_DECL_RE = re.compile(rb"""xmlns(?::[\w.-]+)?=(?:"[^"]*"|'[^']*')""")
+_SHEET_DATA_RE = re.compile(rb"<((?:[\w.-]+:)?)sheetData\b[^>]*?(/?)>")
+_CELL_TYPE_RE = re.compile(rb"""\bt=(["'])(s|inlineStr)\1""")
+_VALUE_RE = re.compile(rb"<(?:[\w.-]+:)?v>\s*(\d+)\s*</(?:[\w.-]+:)?v>")
+_INLINE_RE = re.compile(rb"<((?:[\w.-]+:)?)is\b.*?</\1is>|<(?:[\w.-]+:)?is\s*/>", re.DOTALL)
+_PLAIN_INLINE_RE = re.compile(rb"<(?:[\w.-]+:)?is><(?:[\w.-]+:)?t(?:\s[^>]*)?>([^<&]*)</(?:[\w.-]+:)?t></(?:[\w.-]+:)?is>")
+_INLINE_CACHE_SIZE = 4096
+
+
+def is_sheet_part(name: str) -> bool:
+    """Indica si el miembro del zip es una hoja de cálculo."""
+    return SHEET_PART_RE.match(name) is not None
+
+
+def find_shared_strings(names):
+    """Nombre del miembro sharedStrings del paquete (o None)."""
+    for name in names:
+        if name.lower() == "xl/sharedstrings.xml":
+            return name
+    return None
+
+
+def string_item_segments(item):
+    """
+    Segmentos [(w_t, texto)] de un elemento si/is (texto simple o enriquecido).
+
+    Mismo formato que docx_xml.iter_paragraph_segments, de modo que el
+    reemplazo por spans (replace_in_segments) funciona igual en ambos formatos.
+    """
+    segments = []
+    for child in item:
+        if child.tag == _T:
+            segments.append((child, child.text or ""))
+        elif child.tag == _R:
+            for t in child.iterchildren(_T):
+                segments.append((t, t.text or ""))
+    return segments
+
+
+def inline_string_xml(item, prefix: bytes = b"") -> bytes:
+    """Serializa el contenido de un si/is como elemento <is> con el prefijo de la hoja."""
+    prefix_name = prefix[:-1].decode("ascii") if prefix else None
+    inline = etree.Element(_IS, nsmap={prefix_name: SS_NS})
+    for child in item:
+        if child.tag not in _PHONETIC_TAGS and isinstance(child.tag, str):
+            inline.append(copy.deepcopy(child))
+    data = etree.tostring(inline, encoding="UTF-8")
+    declaration = (b' xmlns:' + prefix[:-1] if prefix else b' xmlns') + f'="{SS_NS}"'.encode("ascii")
+    return data.replace(declaration, b"", 1)
+
+
+def replace_in_shared_strings(data_stream, matcher):
+    """
+    Aplica el matcher una vez por cadena compartida única.
+
+    Devuelve {índice: (elemento_si_modificado, reemplazos)} solo con las
+    cadenas que cambian; el resto se descarta mientras se lee.
+    """
+    changes = {}
+    index = 0
+    for _, item in etree.iterparse(data_stream, events=("end",), tag=_SI,
+                                   resolve_entities=False, huge_tree=True):
+        segments = string_item_segments(item)
+        if segments and matcher.may_match("".join(text for _, text in segments)):
+            count = replace_in_segments(segments, matcher)
+            if count:
+                changes[index] = (copy.deepcopy(item), count)
+        index += 1
+        item.clear()
+        while item.getprevious() is not None:
+            del item.getparent()[0]
+    return changes
+
+
+def replace_in_shared_strings_part(xml_bytes: bytes, matcher):
+    """Reemplaza texto en sharedStrings.xml; devuelve (bytes_o_None, reemplazos)."""
+    root = etree.fromstring(xml_bytes, _PARSER)
+    count = 0
+    for item in root.iterchildren(_SI):
+        segments = string_item_segments(item)
+        if segments and matcher.may_match("".join(text for _, text in segments)):
+            count += replace_in_segments(segments, matcher)
+    if not count:
+        return None, 0
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True), count
+
+
+def member_contains(zf, info, needle: bytes) -> bool:
+    """Busca `needle` en un miembro del zip leyendo por bloques."""
+    tail = b""
+    with zf.open(info) as source:
+        for chunk in iter(lambda: source.read(_READ_CHUNK_SIZE), b""):
+            if needle in tail + chunk[:len(needle)] or needle in chunk:
+                return True
+            tail = chunk[-len(needle):]
+    return False
+
+
+class SheetRewriter:
+    """Reescribe las celdas de texto de una hoja fila a fila."""
+
+    def __init__(self, matcher, shared_changes):
+        self.matcher = matcher
+        self.shared_changes = shared_changes
+        self.prefix = b""
+        self.namespace_declarations = b""
+        self.replaced = 0
+        self._shared_inline = {}  # índice de cadena compartida -> <is> serializado
+        self._inline_cache = {}  # <is> original -> (<is> nuevo o None, reemplazos)
+        self._row_re = None
+        self._cell_re = None
+
+    def set_prefix(self, prefix: bytes):
+        self.prefix = prefix
+        p = re.escape(prefix)
+        self._row_re = re.compile(rb"<" + p + rb"row\b[^>]*?(?:/>|>.*?</" + p + rb"row>)", re.DOTALL)
+        self._cell_re = re.compile(rb"<" + p + rb"c\b([^>]*?)(?:/>|>(.*?)</" + p + rb"c>)", re.DOTALL)
+        self._row_start = b"<" + prefix + b"row"
+        self._sheet_data_end = b"</" + prefix + b"sheetData"
+
+    def rewrite_row(self, row: bytes) -> bytes:
+        if _CELL_TYPE_RE.search(row) is None:
+            return row
+        return self._cell_re.sub(self._rewrite_cell, row)
+
+    def _rewrite_cell(self, match):
+        attributes, body = match.group(1), match.group(2)
+        cell_type = _CELL_TYPE_RE.search(attributes)
+        if cell_type is None or body is None:
+            return match.group(0)
+
+        if cell_type.group(2) == b"s":
+            value = _VALUE_RE.search(body)
+            change = self.shared_changes.get(int(value.group(1))) if value else None
+            if change is None:
+                return match.group(0)
+            index = int(value.group(1))
+            inline = self._shared_inline.get(index)
+            if inline is None:
+                inline = self._shared_inline[index] = inline_string_xml(change[0], self.prefix)
+            self.replaced += change[1]
+            attributes = _CELL_TYPE_RE.sub(b't="inlineStr"', attributes, count=1)
+            return b"<" + self.prefix + b"c" + attributes + b">" + inline + b"</" + self.prefix + b"c>"
+
+        inline_match = _INLINE_RE.search(body)
+        if inline_match is None:
+            return match.group(0)
+        inline, count = self._replace_inline(inline_match.group(0))
+        if not count:
+            return match.group(0)
+        self.replaced += count
+        new_body = body[:inline_match.start()] + inline + body[inline_match.end():]
+        return b"<" + self.prefix + b"c" + attributes + b">" + new_body + b"</" + self.prefix + b"c>"
+
+    def _replace_inline(self, snippet: bytes):
+        """Reemplaza en una cadena en línea; devuelve (bytes_nuevos, reemplazos)."""
+        result = self._inline_cache.get(snippet)
+        if result is not None:
+            return result
+
+        plain = _PLAIN_INLINE_RE.fullmatch(snippet)
+        if plain is not None and not self.matcher.search(plain.group(1).decode("utf-8")):
+            # Texto simple sin entidades ni runs: se descarta sin parsear
+            result = (None, 0)
+        else:
+            wrapper = etree.fromstring(b"<wrap " + self.namespace_declarations + b">"
+                                       + snippet + b"</wrap>", _PARSER)
+            item = wrapper[0]
+            count = replace_in_segments(string_item_segments(item), self.matcher)
+            result = (inline_string_xml(item, self.prefix) if count else None, count)
+
+        # Las hojas suelen repetir los mismos textos: se memorizan (con límite)
+        if len(self._inline_cache) >= _INLINE_CACHE_SIZE:
+            self._inline_cache.clear()
+        self._inline_cache[snippet] = result
+        return result
+
+    def stream(self, source, target):
+        """Copia la hoja de source a target reescribiendo solo las filas con cambios."""
+        buffer = b""
+        pos = 0
+        eof = False
+
+        def fill():
+            # Descarta lo ya procesado y añade el siguiente bloque
+            nonlocal buffer, pos, eof
+            chunk = source.read(_READ_CHUNK_SIZE)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+
+        # Cabecera de la hoja (dimensiones, vistas, anchos de columna...): se copia tal cual
+        while True:
+            fill()
+            root = _ROOT_RE.search(buffer)
+            sheet_data = _SHEET_DATA_RE.search(buffer)
+            if sheet_data is not None or eof:
+                break
+        if sheet_data is None:
+            target.write(buffer)
+            return
+        if root is not None:
+            self.namespace_declarations = b" ".join(_NS_DECL_RE.findall(root.group(2)))
+        self.set_prefix(sheet_data.group(1))
+        target.write(buffer[:sheet_data.end()])
+        pos = sheet_data.end()
+
+        if sheet_data.group(2) != b"/":
+            # Filas: en memoria nunca hay más de una fila completa (más un bloque de lectura)
+            while True:
+                start = buffer.find(b"<", pos)
+                if start < 0:
+                    target.write(buffer[pos:])
+                    pos = len(buffer)
+                    if eof:
+                        break
+                    fill()
+                    continue
+                if start > pos:
+                    target.write(buffer[pos:start])
+                    pos = start
+                if buffer.startswith(self._sheet_data_end, pos):
+                    break
+                row = self._row_re.match(buffer, pos)
+                if row is not None:
+                    target.write(self.rewrite_row(row.group(0)))
+                    pos = row.end()
+                    continue
+                if buffer.startswith(self._row_start, pos) or len(buffer) - pos < len(self._sheet_data_end):
+                    # Fila (o cierre) incompleta: hace falta leer más
+                    if eof:
+                        break
+                    fill()
+                    continue
+                # Nodo desconocido entre filas (comentario, etc.): se copia
+                end = buffer.find(b">", pos) + 1 or len(buffer)
+                target.write(buffer[pos:end])
+                pos = end
+
+        # Resto de la hoja (rangos combinados, formato condicional...): sin cambios
+        target.write(buffer[pos:])
+        for chunk in iter(lambda: source.read(_READ_CHUNK_SIZE), b""):
+            target.write(chunk)
+
+
+def replace_text_xlsx_stream(input_path, output_path, replacements):
+    """
+    Reemplaza texto en un .xlsx leyendo las hojas en streaming.
+
+    Args:
+        input_path: Ruta (o archivo binario) del .xlsx de entrada
+        output_path: Ruta (o archivo binario) donde escribir el resultado
+        replacements: Diccionario de reemplazos o matcher compilado
+
+    Returns:
+        Número total de reemplazos realizados.
+    """
+    matcher = compile_replacements(replacements)
+    total = 0
+
+    with zipfile.ZipFile(input_path) as zin, PassthroughZipFile(output_path, input_path) as zout:
+        shared_changes = {}
+        shared_name = find_shared_strings(zin.namelist())
+        if matcher and shared_name:
+            with zin.open(shared_name) as source:
+                shared_changes = replace_in_shared_strings(source, matcher)
+
+        for info in zin.infolist():
+            if matcher and is_sheet_part(info.filename):
+                rewriter = SheetRewriter(matcher, shared_changes)
+                if rewrite_sheet_member(zin, zout, info, rewriter):
+                    total += rewriter.replaced
+                    continue
+            if not zout.copy_member(zout.source_info(info.filename)):
+                zout.writestr(info, zin.read(info))
+
+    return total
+
+
+def rewrite_sheet_member(zin, zout, info, rewriter):
+    """
+    Pasa una hoja por el rewriter; True si se escribió con cambios.
+
+    La hoja nueva se vuelca a un temporal para que, si no cambió, el llamador
+    pueda copiar el miembro original en bruto.
+    """
+    with zin.open(info) as source, tempfile.SpooledTemporaryFile(_SPOOL_MAX_SIZE) as spool:
+        rewriter.stream(source, spool)
+        if not rewriter.replaced:
+            return False
+        force_zip64 = spool.tell() > zipfile.ZIP64_LIMIT
+        spool.seek(0)
+        with zout.open(info.filename, "w", force_zip64=force_zip64) as target:
+            for chunk in iter(lambda: spool.read(_READ_CHUNK_SIZE), b""):
+                target.write(chunk)
+    zout.rewritten_members += 1
+    return True
+
+
+def replace_text_xlsx_shared(input_path, output_path, replacements):
+    """
+    Reemplaza texto en un .xlsx una vez por cadena compartida única.
+
+    Reescribe xl/sharedStrings.xml y solo las hojas con cadenas en línea
+    afectadas; las demás hojas y partes se copian sin recomprimir.
+
+    Returns:
+        Número de reemplazos (las cadenas compartidas cuentan una vez,
+        independientemente de cuántas celdas las usen).
+    """
+    matcher = compile_replacements(replacements)
+    total = 0
+
+    with zipfile.ZipFile(input_path) as zin, PassthroughZipFile(output_path, input_path) as zout:
+        shared_name = find_shared_strings(zin.namelist())
+        for info in zin.infolist():
+            if matcher and info.filename == shared_name:
+                new_data, count = replace_in_shared_strings_part(zin.read(info), matcher)
+                if new_data is not None:
+                    zout.writestr(info, new_data)
+                    total += count
+                    continue
+            elif matcher and is_sheet_part(info.filename) and member_contains(zin, info, b"inlineStr"):
+                rewriter = SheetRewriter(matcher, {})
+                if rewrite_sheet_member(zin, zout, info, rewriter):
+                    total += rewriter.replaced
+                    continue
+            if not zout.copy_member(zout.source_info(info.filename)):
+                zout.writestr(info, zin.read(info))
+
+    return total
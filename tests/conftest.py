@@ -0,0 +1,13 @@
+"""
+Configuración común de las pruebas.
+
+Las pruebas construyen sus propios documentos con python-docx y openpyxl en
+carpetas temporales; no dependen de archivos del repositorio.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Utilidades de benchmarks/ compartidas con las pruebas (p. ej. parity.compare_engines)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
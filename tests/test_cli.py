@@ -0,0 +1,112 @@
+"""Entrada de línea de comandos (processor.cli): resumen JSON, mensajes y códigos de salida."""
+import json
+import os
+import pytest
+from docx import Document
+from processor.cli import EXIT_FILE_ERRORS, EXIT_OK, EXIT_USAGE, main
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    input_dir = tmp_path / "entrada"
+    (input_dir / "sub").mkdir(parents=True)
+    for name in ("a.docx", "sub/b.docx"):
+        doc = Document()
+        doc.add_paragraph("Hola {{NOMBRE}}")
+        doc.save(str(input_dir / name))
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"replacements": {"{{NOMBRE}}": ""}, "workers": 1}), encoding="utf-8")
+    return tmp_path, str(input_dir), str(config)
+
+
+def run_main(capfd, argv):
+    code = main(argv)
+    out, err = capfd.readouterr()
+    return code, out, err
+
+
+def test_run_prints_json_summary(workspace, capfd):
+    tmp_path, input_dir, config = workspace
+    output_dir = str(tmp_path / "salida")
+    code, out, err = run_main(capfd, ["run", input_dir, output_dir, "--config", config,
+                                      "--set", "{{NOMBRE}}=Ana"])
+
+    assert code == EXIT_OK
+    summary = json.loads(out)
+    assert (summary["total"], summary["processed"], summary["errors"]) == (2, 2, 0)
+    assert summary["text_replaced"] == 2
+    assert "[2/2] ok:" in err and "[1/2]" not in out
+    assert Document(os.path.join(output_dir, "sub", "b.docx")).paragraphs[0].text == "Hola Ana"
+
+
+def test_stdout_is_restored_after_main(workspace, capfd):
+    tmp_path, input_dir, config = workspace
+    before = os.fstat(1)
+    main(["run", input_dir, str(tmp_path / "salida"), "--config", config])
+    capfd.readouterr()
+
+    after = os.fstat(1)
+    assert (after.st_dev, after.st_ino) == (before.st_dev, before.st_ino)
+    print("después")
+    assert capfd.readouterr().out == "después\n"
+
+
+def test_run_with_file_errors(workspace, capfd):
+    tmp_path, input_dir, config = workspace
+    with open(os.path.join(input_dir, "roto.docx"), "wb") as f:
+        f.write(b"no es un zip")
+    code, out, err = run_main(capfd, ["run", input_dir, str(tmp_path / "salida"), "--config", config])
+
+    assert code == EXIT_FILE_ERRORS
+    summary = json.loads(out)
+    assert summary["errors"] == 1
+    assert [f["input"] for f in summary["files"] if not f["ok"]] == ["roto.docx"]
+    assert "error: roto.docx" in err
+
+
+@pytest.mark.parametrize("case", ["missing_input", "missing_config", "bad_pair"])
+def test_usage_errors(workspace, capfd, case):
+    tmp_path, input_dir, config = workspace
+    argv = {
+        "missing_input": ["run", str(tmp_path / "no_existe"), str(tmp_path / "salida"), "--config", config],
+        "missing_config": ["run", input_dir, str(tmp_path / "salida"), "--config", str(tmp_path / "x.json")],
+        "bad_pair": ["run", input_dir, str(tmp_path / "salida"), "--config", config, "--set", "SIN_IGUAL"],
+    }[case]
+    code, out, err = run_main(capfd, argv)
+
+    assert code == EXIT_USAGE
+    assert out == ""
+    assert "❌ Error" in err
+
+
+def test_merge_prints_json_summary(workspace, capfd):
+    tmp_path, _, config = workspace
+    template = str(tmp_path / "plantilla.docx")
+    doc = Document()
+    doc.add_paragraph("Hola {{NOMBRE}}")
+    doc.save(template)
+    data = tmp_path / "datos.csv"
+    data.write_text("{{NOMBRE}},otra\nAna,1\nLuis,2\n", encoding="utf-8")
+    output_dir = str(tmp_path / "cartas")
+    code, out, err = run_main(capfd, ["merge", template, str(data), output_dir, "--config", config,
+                                      "--pattern", "carta_{index}"])
+
+    assert code == EXIT_OK
+    summary = json.loads(out)
+    assert (summary["total"], summary["errors"]) == (2, 0)
+    assert "[2] ok:" in err
+    texts = sorted(Document(f["output"]).paragraphs[0].text for f in summary["files"])
+    assert texts == ["Hola Ana", "Hola Luis"]
+
+
+def test_merge_without_matching_columns(workspace, capfd):
+    tmp_path, _, config = workspace
+    template = str(tmp_path / "plantilla.docx")
+    Document().save(template)
+    data = tmp_path / "datos.csv"
+    data.write_text("otra\n1\n", encoding="utf-8")
+    code, out, err = run_main(capfd, ["merge", template, str(data), str(tmp_path / "cartas"), "--config", config])
+
+    assert code == EXIT_USAGE
+    assert out == ""
+    assert "Ninguna columna" in err
@@ -0,0 +1,161 @@
+"""
+Paridad entre los motores de Word "docx" (python-docx) y "xml" (processor.docx_xml).
+
+Cada documento de prueba reproduce un caso que el motor XML resuelve por su
+cuenta: claves partidas entre runs, encabezados y pies de varias secciones y
+de primera página, tablas anidadas y tabulaciones que una clave no puede cruzar.
+"""
+import pytest
+from docx import Document
+from docx.enum.section import WD_SECTION
+from parity import compare_engines, extract_story_texts
+from processor.word_editor import process_word_file
+
+REPLACEMENTS = {
+    "{{NOMBRE}}": "María Paula",
+    "{{EMPRESA}}": "OCNILENTES",
+    "{{CIUDAD}}": "Cali",
+    "CIUDAD": "CALI",
+}
+
+
+def add_split(paragraph, *pieces):
+    """Añade un run por fragmento (como deja Word una clave editada a trozos)."""
+    for piece in pieces:
+        paragraph.add_run(piece)
+    return paragraph
+
+
+def build_split_runs(path):
+    doc = Document()
+    add_split(doc.add_paragraph(), "Paciente: {{NOM", "BRE", "}} de {{EMP", "RESA}}.")
+    add_split(doc.add_paragraph(), "{", "{CIUDAD}", "}", " y CIUDAD")
+    first = doc.add_paragraph().add_run("{{NOMBRE}}")
+    first.bold = True
+    doc.add_paragraph("Sin claves")
+    doc.save(path)
+
+
+def build_sections(path):
+    doc = Document()
+    section = doc.sections[0]
+    section.different_first_page_header_footer = True
+    add_split(section.first_page_header.paragraphs[0], "Portada {{EMP", "RESA}}")
+    add_split(section.first_page_footer.paragraphs[0], "{{CIU", "DAD}}")
+    section.header.paragraphs[0].text = "Encabezado {{NOMBRE}}"
+    section.footer.paragraphs[0].text = "Pie CIUDAD"
+    doc.add_paragraph("Sección uno {{NOMBRE}}")
+
+    second = doc.add_section(WD_SECTION.NEW_PAGE)
+    second.header.is_linked_to_previous = False
+    add_split(second.header.paragraphs[0], "Segunda {{NOM", "BRE}}")
+    second.footer.is_linked_to_previous = False
+    second.footer.paragraphs[0].text = "Pie {{EMPRESA}}"
+    doc.add_paragraph("Sección dos {{CIUDAD}}")
+    doc.save(path)
+
+
+def build_tables(path):
+    doc = Document()
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "{{NOMBRE}}"
+    add_split(table.cell(0, 1).paragraphs[0], "{{EMP", "RESA}}")
+    inner = table.cell(1, 0).add_table(rows=1, cols=2)
+    add_split(inner.cell(0, 0).paragraphs[0], "{{CIU", "DAD}}")
+    inner.cell(0, 1).add_table(rows=1, cols=1).cell(0, 0).text = "Anidada {{NOMBRE}}"
+    table.cell(1, 1).text = "CIUDAD"
+    doc.save(path)
+
+
+def build_tabs(path):
+    doc = Document()
+    doc.add_paragraph("{{NOMBRE}}\t{{EMPRESA}}")
+    # Una tabulación en medio de la clave la parte: no debe reemplazarse
+    paragraph = doc.add_paragraph()
+    paragraph.add_run("{{CIU")
+    paragraph.add_run().add_tab()
+    paragraph.add_run("DAD}}")
+    paragraph = doc.add_paragraph()
+    paragraph.add_run("CIU").add_break()
+    paragraph.add_run("DAD y CIUDAD")
+    doc.save(path)
+
+
+BUILDERS = {
+    "split_runs": build_split_runs,
+    "sections": build_sections,
+    "tables": build_tables,
+    "tabs": build_tabs,
+}
+
+EXPECTED = {
+    "split_runs": {
+        "word/document.xml": ["Paciente: María Paula de OCNILENTES.", "Cali y CALI", "María Paula",
+                              "Sin claves"],
+    },
+    "sections": {
+        "word/document.xml": ["Sección uno María Paula", "Sección dos Cali"],
+    },
+    "tables": {
+        "word/document.xml": ["María Paula", "OCNILENTES", "Cali", "Anidada María Paula", "CALI"],
+    },
+    "tabs": {
+        "word/document.xml": ["María Paula\tOCNILENTES", "{{CIU\tDAD}}", "CIU\tDAD y CALI"],
+    },
+}
+
+
+@pytest.fixture(params=sorted(BUILDERS))
+def document(request, tmp_path):
+    path = tmp_path / f"{request.param}.docx"
+    BUILDERS[request.param](str(path))
+    return request.param, str(path)
+
+
+def story_texts(path):
+    """Párrafos no vacíos de cada parte (tabulaciones y saltos se leen como \\t)."""
+    texts = {}
+    for part, paragraphs in extract_story_texts(path).items():
+        texts[part] = [text for text in paragraphs if text]
+    return texts
+
+
+def test_engines_match(document):
+    _, path = document
+    assert compare_engines(path, REPLACEMENTS) == []
+
+
+@pytest.mark.parametrize("engine", ["docx", "xml"])
+def test_output_text(document, engine, tmp_path):
+    name, path = document
+    output = str(tmp_path / f"{name}_{engine}.docx")
+    process_word_file(path, output, REPLACEMENTS, engine=engine)
+
+    texts = story_texts(output)
+    for part, expected in EXPECTED[name].items():
+        assert texts[part] == expected
+
+
+def test_headers_and_footers(tmp_path):
+    path = str(tmp_path / "sections.docx")
+    build_sections(path)
+    output = str(tmp_path / "out.docx")
+    process_word_file(path, output, REPLACEMENTS, engine="xml")
+
+    stories = [text for part, paragraphs in story_texts(output).items()
+               if part != "word/document.xml" for text in paragraphs]
+    assert sorted(stories) == sorted([
+        "Portada OCNILENTES", "Cali", "Encabezado María Paula", "Pie CALI",
+        "Segunda María Paula", "Pie OCNILENTES",
+    ])
+
+
+def test_unchanged_parts_are_preserved(tmp_path):
+    path = str(tmp_path / "plain.docx")
+    doc = Document()
+    doc.add_paragraph("Sin claves")
+    doc.save(path)
+    output = str(tmp_path / "out.docx")
+
+    assert process_word_file(path, output, REPLACEMENTS, engine="xml")["text_replaced"] == 0
+    assert story_texts(output) == story_texts(path)
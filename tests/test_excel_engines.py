@@ -0,0 +1,134 @@
+"""
+Paridad entre los motores de Excel: "openpyxl" (modelo de objetos), "stream"
+(processor.xlsx_xml, hojas fila a fila) y "shared" (una vez por cadena única
+en sharedStrings.xml).
+
+Los libros de prueba combinan cadenas compartidas repetidas en varias celdas
+y hojas, texto enriquecido con la clave partida entre runs, cadenas en línea,
+números, fórmulas y celdas combinadas; las celdas de salida deben tener los
+mismos valores con todos los motores.
+"""
+import zipfile
+import pytest
+from openpyxl import Workbook, load_workbook
+from processor.excel_editor import process_excel_file
+from processor.xlsx_xml import replace_text_xlsx_stream
+from xlsx_helpers import SHARED_STRINGS, use_shared_strings
+
+ENGINES = ("openpyxl", "stream", "shared")
+
+REPLACEMENTS = {
+    "{{NOMBRE}}": "María Paula",
+    "{{EMPRESA}}": "OCNILENTES",
+    "{{CIUDAD}}": "Cali",
+    "CIUDAD": "CALI",
+}
+
+
+# Cadena guardada como texto enriquecido, con la clave partida entre dos runs
+RICH_TEXT_PLAIN = "{{CIUDAD}} y CIUDAD"
+RICH_TEXT_XML = b"<r><rPr><b val=\"1\"/></rPr><t>{{CIU</t></r><r><t>DAD}} y CIUDAD</t></r>"
+
+
+def build_workbook(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Datos"
+    ws["A1"] = "{{NOMBRE}}"
+    ws["B1"] = "Empresa: {{EMPRESA}}"
+    ws["C1"] = 42
+    ws["D1"] = "=C1*2"
+    ws["A2"] = "{{NOMBRE}}"  # Misma cadena compartida que A1
+    ws["B2"] = "Sin claves"
+    ws["A3"] = RICH_TEXT_PLAIN
+    ws["A5"] = "{{CIUDAD}} {{EMPRESA}}"
+    ws.merge_cells("A5:C5")
+    for row in range(10, 60, 7):
+        ws.cell(row=row, column=row % 5 + 1, value=f"Fila {row} {{{{NOMBRE}}}}")
+
+    other = wb.create_sheet("Otra")
+    other["A1"] = "{{NOMBRE}}"
+    other["B3"] = "CIUDAD"
+    other["C3"] = 3.5
+    wb.create_sheet("Vacía")
+    wb.save(path)
+    use_shared_strings(path, {RICH_TEXT_PLAIN: RICH_TEXT_XML})
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "libro.xlsx")
+    build_workbook(path)
+    with zipfile.ZipFile(path) as zf:
+        assert b"<r>" in zf.read(SHARED_STRINGS)
+    return path
+
+
+@pytest.fixture
+def inline_workbook(tmp_path):
+    # Cadenas en línea (t="inlineStr") como las deja el motor stream
+    source = str(tmp_path / "origen.xlsx")
+    build_workbook(source)
+    path = str(tmp_path / "en_linea.xlsx")
+    replace_text_xlsx_stream(source, path, {"Empresa: ": "Compañía: ", "Sin claves": "Sin {{CIUDAD}}"})
+    with zipfile.ZipFile(path) as zf:
+        assert b't="inlineStr"' in zf.read("xl/worksheets/sheet1.xml")
+    return path
+
+
+def cell_values(path):
+    wb = load_workbook(path)
+    return {ws.title: {cell.coordinate: cell.value for row in ws.iter_rows() for cell in row
+                       if cell.value is not None}
+            for ws in wb.worksheets}
+
+
+def outputs(path, tmp_path, replacements=REPLACEMENTS):
+    values = {}
+    for engine in ENGINES:
+        output = str(tmp_path / f"salida_{engine}.xlsx")
+        stats = process_excel_file(path, output, replacements, engine=engine)
+        values[engine] = (cell_values(output), stats["text_replaced"])
+    return values
+
+
+def test_engines_give_identical_values(workbook, tmp_path):
+    values = outputs(workbook, tmp_path)
+    reference, count = values["openpyxl"]
+    for engine in ENGINES:
+        assert values[engine][0] == reference, engine
+    assert values["stream"][1] == count
+
+    sheet = reference["Datos"]
+    assert sheet["A1"] == sheet["A2"] == "María Paula"
+    assert sheet["B1"] == "Empresa: OCNILENTES"
+    assert sheet["A3"] == "Cali y CALI"
+    assert sheet["A5"] == "Cali OCNILENTES"
+    assert (sheet["C1"], sheet["D1"]) == (42, "=C1*2")
+    assert reference["Otra"] == {"A1": "María Paula", "B3": "CALI", "C3": 3.5}
+
+
+def test_engines_with_inline_strings(inline_workbook, tmp_path):
+    values = outputs(inline_workbook, tmp_path)
+    reference, count = values["openpyxl"]
+    for engine in ENGINES:
+        assert values[engine][0] == reference, engine
+    assert values["stream"][1] == count
+    assert reference["Datos"]["B1"] == "Compañía: OCNILENTES"
+    assert reference["Datos"]["B2"] == "Sin Cali"
+
+
+def test_no_matches_leaves_values_unchanged(workbook, tmp_path):
+    values = outputs(workbook, tmp_path, {"{{NO_EXISTE}}": "x"})
+    for engine in ENGINES:
+        assert values[engine] == (cell_values(workbook), 0), engine
+
+
+def test_shared_engine_copies_sheets_without_inline_strings(workbook, tmp_path):
+    output = str(tmp_path / "salida.xlsx")
+    process_excel_file(workbook, output, REPLACEMENTS, engine="shared")
+
+    with zipfile.ZipFile(workbook) as source, zipfile.ZipFile(output) as result:
+        for name in ("xl/worksheets/sheet1.xml", "xl/worksheets/sheet2.xml"):
+            assert result.read(name) == source.read(name)
+        assert result.read(SHARED_STRINGS) != source.read(SHARED_STRINGS)
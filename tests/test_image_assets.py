@@ -0,0 +1,58 @@
+"""Inserción de imágenes de reemplazo cacheadas (processor.image_assets)."""
+import io
+import pytest
+from docx import Document
+from docx.image.image import Image
+from docx.package import ImageParts
+from PIL import Image as PILImage
+from processor import image_assets
+from processor.image_assets import ImageAsset, add_picture_from_asset, get_image_asset
+
+
+@pytest.fixture
+def asset():
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (40, 20), "#3366cc").save(buffer, format="PNG")
+    return ImageAsset(buffer.getvalue())
+
+
+def image_parts(path):
+    return [part for part in Document(path).part.package.parts if part.partname.startswith("/word/media/")]
+
+
+def insert_twice(asset, path):
+    doc = Document()
+    for _ in range(2):
+        add_picture_from_asset(doc.add_paragraph().add_run(), asset)
+    doc.save(path)
+    return Document(path)
+
+
+def test_same_asset_shares_one_image_part(asset, tmp_path):
+    path = str(tmp_path / "doc.docx")
+    doc = insert_twice(asset, path)
+
+    assert len(doc.inline_shapes) == 2
+    parts = image_parts(path)
+    assert len(parts) == 1
+    assert parts[0].blob == asset.data
+
+
+def test_public_api_fallback(asset, tmp_path, monkeypatch):
+    # Sin los internos de python-docx se usa Package.get_or_add_image_part
+    monkeypatch.setattr(image_assets, "_has_image_parts_internals", lambda image_parts: False)
+    calls = []
+    original = ImageParts.get_or_add_image_part
+    monkeypatch.setattr(ImageParts, "get_or_add_image_part",
+                        lambda self, stream: calls.append(stream) or original(self, stream))
+    path = str(tmp_path / "doc.docx")
+    doc = insert_twice(asset, path)
+
+    assert len(doc.inline_shapes) == 2
+    assert len(image_parts(path)) == 1
+    assert len(calls) == 1
+
+
+def test_in_memory_sources_share_the_cache(asset):
+    assert get_image_asset(asset.data) is get_image_asset(memoryview(asset.data))
+    assert Image.from_blob(asset.data).sha1 == asset.sha1
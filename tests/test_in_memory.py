@@ -0,0 +1,165 @@
+"""Proceso sin archivos: process_word_bytes y process_excel_bytes."""
+import builtins
+import io
+import os
+import zipfile
+import pytest
+from docx import Document
+from openpyxl import Workbook, load_workbook
+from PIL import Image as PILImage
+from processor.excel_editor import process_excel_bytes, process_excel_file
+from processor.word_editor import process_word_bytes, process_word_file
+
+REPLACEMENTS = {"{{NOMBRE}}": "María Paula", "{{CIUDAD}}": "Cali"}
+# openpyxl escribe la fecha de guardado; el resto de miembros debe coincidir byte a byte
+VOLATILE_MEMBERS = {"docProps/core.xml"}
+SOURCES = ["bytes", "memoryview", "stream"]
+OUTPUTS = ["return", "stream"]
+
+
+class NonSeekableStream(io.RawIOBase):
+    """Archivo binario secuencial (tubería, socket, respuesta HTTP): sin seek ni tell."""
+
+    def __init__(self, data=b""):
+        self._buffer = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._buffer.readinto(buffer)
+
+    def write(self, data):
+        return self._buffer.write(data)
+
+    def getvalue(self):
+        return self._buffer.getvalue()
+
+
+def png_bytes(color):
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (40, 20), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def logo():
+    return png_bytes("#3366cc")
+
+
+@pytest.fixture
+def docx_bytes():
+    doc = Document()
+    paragraph = doc.add_paragraph("Hola ")
+    paragraph.add_run("{{NOM").bold = True
+    paragraph.add_run("BRE}}")
+    doc.sections[0].header.paragraphs[0].text = "Sede {{CIUDAD}}"
+    doc.add_paragraph().add_run().add_picture(io.BytesIO(png_bytes("#cccccc")))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def xlsx_bytes():
+    wb = Workbook()
+    wb.active["A1"] = "Cliente: {{NOMBRE}}"
+    wb.active["B3"] = "{{LOGO}}"
+    wb.active["C1"] = 42
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def no_file_io(monkeypatch):
+    """Cualquier apertura de un archivo (salvo /proc y /dev) hace fallar la prueba."""
+    real_open, real_os_open = builtins.open, os.open
+
+    def allowed(path):
+        return not isinstance(path, (str, bytes, os.PathLike)) or os.fsdecode(path).startswith(("/proc", "/dev"))
+
+    def guarded_open(path, *args, **kwargs):
+        assert allowed(path), f"E/S de archivo: {path}"
+        return real_open(path, *args, **kwargs)
+
+    def guarded_os_open(path, *args, **kwargs):
+        assert allowed(path), f"E/S de archivo: {path}"
+        return real_os_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", guarded_open)
+    monkeypatch.setattr(io, "open", guarded_open)
+    monkeypatch.setattr(os, "open", guarded_os_open)
+
+
+def make_source(kind, data):
+    if kind == "memoryview":
+        return memoryview(data)
+    if kind == "stream":
+        return NonSeekableStream(data)
+    return data
+
+
+def reference_output(process_file, tmp_path, name, data, logo, options):
+    """Salida del mismo archivo procesado desde disco, con la imagen también en disco."""
+    source, output, logo_path = tmp_path / name, tmp_path / f"ref_{name}", tmp_path / "logo.png"
+    source.write_bytes(data)
+    logo_path.write_bytes(logo)
+    stats = process_file(str(source), str(output), REPLACEMENTS, {},
+                         {"placeholder_logo.png": {"path": str(logo_path)}}, **options)
+    return output.read_bytes(), stats
+
+
+def process(process_bytes, source, output_kind, logo, options):
+    output = NonSeekableStream() if output_kind == "stream" else None
+    placeholders = {"placeholder_logo.png": {"path": io.BytesIO(logo)}}
+    data, stats = process_bytes(source, REPLACEMENTS, {}, placeholders, output=output, **options)
+    if output is not None:
+        assert data is None
+        data = output.getvalue()
+    return data, stats
+
+
+def package_members(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(name) for name in zf.namelist() if name not in VOLATILE_MEMBERS}
+
+
+def document_texts(data):
+    doc = Document(io.BytesIO(data))
+    return [p.text for p in doc.paragraphs] + [p.text for p in doc.sections[0].header.paragraphs]
+
+
+@pytest.mark.parametrize("engine", ["docx", "xml"])
+@pytest.mark.parametrize("source_kind", SOURCES)
+@pytest.mark.parametrize("output_kind", OUTPUTS)
+def test_word_bytes_match_file_output(tmp_path, docx_bytes, logo, engine, source_kind, output_kind, request):
+    options = {"engine": engine}
+    expected, expected_stats = reference_output(process_word_file, tmp_path, "doc.docx", docx_bytes, logo, options)
+    request.getfixturevalue("no_file_io")
+    data, stats = process(process_word_bytes, make_source(source_kind, docx_bytes), output_kind, logo, options)
+
+    assert document_texts(data) == document_texts(expected) == ["Hola María Paula", "", "Sede Cali"]
+    assert package_members(data) == package_members(expected)
+    assert stats["text_replaced"] == expected_stats["text_replaced"] == 2
+    assert stats["images_replaced"] == expected_stats["images_replaced"] == 1
+
+
+@pytest.mark.parametrize("engine", ["openpyxl", "stream", "shared"])
+@pytest.mark.parametrize("source_kind", SOURCES)
+@pytest.mark.parametrize("output_kind", OUTPUTS)
+def test_excel_bytes_match_file_output(tmp_path, xlsx_bytes, logo, engine, source_kind, output_kind, request):
+    options = {"engine": engine, "passthrough_save": True}
+    expected, expected_stats = reference_output(process_excel_file, tmp_path, "libro.xlsx", xlsx_bytes, logo, options)
+    request.getfixturevalue("no_file_io")
+    data, stats = process(process_excel_bytes, make_source(source_kind, xlsx_bytes), output_kind, logo, options)
+
+    values = [[cell.value for cell in row] for row in load_workbook(io.BytesIO(data)).active.iter_rows()]
+    assert values == [[cell.value for cell in row] for row in load_workbook(io.BytesIO(expected)).active.iter_rows()]
+    assert values[0][0] == "Cliente: María Paula"
+    assert package_members(data) == package_members(expected)
+    assert stats["text_replaced"] == expected_stats["text_replaced"] >= 1
+    assert stats["images_replaced"] == expected_stats["images_replaced"] == 1
@@ -0,0 +1,78 @@
+"""Combinación de correspondencia (processor.mail_merge)."""
+import zipfile
+import pytest
+from docx import Document
+from openpyxl import Workbook, load_workbook
+from processor.mail_merge import mail_merge
+from processor.xlsx_xml import replace_text_xlsx_stream
+from xlsx_helpers import SHARED_STRINGS, use_shared_strings
+
+ROWS = [
+    {"{{NOMBRE}}": "Ana", "{{CIUDAD}}": "Cali", "extra": "x"},
+    {"{{NOMBRE}}": "Luis", "{{CIUDAD}}": "Bogotá", "extra": "y"},
+]
+
+
+@pytest.fixture
+def docx_template(tmp_path):
+    path = tmp_path / "plantilla.docx"
+    doc = Document()
+    paragraph = doc.add_paragraph()
+    for piece in ("Hola {{NOM", "BRE}} de {{CIUDAD}}"):
+        paragraph.add_run(piece)
+    doc.sections[0].header.paragraphs[0].text = "{{CIUDAD}}"
+    doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def xlsx_template(tmp_path):
+    # La hoja 1 usa cadenas compartidas y la hoja 2, cadenas en línea (como las deja el motor stream)
+    shared = tmp_path / "compartidas.xlsx"
+    wb = Workbook()
+    wb.active["A1"] = "Hola {{NOMBRE}}"
+    wb.active["B2"] = "{{CIUDAD}}"
+    wb.create_sheet("Linea")["A1"] = "Ciudad: {{CIUDAD}}"
+    wb.save(str(shared))
+    use_shared_strings(str(shared))
+    path = tmp_path / "plantilla.xlsx"
+    replace_text_xlsx_stream(str(shared), str(path), {"Ciudad: ": "En "})
+    with zipfile.ZipFile(path) as zf:
+        assert b"{{NOMBRE}}" in zf.read(SHARED_STRINGS)
+        assert b't="inlineStr"' in zf.read("xl/worksheets/sheet2.xml")
+    return str(path)
+
+
+def test_docx_merge(docx_template, tmp_path):
+    results = mail_merge(docx_template, ROWS, str(tmp_path / "salida"), keys={"{{NOMBRE}}", "{{CIUDAD}}"},
+                         filename_pattern="{index}")
+
+    assert [result["ok"] for result in results] == [True, True]
+    texts = [(Document(result["output_path"]).paragraphs[0].text,
+              Document(result["output_path"]).sections[0].header.paragraphs[0].text)
+             for result in results]
+    assert texts == [("Hola Ana de Cali", "Cali"), ("Hola Luis de Bogotá", "Bogotá")]
+
+
+def test_xlsx_merge_shared_and_inline(xlsx_template, tmp_path):
+    results = mail_merge(xlsx_template, ROWS, str(tmp_path / "salida"), filename_pattern="{index}")
+
+    assert [result["ok"] for result in results] == [True, True]
+    values = []
+    for result in results:
+        wb = load_workbook(result["output_path"])
+        values.append((wb["Sheet"]["A1"].value, wb["Sheet"]["B2"].value, wb["Linea"]["A1"].value))
+    assert values == [("Hola Ana", "Cali", "En Cali"), ("Hola Luis", "Bogotá", "En Bogotá")]
+
+
+def test_no_matching_columns_fails(docx_template, tmp_path):
+    with pytest.raises(ValueError, match="Ninguna columna"):
+        mail_merge(docx_template, ROWS, str(tmp_path / "salida"), keys=set())
+
+
+def test_raw_copy_fallback_keeps_every_member(docx_template, tmp_path, monkeypatch):
+    monkeypatch.delattr(zipfile, "_strip_extra")
+    results = mail_merge(docx_template, ROWS[:1], str(tmp_path / "salida"))
+
+    with zipfile.ZipFile(docx_template) as template, zipfile.ZipFile(results[0]["output_path"]) as output:
+        assert sorted(output.namelist()) == sorted(template.namelist())
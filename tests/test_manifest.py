@@ -0,0 +1,59 @@
+"""Huella de configuración y omisión de archivos al día (processor.manifest)."""
+import io
+import pytest
+from docx import Document
+from PIL import Image as PILImage
+from processor.batch import collect_jobs, run_incremental_batch
+from processor.image_assets import configure_image_cache
+from processor.manifest import settings_fingerprint
+
+REPLACEMENTS = {"{{NOMBRE}}": "Ana"}
+
+
+def test_fingerprint_tracks_image_resampling():
+    base = settings_fingerprint(REPLACEMENTS)
+    assert settings_fingerprint(REPLACEMENTS, image_cache={"max_bytes": 1024}) == base
+    resampled = settings_fingerprint(REPLACEMENTS, image_cache={"target_dpi": 150})
+    assert resampled != base
+    assert settings_fingerprint(REPLACEMENTS, image_cache={"target_dpi": 300}) != resampled
+    assert settings_fingerprint(REPLACEMENTS, image_cache={"target_dpi": 150, "jpeg_quality": 60}) != resampled
+
+
+def test_fingerprint_hashes_image_content(tmp_path):
+    path = tmp_path / "logo.png"
+    PILImage.new("RGB", (10, 10), "red").save(path)
+    first = settings_fingerprint(REPLACEMENTS, placeholder_replacements={"logo": str(path)})
+    PILImage.new("RGB", (10, 10), "blue").save(path)
+    assert settings_fingerprint(REPLACEMENTS, placeholder_replacements={"logo": str(path)}) != first
+
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (10, 10), "blue").save(buffer, format="PNG")
+    assert settings_fingerprint(REPLACEMENTS, placeholder_replacements={"logo": buffer.getvalue()}) \
+        == settings_fingerprint(REPLACEMENTS, placeholder_replacements={"logo": path.read_bytes()})
+
+
+@pytest.fixture
+def folders(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    for index in range(2):
+        doc = Document()
+        doc.add_paragraph(f"{{{{NOMBRE}}}} {index}")
+        doc.save(str(input_dir / f"doc{index}.docx"))
+    yield str(input_dir), str(tmp_path / "salida")
+    # Con workers=1 run_batch configura la caché de imágenes de este proceso
+    configure_image_cache()
+
+
+def run(folders, **options):
+    input_dir, output_dir = folders
+    results = run_incremental_batch(collect_jobs(input_dir, output_dir), output_dir, REPLACEMENTS,
+                                    workers=1, **options)
+    return [bool(result.get("skipped")) for result in results]
+
+
+def test_rerun_skips_until_image_settings_change(folders):
+    assert run(folders) == [False, False]
+    assert run(folders) == [True, True]
+    assert run(folders, image_cache={"max_bytes": 64 * 1024 * 1024, "target_dpi": 150}) == [False, False]
+    assert run(folders, image_cache={"max_bytes": 64 * 1024 * 1024, "target_dpi": 150}) == [True, True]
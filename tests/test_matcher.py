@@ -0,0 +1,55 @@
+"""Matcher multi-patrón compartido por los editores (processor.matcher)."""
+from processor.matcher import ReplacementMatcher, compile_replacements
+
+
+def test_leftmost_longest_wins_regardless_of_order():
+    for replacements in ({"CALI": "X", "SANTIAGO DE CALI": "Y"}, {"SANTIAGO DE CALI": "Y", "CALI": "X"}):
+        matcher = ReplacementMatcher(replacements)
+        assert matcher.replace("SANTIAGO DE CALI y CALI") == ("Y y X", ["SANTIAGO DE CALI", "CALI"])
+
+
+def test_overlapping_keys():
+    matcher = ReplacementMatcher({"OPTICA MUNDOLENS": "A", "OCNILENTES -OPTICAL": "B"})
+
+    assert matcher.replace("OCNILENTES -OPTICAL MUNDOLENS")[0] == "B MUNDOLENS"
+    # "OCNILENTES -OPTICA" no completa la primera clave: gana la que empieza más tarde
+    assert matcher.replace("OCNILENTES -OPTICA MUNDOLENS")[0] == "OCNILENTES -A"
+    assert list(matcher.finditer("OCNILENTES -OPTICA MUNDOLENS")) == [(12, 28, "OPTICA MUNDOLENS")]
+
+
+def test_values_are_not_replaced_again():
+    matcher = ReplacementMatcher({"{{A}}": "{{B}}", "{{B}}": "fin", "CALI": "SANTIAGO DE CALI"})
+
+    assert matcher.replace("{{A}} {{B}} CALI") == ("{{B}} fin SANTIAGO DE CALI", ["{{A}}", "{{B}}", "CALI"])
+
+
+def test_regex_metacharacters_are_literal():
+    matcher = ReplacementMatcher({"$(total)*": "10", "a.b": "x", "[x]|{y}": "z", "\\d+": "n"})
+
+    assert matcher.replace("a.b axb $(total)* [x]|{y} \\d+ 12")[0] == "x axb 10 z n 12"
+    assert not matcher.search("aXb total")
+
+
+def test_empty_keys_are_ignored():
+    matcher = ReplacementMatcher({"": "X", "CALI": "Y"})
+
+    assert len(matcher) == 1
+    assert matcher.replace("CALI") == ("Y", ["CALI"])
+    assert not ReplacementMatcher({"": "X"})
+
+
+def test_empty_replacements_are_falsy():
+    for matcher in (compile_replacements({}), compile_replacements(None), ReplacementMatcher({})):
+        assert not matcher
+        assert matcher.replace("texto") == ("texto", [])
+        assert list(matcher.finditer("texto")) == []
+        assert not matcher.search("texto")
+
+
+def test_compile_replacements_is_memoized():
+    replacements = {"{{NOMBRE}}": "Ana", "CALI": 5}
+    matcher = compile_replacements(replacements)
+
+    assert compile_replacements(dict(replacements)) is matcher
+    assert compile_replacements(matcher) is matcher
+    assert matcher.replace("CALI")[0] == "5"
@@ -0,0 +1,83 @@
+"""Medición de memoria por archivo y estimador del lote (processor.memory)."""
+import random
+import pytest
+from docx import Document
+from processor import batch
+from processor.batch import collect_jobs, process_job
+from processor.memory import MB, MemoryEstimator, reset_peak_rss
+
+
+def test_peak_ignores_memory_retained_by_the_worker(tmp_path, monkeypatch):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    doc = Document()
+    doc.add_paragraph("{{NOMBRE}}")
+    doc.save(str(input_dir / "doc.docx"))
+    job = collect_jobs(str(input_dir), str(tmp_path / "salida"))[0]
+    config = {
+        "replacements": {"{{NOMBRE}}": "Ana"},
+        "image_replacements": {},
+        "placeholder_replacements": {},
+        "memory_limits": {"budget_bytes": 1024 * MB},
+    }
+    # Mismo estado que un worker del pool tras su inicializador
+    monkeypatch.setattr(batch, "_WORKER_CONFIG", {})
+    monkeypatch.setattr(batch, "configure_logging", lambda level: None)
+    batch._init_worker(config)
+    process_job(job)
+
+    # Memoria retenida por el worker entre archivos (cachés, fragmentación)
+    retained = bytearray(128 * MB)
+    result = process_job(job)
+    del retained
+
+    assert result["ok"]
+    if reset_peak_rss():
+        assert result["stats"]["peak_memory"] < 64 * MB
+
+
+def test_estimator_learns_from_peaks():
+    estimator = MemoryEstimator(base_bytes=0)
+    job = {"kind": "excel", "size": 10 * MB}
+    key = MemoryEstimator.job_key(job)
+    factor = estimator.factors[key]
+
+    estimator.learn(job, key, int(10 * MB * factor * 2))
+    assert estimator.factors[key] == pytest.approx(factor * 2)
+    estimator.learn(job, key, 0)
+    assert factor < estimator.factors[key] < factor * 2
+    # Los archivos pequeños no ajustan los factores
+    estimator.learn({"kind": "excel", "size": 1024}, key, 10 * MB)
+    assert estimator.estimate(job, key) == int(10 * MB * estimator.factors[key])
+
+
+def test_pending_jobs_admit_the_first_job_that_fits():
+    rng = random.Random(7)
+    jobs = [{"kind": rng.choice(["word", "excel"]), "size": rng.randrange(1, 400) * MB // 4}
+            for _ in range(300)]
+    estimator = MemoryEstimator()
+    calls = []
+    estimate = estimator.estimate
+    estimator.estimate = lambda job, key: calls.append(key) or estimate(job, key)
+    order = batch.schedule_jobs(jobs)
+    pending = batch._PendingJobs(jobs, order, estimator, MemoryEstimator.job_key)
+    reference = list(order)
+    calls.clear()
+
+    for step in range(len(jobs)):
+        if step % 10 == 5:
+            # Un pico medido cambia el factor de un motor a mitad del lote
+            estimator.learn(jobs[reference[0]], MemoryEstimator.job_key(jobs[reference[0]]), 3000 * MB)
+        free = rng.randrange(0, 8000) * MB
+        expected = next((index for index in reference
+                         if estimate(jobs[index], MemoryEstimator.job_key(jobs[index])) <= free), None)
+        assert pending.pop_fitting(free) == expected
+        if expected is None:
+            expected = pending.pop_fitting(float("inf"))
+            assert expected == reference[0]
+        reference.remove(expected)
+        assert pending.order == reference
+
+    assert not pending
+    # Búsqueda binaria por motor, no una estimación por archivo pendiente en cada envío
+    assert len(calls) < len(jobs) * 20
@@ -0,0 +1,126 @@
+"""
+Guardado con copia en bruto de partes sin cambios (processor.package).
+
+Las optimizaciones usan internos de zipfile y de openpyxl: las pruebas
+comprueban que siguen activas en las versiones instaladas y que, sin ellos,
+el camino normal produce el mismo contenido.
+"""
+import datetime
+import io
+import re
+import zipfile
+import pytest
+from docx import Document
+from openpyxl import Workbook, load_workbook
+from processor import package
+from processor.package import PassthroughZipFile, save_workbook_passthrough, save_workbook_stream
+from processor.word_editor import process_word_file
+from xlsx_helpers import rewrite_members
+
+CORE = "docProps/core.xml"
+MODIFIED_RE = re.compile(rb"(<dcterms:modified[^>]*>)[^<]*(</dcterms:modified>)")
+
+
+@pytest.fixture
+def source_docx(tmp_path):
+    path = tmp_path / "source.docx"
+    doc = Document()
+    for index in range(20):
+        doc.add_paragraph(f"Párrafo {index} {{{{NOMBRE}}}}")
+    doc.save(str(path))
+    return str(path)
+
+
+def members(path_or_file):
+    with zipfile.ZipFile(path_or_file) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def copy_all(source, output):
+    with zipfile.ZipFile(source) as zin, PassthroughZipFile(output, source) as zout:
+        for info in zin.infolist():
+            zout.writestr(info, zin.read(info))
+        return zout
+
+
+def test_raw_copy_supported_on_this_python(source_docx, tmp_path):
+    output = str(tmp_path / "copy.docx")
+    zout = copy_all(source_docx, output)
+
+    assert zout.raw_copy
+    assert zout.rewritten_members == 0
+    assert zout.copied_members == len(members(source_docx))
+    assert members(output) == members(source_docx)
+
+
+def test_missing_zipfile_internals_fall_back(source_docx, tmp_path, monkeypatch):
+    monkeypatch.delattr(zipfile, "_strip_extra")
+    output = str(tmp_path / "copy.docx")
+    zout = copy_all(source_docx, output)
+
+    assert not zout.raw_copy
+    assert zout.copied_members == 0
+    assert members(output) == members(source_docx)
+
+
+def test_passthrough_save_matches_plain_save(source_docx, tmp_path):
+    plain = str(tmp_path / "plain.docx")
+    passthrough = str(tmp_path / "passthrough.docx")
+    replacements = {"{{NOMBRE}}": "María"}
+    process_word_file(source_docx, plain, replacements)
+    process_word_file(source_docx, passthrough, replacements, passthrough_save=True)
+
+    assert members(passthrough) == members(plain)
+
+
+def build_workbook():
+    wb = Workbook()
+    ws = wb.active
+    for row in range(1, 30):
+        ws.cell(row=row, column=1, value=f"Fila {row}")
+        ws.cell(row=row, column=2, value=row)
+    wb.create_sheet("Otra")["A1"] = "{{CIUDAD}}"
+    return wb
+
+
+def sheet_values(file):
+    wb = load_workbook(file)
+    return {ws.title: [[cell.value for cell in row] for row in ws.iter_rows()] for ws in wb.worksheets}
+
+
+@pytest.mark.parametrize("version", [None, (0, 0)])
+def test_workbook_stream_save(tmp_path, monkeypatch, version):
+    if version is not None:
+        # Versión de openpyxl no reconocida: se usa ExcelWriter tal cual
+        monkeypatch.setattr(package, "_openpyxl_version", lambda: version)
+    else:
+        assert package._openpyxl_version() in package._IN_MEMORY_OPENPYXL_VERSIONS
+    reference = str(tmp_path / "reference.xlsx")
+    build_workbook().save(reference)
+    buffer = io.BytesIO()
+    save_workbook_stream(build_workbook(), buffer)
+
+    buffer.seek(0)
+    assert sheet_values(buffer) == sheet_values(reference)
+    buffer.seek(0)
+    saved = members(buffer)
+    expected = members(reference)
+    assert sorted(saved) == sorted(expected)
+    assert saved["xl/worksheets/sheet1.xml"] == expected["xl/worksheets/sheet1.xml"]
+
+
+def test_workbook_passthrough_updates_modified_date(tmp_path):
+    template = str(tmp_path / "plantilla.xlsx")
+    build_workbook().save(template)
+    # Plantilla guardada hace años: su dcterms:modified no debe sobrevivir al guardado
+    rewrite_members(template, {CORE: lambda data: MODIFIED_RE.sub(b"\\g<1>2001-01-01T00:00:00Z\\g<2>", data)})
+    plain = str(tmp_path / "plain.xlsx")
+    passthrough = str(tmp_path / "passthrough.xlsx")
+    load_workbook(template).save(plain)
+    save_workbook_passthrough(load_workbook(template), passthrough, template)
+
+    plain_core, passthrough_core = members(plain)[CORE], members(passthrough)[CORE]
+    assert b"2001-01-01" not in passthrough_core
+    assert MODIFIED_RE.sub(b"", passthrough_core) == MODIFIED_RE.sub(b"", plain_core)
+    stamp = MODIFIED_RE.search(passthrough_core).group(0)
+    assert str(datetime.datetime.now(datetime.timezone.utc).year).encode() in stamp
@@ -0,0 +1,70 @@
+"""Lote en tubería: lectura anticipada y escritura en segundo plano (processor.pipeline)."""
+import os
+import zipfile
+import pytest
+from docx import Document
+from openpyxl import Workbook
+from processor.batch import collect_jobs, run_batch
+from processor.pipeline import build_pipeline_options
+
+REPLACEMENTS = {"{{NOMBRE}}": "María Paula", "{{CIUDAD}}": "Cali"}
+# openpyxl escribe la fecha de guardado; el resto de miembros debe coincidir byte a byte
+VOLATILE_MEMBERS = {"docProps/core.xml"}
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    folder = tmp_path / "entrada"
+    (folder / "sub").mkdir(parents=True)
+    for index in range(4):
+        doc = Document()
+        doc.add_paragraph(f"Carta {index} para {{{{NOMBRE}}}}" if index % 2 else "Sin claves")
+        doc.save(str(folder / f"carta_{index}.docx"))
+    wb = Workbook()
+    wb.active["A1"] = "{{CIUDAD}}"
+    wb.active["B1"] = 7
+    wb.save(str(folder / "sub" / "libro.xlsx"))
+    return str(folder)
+
+
+def package_members(path):
+    with zipfile.ZipFile(path) as zf:
+        return {name: zf.read(name) for name in zf.namelist() if name not in VOLATILE_MEMBERS}
+
+
+def run(input_dir, output_dir, **options):
+    jobs = collect_jobs(input_dir, str(output_dir))
+    return jobs, run_batch(jobs, REPLACEMENTS, {}, {}, **options)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline_outputs_match_serial_run(input_dir, tmp_path, workers):
+    jobs, expected = run(input_dir, tmp_path / "serie", workers=1)
+    _, results = run(input_dir, tmp_path / "tuberia", workers=workers,
+                     pipeline=build_pipeline_options(True))
+
+    assert all(result["ok"] for result in expected + results)
+    assert [r["stats"].get("copied", False) for r in results] == [r["stats"].get("copied", False) for r in expected]
+    for job in jobs:
+        relative = job["relative_input"]
+        assert package_members(str(tmp_path / "tuberia" / relative)) == package_members(str(tmp_path / "serie" / relative))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline_io_errors_fail_only_their_file(input_dir, tmp_path, workers):
+    output_dir = tmp_path / "salida"
+    jobs = collect_jobs(input_dir, str(output_dir))
+    unreadable = next(job for job in jobs if job["relative_input"] == "carta_1.docx")
+    unwritable = next(job for job in jobs if job["relative_input"] == "carta_3.docx")
+    # La entrada desaparece tras listarla; la salida choca con una carpeta
+    os.remove(unreadable["input_path"])
+    os.makedirs(unwritable["output_path"])
+    results = run_batch(jobs, REPLACEMENTS, {}, {}, workers=workers, pipeline=build_pipeline_options(True))
+
+    failed = {job["relative_input"] for job, result in zip(jobs, results) if not result["ok"]}
+    assert failed == {"carta_1.docx", "carta_3.docx"}
+    for job, result in zip(jobs, results):
+        if result["ok"]:
+            assert os.path.isfile(job["output_path"])
+        else:
+            assert result["error"]
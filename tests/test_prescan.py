@@ -0,0 +1,138 @@
+"""Pre-escaneo de paquetes y copia rápida de archivos sin cambios (processor.prescan)."""
+import io
+import os
+import shutil
+import zipfile
+import pytest
+from docx import Document
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image as XLImage
+from PIL import Image as PILImage
+from processor import prescan
+from processor.prescan import copy_file_fast, needs_processing
+
+REPLACEMENTS = {"{{NOMBRE}}": "María Paula", "Tom & Jerry": "Tom y Jerry"}
+PLACEHOLDERS = {"placeholder_logo.png": {"path": "logo.png"}}
+
+
+def png_buffer():
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (20, 10), "#3366cc").save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def save_docx(path, *texts):
+    doc = Document()
+    for text in texts:
+        doc.add_paragraph(text)
+    doc.save(path)
+    return doc
+
+
+def test_split_key_across_runs_is_found(tmp_path):
+    path = str(tmp_path / "partida.docx")
+    doc = Document()
+    paragraph = doc.add_paragraph("Hola ")
+    paragraph.add_run("{{NOM").bold = True
+    paragraph.add_run("BRE}}")
+    doc.save(path)
+
+    assert needs_processing(path, "word", REPLACEMENTS)
+    assert not needs_processing(path, "word", {"{{CIUDAD}}": "Cali"})
+
+
+def test_key_behind_xml_entities_is_found(tmp_path):
+    path = str(tmp_path / "entidades.docx")
+    save_docx(path, "Dibujos: Tom & Jerry")
+    with zipfile.ZipFile(path) as zf:
+        assert b"Tom &amp; Jerry" in zf.read("word/document.xml")
+
+    assert needs_processing(path, "word", REPLACEMENTS)
+
+
+@pytest.mark.parametrize("story", ["header", "footer"])
+def test_key_only_in_header_or_footer_is_found(tmp_path, story):
+    path = str(tmp_path / "encabezado.docx")
+    doc = Document()
+    doc.add_paragraph("Cuerpo sin claves")
+    getattr(doc.sections[0], story).paragraphs[0].text = "Para {{NOMBRE}}"
+    doc.save(path)
+
+    assert needs_processing(path, "word", REPLACEMENTS)
+    assert not needs_processing(path, "word", {"{{CIUDAD}}": "Cali"})
+
+
+def test_docx_drawing_needs_processing_with_placeholders(tmp_path):
+    path = str(tmp_path / "imagen.docx")
+    doc = save_docx(path, "Sin claves")
+    doc.add_paragraph().add_run().add_picture(png_buffer())
+    doc.save(path)
+
+    assert not needs_processing(path, "word", REPLACEMENTS)
+    assert needs_processing(path, "word", REPLACEMENTS, placeholder_replacements=PLACEHOLDERS)
+
+
+def test_xlsx_with_only_inline_strings(tmp_path):
+    path = str(tmp_path / "inline.xlsx")
+    wb = Workbook()
+    wb.active["A1"] = "Cliente: {{NOMBRE}}"
+    wb.active["B1"] = 42
+    wb.save(path)
+    with zipfile.ZipFile(path) as zf:
+        assert not any(name.endswith("sharedStrings.xml") for name in zf.namelist())
+
+    assert needs_processing(path, "excel", REPLACEMENTS)
+    assert not needs_processing(path, "excel", {"{{CIUDAD}}": "Cali"})
+
+
+def test_xlsx_existing_media_needs_processing_with_image_replacements(tmp_path):
+    path = str(tmp_path / "media.xlsx")
+    wb = Workbook()
+    wb.active["A1"] = "Sin claves"
+    wb.active.add_image(XLImage(png_buffer()), "C3")
+    wb.save(path)
+
+    assert not needs_processing(path, "excel", REPLACEMENTS)
+    assert needs_processing(path, "excel", REPLACEMENTS, image_replacements={"{{LOGO}}": {"path": "logo.png"}})
+
+
+def test_binary_file_input(tmp_path):
+    path = str(tmp_path / "memoria.docx")
+    save_docx(path, "Hola {{NOMBRE}}")
+    with open(path, "rb") as f:
+        data = f.read()
+
+    assert needs_processing(io.BytesIO(data), "word", REPLACEMENTS)
+    assert not needs_processing(io.BytesIO(data), "word", {"{{CIUDAD}}": "Cali"})
+
+
+def test_copy_file_fast_falls_back_to_shutil(tmp_path, monkeypatch):
+    source = tmp_path / "origen.bin"
+    source.write_bytes(os.urandom(64 * 1024))
+    destination = tmp_path / "destino.bin"
+    destination.write_bytes(b"contenido previo" * 8192)
+
+    def copy_file_range(source_fd, destination_fd, count):
+        # Copia una parte antes de fallar: el reintento debe empezar de cero
+        os.write(destination_fd, b"basura")
+        raise OSError("sin soporte")
+
+    def sendfile(destination_fd, source_fd, offset, count):
+        os.write(destination_fd, b"basura")
+        raise OSError("sin soporte")
+
+    calls = []
+    original_copyfileobj = shutil.copyfileobj
+
+    def copyfileobj(*args):
+        calls.append(args)
+        return original_copyfileobj(*args)
+
+    monkeypatch.setattr(os, "copy_file_range", copy_file_range, raising=False)
+    monkeypatch.setattr(os, "sendfile", sendfile, raising=False)
+    monkeypatch.setattr(prescan.shutil, "copyfileobj", copyfileobj)
+    copy_file_fast(str(source), str(destination))
+
+    assert len(calls) == 1
+    assert destination.read_bytes() == source.read_bytes()
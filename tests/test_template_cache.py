@@ -0,0 +1,42 @@
+"""Caché de plantillas entre lotes (processor.template_cache)."""
+import pytest
+from docx import Document
+from processor.batch import collect_jobs, run_batch
+from processor.template_cache import disable_template_cache, get_template_cache
+
+CACHE = {"max_entries": 8, "max_bytes": 64 * 1024 * 1024}
+
+
+@pytest.fixture
+def folders(tmp_path):
+    input_dir = tmp_path / "entrada"
+    input_dir.mkdir()
+    for index in range(3):
+        doc = Document()
+        doc.add_paragraph(f"{{{{NOMBRE}}}} {index}")
+        doc.save(str(input_dir / f"doc{index}.docx"))
+    yield str(input_dir), str(tmp_path / "salida")
+    disable_template_cache()
+
+
+def test_repeat_runs_hit_the_cache(folders):
+    input_dir, output_dir = folders
+    for value in ("Ana", "Luis"):
+        results = run_batch(collect_jobs(input_dir, output_dir), {"{{NOMBRE}}": value},
+                            workers=1, template_cache=CACHE, prescan=False)
+        assert all(result["ok"] for result in results)
+
+    assert get_template_cache().stats()["misses"] == 3
+    assert get_template_cache().stats()["hits"] == 3
+    text = Document(f"{output_dir}/doc0.docx").paragraphs[0].text
+    assert text == "Luis 0"
+
+
+def test_cache_ignored_with_several_workers(folders, caplog):
+    input_dir, output_dir = folders
+    results = run_batch(collect_jobs(input_dir, output_dir), {"{{NOMBRE}}": "Ana"},
+                        workers=2, template_cache=CACHE, prescan=False)
+
+    assert all(result["ok"] for result in results)
+    assert get_template_cache() is None
+    assert "caché de plantillas" in caplog.text
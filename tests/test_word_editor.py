@@ -0,0 +1,90 @@
+"""Reemplazo de texto en Word con python-docx (processor.word_editor)."""
+import copy
+import pytest
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from processor.word_editor import process_word_file
+
+REPLACEMENTS = {"{{NOMBRE}}": "María Paula", "{{CIUDAD}}": "Cali"}
+TEXT_BOX_RUN = (
+    '<w:r %s xmlns:v="urn:schemas-microsoft-com:vml"><w:pict><v:shape><v:textbox>'
+    '<w:txbxContent><w:p><w:r><w:t>{{CIUDAD}}</w:t></w:r></w:p></w:txbxContent>'
+    '</v:textbox></v:shape></w:pict></w:r>' % nsdecls("w")
+)
+
+
+def run_formats(paragraph):
+    return [(run.text, run.bold, run.italic, run.underline) for run in paragraph.runs]
+
+
+@pytest.mark.parametrize("engine", ["docx", "xml"])
+def test_split_key_keeps_run_formatting(tmp_path, engine):
+    path = str(tmp_path / "formato.docx")
+    doc = Document()
+    paragraph = doc.add_paragraph()
+    paragraph.add_run("Antes ").italic = True
+    paragraph.add_run("{{NOM").bold = True
+    tail = paragraph.add_run("BRE}}")
+    tail.italic = tail.underline = True
+    paragraph.add_run(" en {{CIUDAD}}.").italic = True
+    doc.add_paragraph("Sin claves").runs[0].bold = True
+    doc.save(path)
+    output = str(tmp_path / "salida.docx")
+    stats = process_word_file(path, output, REPLACEMENTS, engine=engine)
+
+    result = Document(output)
+    # La clave partida toma el formato de su primer run y vacía los demás;
+    # los runs fuera de las coincidencias conservan su w:rPr
+    assert run_formats(result.paragraphs[0]) == [
+        ("Antes ", None, True, None),
+        ("María Paula", True, None, None),
+        ("", None, True, True),
+        (" en Cali.", None, True, None),
+    ]
+    assert run_formats(result.paragraphs[1]) == [("Sin claves", True, None, None)]
+    assert stats["text_replaced"] == 2
+    if engine == "docx":
+        assert stats["runs_rewritten"] == 3
+
+
+def test_multi_section_stories_are_visited_once(tmp_path):
+    path = str(tmp_path / "secciones.docx")
+    doc = Document()
+    doc.add_paragraph("Uno {{NOMBRE}}")
+    doc.add_paragraph("Caja: ")._p.append(parse_xml(TEXT_BOX_RUN))
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "{{NOMBRE}}"
+    doc.add_section(WD_SECTION.NEW_PAGE)
+    doc.add_paragraph("Dos {{CIUDAD}}")
+    doc.add_section(WD_SECTION.NEW_PAGE)
+    doc.add_paragraph("Tres")
+    first = doc.sections[0]
+    first.different_first_page_header_footer = True
+    first.first_page_header.paragraphs[0].text = "Portada {{NOMBRE}}"
+    first.header.paragraphs[0].text = "Encabezado {{NOMBRE}}"
+    first.footer.paragraphs[0].text = "Pie {{CIUDAD}}"
+    # Las secciones 2 y 3 apuntan explícitamente a las mismas partes por defecto
+    for section in doc.sections[1:]:
+        for ref in first._sectPr.iterchildren(qn("w:headerReference"), qn("w:footerReference")):
+            if ref.get(qn("w:type")) == "default":
+                section._sectPr.insert(0, copy.deepcopy(ref))
+    doc.save(path)
+    output = str(tmp_path / "salida.docx")
+    stats = process_word_file(path, output, REPLACEMENTS)
+
+    # Cuerpo + portada + encabezado + pie, aunque tres secciones los referencien;
+    # los párrafos incluyen el del cuadro de texto y el de la celda
+    assert stats["stories"] == 4
+    assert stats["paragraphs"] == 11
+    assert stats["text_replaced"] == 7
+    assert stats["runs_rewritten"] == 7
+    result = Document(output)
+    assert [p.text for p in result.paragraphs if p.text] == ["Uno María Paula", "Caja: ", "Dos Cali", "Tres"]
+    assert result.tables[0].cell(0, 0).text == "María Paula"
+    text_box = next(result.element.body.iter(qn("w:txbxContent")))
+    assert [t.text for t in text_box.iter(qn("w:t"))] == ["Cali"]
+    assert result.sections[0].first_page_header.paragraphs[0].text == "Portada María Paula"
+    for section in result.sections:
+        assert section.header.paragraphs[0].text == "Encabezado María Paula"
+        assert section.footer.paragraphs[0].text == "Pie Cali"
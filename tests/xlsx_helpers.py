@@ -0,0 +1,63 @@
+"""
+Libros de prueba con cadenas compartidas.
+
+openpyxl 3.1 guarda todas las cadenas en línea (t="inlineStr"), mientras que
+Excel usa xl/sharedStrings.xml; use_shared_strings convierte un libro guardado
+por openpyxl al formato de Excel para probar los motores sobre ambos.
+"""
+import re
+import zipfile
+
+SHARED_STRINGS = "xl/sharedStrings.xml"
+_INLINE_CELL_RE = re.compile(rb'<c\b([^>]*?)\st="inlineStr"([^>]*)><is>(.*?)</is></c>', re.DOTALL)
+_SHEET_RE = re.compile(r"^xl/worksheets/[^/]+\.xml$")
+
+
+def rewrite_members(path, changes):
+    """Reescribe miembros del zip: changes = {nombre: función(bytes) -> bytes}."""
+    with zipfile.ZipFile(path) as zf:
+        members = [(info, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for info, data in members:
+            change = changes.get(info.filename)
+            zf.writestr(info, change(data) if change else data)
+
+
+def use_shared_strings(path, rich_text=None):
+    """
+    Pasa las cadenas en línea de todas las hojas a xl/sharedStrings.xml.
+
+    rich_text: {texto: xml de runs} para guardar esas cadenas como texto enriquecido.
+    """
+    strings = {}
+
+    def to_shared(match):
+        index = strings.setdefault(match.group(3), len(strings))
+        return b'<c' + match.group(1) + b' t="s"' + match.group(2) + b'><v>%d</v></c>' % index
+
+    with zipfile.ZipFile(path) as zf:
+        sheets = [name for name in zf.namelist() if _SHEET_RE.match(name)]
+    changes = {name: (lambda data: _INLINE_CELL_RE.sub(to_shared, data)) for name in sheets}
+    rewrite_members(path, changes)
+
+    items = []
+    for xml in strings:
+        for text, runs in (rich_text or {}).items():
+            if xml == b"<t>" + text.encode("utf-8") + b"</t>":
+                xml = runs
+        items.append(b"<si>" + xml + b"</si>")
+    shared = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+              b'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+              b'count="%d" uniqueCount="%d">' % (len(items), len(items)) + b"".join(items) + b"</sst>")
+    with zipfile.ZipFile(path, "a", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(SHARED_STRINGS, shared)
+    rewrite_members(path, {
+        "[Content_Types].xml": lambda data: data.replace(
+            b"</Types>",
+            b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+            b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'),
+        "xl/_rels/workbook.xml.rels": lambda data: data.replace(
+            b"</Relationships>",
+            b'<Relationship Id="rIdShared" Type="http://schemas.openxmlformats.org/officeDocument/'
+            b'2006/relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>'),
+    })